@@ -1,16 +1,113 @@
+import json
 import mimetypes
+import queue
 import time
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from datetime import datetime
 import uuid
+from concurrent.futures import wait as wait_futures
 from config import APP_CONFIG, RESOURCE_TYPES, DEVICE_CONFIGS, TIMEOUT_CONFIG
 from workers.master_controller import MasterController
+from workers.async_engine import AsyncMasterController
+from workers.crawl_strategy import STRATEGIES
+from workers.scan_jobs import ScanJobManager, AdmissionError
+from storage.scan_store import get_scan_store
+from storage.checkpoint import load_checkpoint
 
 app = Flask(__name__)
 
+# Доступные движки сканирования
+SCAN_ENGINES = {
+    'threads': MasterController,
+    'async': AsyncMasterController,
+}
+
 # Хранилище активных сканирований
 active_scans = {}
 
+# Очередь сканирований с общим бюджетом рабочих
+scan_jobs = ScanJobManager()
+
+# Пути на файловой системе сервера не отдаются клиентам
+PRIVATE_CONFIG_KEYS = ('scan_store_path', 'checkpoint_dir')
+
+
+def build_scan_response(scan_id, domain, results, stats, timeout, request_timeout, detailed, include_links):
+    """Формирует ответ по результатам сканирования"""
+    response_data = {
+        "scan_id": scan_id,
+        "timestamp": datetime.now().isoformat(),
+        "domain": domain,
+        "summary": stats['scan_summary'],
+        "links": stats.get('links_analysis', {}),
+        "http_analysis": stats.get('http_analysis', {}),
+        "devices": stats.get('device_analysis', {}),
+        "performance": stats.get('performance', {}),
+        "config": stats.get('configuration', {}),
+        "timeout_info": {
+            "total_timeout_seconds": timeout,
+            "request_timeout_seconds": request_timeout,
+            "actual_duration_seconds": stats['scan_summary']['scan_duration_seconds'],
+            "timeout_exceeded": stats['scan_summary'].get('timeout_exceeded', False),
+            "completion_status": stats['scan_summary'].get('completion_status', 'unknown')
+        },
+        "status": "completed"
+    }
+
+    # Добавляем подробные результаты если запрошено
+    if detailed:
+        response_data["detailed_results"] = results
+
+    # Добавляем списки уникальных ссылок если запрошено и данные доступны
+    if include_links and 'unique_links' in stats and stats['unique_links'] is not None:
+        response_data["unique_links"] = stats['unique_links']
+
+    return response_data
+
+
+def failed_scan_response(scan_id, domain, error, timeout, request_timeout):
+    """Ответ для сканирования, завершившегося ошибкой"""
+    return {
+        "scan_id": scan_id,
+        "error": error,
+        "domain": domain,
+        "scan_timestamp": datetime.now().isoformat(),
+        "status": "failed",
+        "timeout_config": {
+            "total_timeout": timeout,
+            "request_timeout": request_timeout
+        }
+    }
+
+
+def scan_runner(scan_id, domain, timeout, request_timeout, detailed, include_links, streaming=False):
+    """Функция задания: выполняет сканирование и формирует ответ"""
+    def run(master):
+        # Сохраняем ссылку на активное сканирование на время выполнения
+        active_scans[scan_id] = master
+        try:
+            results, stats = master.run_scan(include_links=not streaming)
+        finally:
+            active_scans.pop(scan_id, None)
+            master.progress_feed.close()
+        if streaming:
+            return stats
+        return build_scan_response(scan_id, domain, results, stats, timeout, request_timeout,
+                                   detailed, include_links)
+    return run
+
+
+def fit_to_budget(master):
+    """Единицы бюджета сканирования — верхний предел его одновременных запросов.
+
+    У потокового движка это число потоков, у async — число запросов в полете
+    (рабочих там столько, сколько профилей). Если предел больше всего бюджета,
+    он урезается до бюджета: сканирование выполняется в одиночку и не делает
+    больше запросов сразу, чем ему выделено.
+    """
+    master.limit_fetch_slots(scan_jobs.budget.total)
+    return master.max_fetch_slots
+
 
 @app.route('/api/scan')
 def scan_website():
@@ -23,6 +120,33 @@ def scan_website():
     request_timeout = request.args.get('request_timeout', APP_CONFIG['request_timeout'], type=int)
     detailed = request.args.get('detailed', 'false').lower() == 'true'
     include_links = request.args.get('include_links', 'true').lower() == 'true'
+    engine = request.args.get('engine', APP_CONFIG['default_engine']).lower()
+    concurrency = request.args.get('concurrency', APP_CONFIG['async_concurrency'], type=int)
+    crawl_delay = request.args.get('crawl_delay', None, type=float)
+    parse_mode = request.args.get('parse', APP_CONFIG['parse_mode']).lower()
+    visited_filter = request.args.get('visited_filter', APP_CONFIG['visited_filter']).lower()
+    found_on_cap = request.args.get('found_on_cap', APP_CONFIG['found_on_pages_cap'], type=int)
+    include_found_on = request.args.get('include_found_on', 'true').lower() == 'true'
+    mode = request.args.get('mode', APP_CONFIG['default_scan_mode']).lower()
+    output_format = request.args.get('format', 'json').lower()
+    persist = request.args.get('persist', str(APP_CONFIG['persist_scans'])).lower() == 'true'
+    conditional = request.args.get('conditional', str(APP_CONFIG['conditional_requests'])).lower() == 'true'
+    http_version = request.args.get('http_version', APP_CONFIG['http_version'])
+    max_body_kb = request.args.get('max_body_kb', APP_CONFIG['max_body_size'] // 1024, type=int)
+    adaptive = request.args.get('adaptive', str(APP_CONFIG['adaptive_concurrency'])).lower() == 'true'
+    max_retries = request.args.get('retries', APP_CONFIG['retry_max_attempts'], type=int)
+    respect_robots = request.args.get('robots', str(APP_CONFIG['respect_robots'])).lower() == 'true'
+    sitemaps = request.args.get('sitemaps', str(APP_CONFIG['use_sitemaps'])).lower() == 'true'
+    strategy = request.args.get('strategy', APP_CONFIG['crawl_strategy']).lower()
+    near_duplicates = request.args.get(
+        'near_duplicates', str(APP_CONFIG['near_duplicate_detection'])).lower() == 'true'
+    sort_query = request.args.get('sort_query', str(APP_CONFIG['canonical_sort_query'])).lower() == 'true'
+    drop_params = request.args.get('drop_params')
+    if drop_params is not None:
+        drop_params = [name.strip() for name in drop_params.split(',') if name.strip()]
+    # Шаблоны пути передаются повторяющимися параметрами: include=/blog/*&include=/news/
+    include = request.args.getlist('include') or None
+    exclude = request.args.getlist('exclude') or None
 
     # Валидация параметров
     if not domain:
@@ -36,6 +160,85 @@ def scan_website():
             "error": f"Количество воркеров не может превышать {APP_CONFIG['max_workers']}"
         }), 400
 
+    if engine not in SCAN_ENGINES:
+        return jsonify({
+            "error": f"Неизвестный движок сканирования: {engine}",
+            "available_engines": list(SCAN_ENGINES)
+        }), 400
+
+    if concurrency <= 0 or concurrency > APP_CONFIG['max_async_concurrency']:
+        return jsonify({
+            "error": f"Параметр concurrency должен быть от 1 до {APP_CONFIG['max_async_concurrency']}"
+        }), 400
+
+    if parse_mode not in ('inline', 'process'):
+        return jsonify({
+            "error": "Параметр parse должен быть inline или process"
+        }), 400
+
+    if max_body_kb <= 0 or max_body_kb > 100 * 1024:
+        return jsonify({
+            "error": "Параметр max_body_kb должен быть от 1 до 102400"
+        }), 400
+
+    if max_retries < 0 or max_retries > 10:
+        return jsonify({
+            "error": "Параметр retries должен быть от 0 до 10"
+        }), 400
+
+    if strategy not in STRATEGIES:
+        return jsonify({
+            "error": f"Параметр strategy должен быть одним из: {', '.join(STRATEGIES)}"
+        }), 400
+
+    for pattern in (include or []) + (exclude or []):
+        if not pattern.startswith(('/', '*')):
+            return jsonify({
+                "error": f"Шаблон include/exclude должен начинаться с / или *: {pattern}"
+            }), 400
+
+    if http_version not in ('1.1', '2'):
+        return jsonify({
+            "error": "Параметр http_version должен быть 1.1 или 2"
+        }), 400
+
+    if http_version == '2' and engine == 'async':
+        return jsonify({
+            "error": "HTTP/2 доступен только в движке threads"
+        }), 400
+
+    if visited_filter not in ('exact', 'bloom'):
+        return jsonify({
+            "error": "Параметр visited_filter должен быть exact или bloom"
+        }), 400
+
+    if found_on_cap is not None and found_on_cap < 0:
+        return jsonify({
+            "error": "Параметр found_on_cap не может быть отрицательным"
+        }), 400
+
+    if mode not in ('sync', 'job'):
+        return jsonify({
+            "error": "Параметр mode должен быть sync или job"
+        }), 400
+
+    if output_format not in ('json', 'ndjson'):
+        return jsonify({
+            "error": "Параметр format должен быть json или ndjson"
+        }), 400
+
+    if output_format == 'ndjson' and mode != 'sync':
+        return jsonify({
+            "error": "Потоковая выдача (format=ndjson) доступна только в режиме sync"
+        }), 400
+
+    streaming = output_format == 'ndjson'
+
+    if crawl_delay is not None and not 0 <= crawl_delay <= 60:
+        return jsonify({
+            "error": "Параметр crawl_delay должен быть от 0 до 60 секунд"
+        }), 400
+
     # Валидация таймаутов
     if timeout <= 0:
         return jsonify({
@@ -57,89 +260,196 @@ def scan_website():
             "error": "Таймаут запроса не может превышать 120 секунд"
         }), 400
 
+    scan_id = str(uuid.uuid4())
     try:
-        scan_id = str(uuid.uuid4())
         print(f"Начинаем сканирование {domain} (ID: {scan_id})")
-        print(f"Конфигурация: workers={num_workers}, max_pages={max_pages}, "
+        print(f"Конфигурация: engine={engine}, workers={num_workers}, max_pages={max_pages}, "
               f"max_depth={max_depth}, total_timeout={timeout}s, "
               f"request_timeout={request_timeout}s")
 
+        controller_kwargs = {}
+        if engine == 'async':
+            controller_kwargs['concurrency'] = concurrency
+
         # Создаем мастер-контроллер с таймаутами
-        master = MasterController(
+        master = SCAN_ENGINES[engine](
             scan_id=scan_id,
             domain=domain,
             max_pages=max_pages,
             max_depth=max_depth,
             num_workers=num_workers,
             timeout=timeout,
-            request_timeout=request_timeout
+            request_timeout=request_timeout,
+            crawl_delay=crawl_delay,
+            parse_mode=parse_mode,
+            visited_filter=visited_filter,
+            found_on_cap=found_on_cap,
+            include_found_on=include_found_on,
+            # Результаты страниц копятся в контроллере, только если их вернут в ответе
+            retain_results=detailed and not streaming,
+            scan_store=get_scan_store() if persist else None,
+            conditional=conditional,
+            http_version=http_version,
+            max_body_size=max_body_kb * 1024,
+            adaptive=adaptive,
+            max_retries=max_retries,
+            respect_robots=respect_robots,
+            sitemaps=sitemaps,
+            strategy=strategy,
+            near_duplicates=near_duplicates,
+            sort_query=sort_query,
+            drop_params=drop_params,
+            include=include,
+            exclude=exclude,
+            **controller_kwargs
         )
 
-        # Сохраняем ссылку на активное сканирование
-        active_scans[scan_id] = master
-
-        # Запускаем сканирование
-        results, stats = master.run_scan()
+        page_queue = None
+        if streaming and detailed:
+            page_queue = queue.Queue()
+            master.set_result_sink(page_queue.put)
 
-        # Удаляем из активных сканирований
-        if scan_id in active_scans:
-            del active_scans[scan_id]
+        # Сканирование выполняется в ограниченном исполнителе с общим бюджетом рабочих
+        run = scan_runner(scan_id, domain, timeout, request_timeout, detailed, include_links, streaming)
+        job = scan_jobs.submit(scan_id, master, fit_to_budget(master), run)
 
-        # Формируем ответ
-        response_data = {
-            "scan_id": scan_id,
-            "timestamp": datetime.now().isoformat(),
+    except AdmissionError as e:
+        return jsonify({
+            "error": str(e),
             "domain": domain,
-            "summary": stats['scan_summary'],
-            "links": stats.get('links_analysis', {}),
-            "http_analysis": stats.get('http_analysis', {}),
-            "devices": stats.get('device_analysis', {}),
-            "performance": stats.get('performance', {}),
-            "config": stats.get('configuration', {}),
-            "timeout_info": {
-                "total_timeout_seconds": timeout,
-                "request_timeout_seconds": request_timeout,
-                "actual_duration_seconds": stats['scan_summary']['scan_duration_seconds'],
-                "timeout_exceeded": stats['scan_summary'].get('timeout_exceeded', False),
-                "completion_status": stats['scan_summary'].get('completion_status', 'unknown')
-            },
-            "status": "completed"
-        }
-
-        # Добавляем подробные результаты если запрошено
-        if detailed:
-            response_data["detailed_results"] = results
-
-        # Добавляем списки уникальных ссылок если запрошено и данные доступны
-        if include_links and 'unique_links' in stats and stats['unique_links'] is not None:
-            response_data["unique_links"] = stats['unique_links']
-
-        return jsonify(response_data)
+            "status": "rejected",
+            "jobs": scan_jobs.describe()
+        }), 503
 
     except Exception as e:
         print(f"Критическая ошибка при сканировании: {e}")
         import traceback
         traceback.print_exc()
+        return jsonify(failed_scan_response(scan_id, domain, str(e), timeout, request_timeout)), 500
 
-        # Удаляем сканирование из активных в случае ошибки
-        if 'scan_id' in locals() and scan_id in active_scans:
-            del active_scans[scan_id]
-
+    if mode == 'job':
         return jsonify({
-            "error": str(e),
+            "scan_id": scan_id,
+            "status": job.status,
             "domain": domain,
-            "scan_timestamp": datetime.now().isoformat(),
-            "status": "failed",
-            "timeout_config": {
-                "total_timeout": timeout,
-                "request_timeout": request_timeout
-            }
-        }), 500
+            "result_url": f"/api/scan/{scan_id}/result",
+            "progress_url": f"/api/scan/{scan_id}/progress",
+            "jobs": scan_jobs.describe()
+        }), 202
+
+    if streaming:
+        return Response(
+            stream_scan_ndjson(job, page_queue, timeout, request_timeout, include_links),
+            mimetype='application/x-ndjson'
+        )
+
+    # Синхронный режим: ждем завершения задания и отдаем результат сразу
+    job.future.result()
+    scan_jobs.discard(scan_id)
+    if job.status == 'completed':
+        return jsonify(job.response)
+    if job.status == 'failed':
+        return jsonify(failed_scan_response(scan_id, domain, job.error, timeout, request_timeout)), 500
+    return jsonify(job.describe()), 409
+
+
+def ndjson_line(record_type, data):
+    """Одна строка NDJSON: тип записи и ее данные"""
+    return json.dumps({"type": record_type, "data": data}, ensure_ascii=False, default=str) + '\n'
+
+
+def stream_scan_ndjson(job, page_queue, timeout, request_timeout, include_links):
+    """Отдает результаты сканирования строками NDJSON: страницы по мере обхода, затем итоги и ссылки"""
+    master = job.master
+    scan_id = job.scan_id
+    try:
+        yield ndjson_line('scan', {"scan_id": scan_id, "domain": master.domain, "status": job.status})
+
+        # Страницы уходят клиенту по мере готовности и не накапливаются в памяти
+        while page_queue is not None:
+            try:
+                result = page_queue.get(timeout=0.5)
+            except queue.Empty:
+                if job.future.done() and page_queue.empty():
+                    break
+                continue
+            yield ndjson_line('page', result)
+
+        job.future.result()
+        scan_jobs.discard(scan_id)
+        if job.status != 'completed':
+            error = failed_scan_response(scan_id, master.domain, job.error, timeout, request_timeout)
+            yield ndjson_line('error', error)
+            return
+
+        summary = build_scan_response(scan_id, master.domain, [], job.response, timeout, request_timeout,
+                                      detailed=False, include_links=False)
+        yield ndjson_line('summary', summary)
+
+        if include_links:
+            for link in master.iter_link_records():
+                yield ndjson_line('link', link)
+
+        yield ndjson_line('end', {"scan_id": scan_id})
+    finally:
+        # Клиент отключился раньше времени — сканирование больше никому не нужно
+        if not job.future.done():
+            if not scan_jobs.cancel(scan_id):
+                master.stop_scan()
+
+
+@app.route('/api/scan/<scan_id>/result')
+def get_scan_result(scan_id):
+    """Результат сканирования, запущенного в режиме job"""
+    job = scan_jobs.get(scan_id)
+    if job is None:
+        # Задание уже удалено из памяти — отдаем итоги из постоянного хранилища
+        stored = get_scan_store().get_scan(scan_id)
+        if stored is not None and stored['summary'] is not None:
+            summary = stored['summary']
+            return jsonify({
+                "scan_id": scan_id,
+                "domain": stored['domain'],
+                "summary": summary.get('scan_summary', {}),
+                "links": summary.get('links_analysis', {}),
+                "http_analysis": summary.get('http_analysis', {}),
+                "devices": summary.get('device_analysis', {}),
+                "performance": summary.get('performance', {}),
+                "config": summary.get('configuration', {}),
+                "status": "completed",
+                "source": "store"
+            })
+        return jsonify({
+            "scan_id": scan_id,
+            "status": "not_found",
+            "message": "Задание не найдено или его результат уже удален"
+        }), 404
+
+    if job.status == 'completed':
+        return jsonify(job.response)
+
+    if job.status == 'failed':
+        return jsonify(failed_scan_response(scan_id, job.master.domain, job.error,
+                                            job.master.total_timeout, job.master.request_timeout)), 500
+
+    # queued, running или cancelled: результата еще нет
+    return jsonify(job.describe()), 200 if job.status == 'cancelled' else 202
 
 
 @app.route('/api/scan/<scan_id>/control', methods=['POST'])
 def control_scan(scan_id):
     """Управление активным сканированием (пауза, остановка)"""
+    action = (request.get_json(silent=True) or {}).get('action')
+
+    # Задание в очереди можно только отменить
+    if scan_id not in active_scans and action == 'stop' and scan_jobs.cancel(scan_id):
+        return jsonify({
+            "scan_id": scan_id,
+            "action": "stop",
+            "status": "success",
+            "message": "Сканирование удалено из очереди"
+        })
+
     if scan_id not in active_scans:
         return jsonify({
             "scan_id": scan_id,
@@ -147,7 +457,6 @@ def control_scan(scan_id):
             "message": "Сканирование не найдено или завершено"
         }), 404
 
-    action = request.json.get('action')
     master = active_scans[scan_id]
 
     if action == 'pause':
@@ -184,25 +493,110 @@ def control_scan(scan_id):
         }), 400
 
 
-@app.route('/api/scan/<scan_id>/progress')
-def get_scan_progress(scan_id):
-    """Получить прогресс активного сканирования"""
-    if scan_id in active_scans:
-        master = active_scans[scan_id]
+@app.route('/api/scan/<scan_id>/resume', methods=['POST'])
+def resume_scan(scan_id):
+    """Продолжает прерванное сканирование с последней контрольной точки"""
+    job = scan_jobs.get(scan_id)
+    if scan_id in active_scans or (job is not None and job.status in ('queued', 'running')):
+        return jsonify({
+            "scan_id": scan_id,
+            "status": "conflict",
+            "message": "Сканирование еще выполняется"
+        }), 409
 
-        # Создаем временный callback для получения прогресса
-        progress_data = {}
+    try:
+        state = load_checkpoint(scan_id)
+    except Exception as e:
+        return jsonify({
+            "scan_id": scan_id,
+            "error": f"Не удалось прочитать контрольную точку: {e}"
+        }), 500
 
-        def progress_callback(data):
-            progress_data.update(data)
+    if state is None:
+        return jsonify({
+            "scan_id": scan_id,
+            "status": "not_found",
+            "message": "Контрольная точка сканирования не найдена"
+        }), 404
 
-        master.set_progress_callback(progress_callback)
-        master._update_progress()
+    config = state['config']
+    # Лимиты можно поднять при возобновлении, остальные параметры берутся из контрольной точки
+    max_pages = request.args.get('max_pages', config['max_pages'], type=int)
+    timeout = request.args.get('timeout', config['timeout'], type=int)
+    include_links = request.args.get('include_links', 'true').lower() == 'true'
+    persist = request.args.get('persist', str(APP_CONFIG['persist_scans'])).lower() == 'true'
 
+    if max_pages <= 0:
+        return jsonify({
+            "error": "Параметр max_pages должен быть положительным числом"
+        }), 400
+
+    if timeout <= 0 or timeout > 3600:
+        return jsonify({
+            "error": "Таймаут должен быть от 1 до 3600 секунд"
+        }), 400
+
+    engine = state['engine'] if state['engine'] in SCAN_ENGINES else 'threads'
+    if engine != 'async':
+        config.pop('concurrency', None)
+    request_timeout = config['request_timeout']
+
+    try:
+        print(f"Возобновляем сканирование {config['domain']} (ID: {scan_id}) с контрольной точки")
+        master = SCAN_ENGINES[engine].from_checkpoint(
+            state,
+            max_pages=max_pages,
+            timeout=timeout,
+            retain_results=False,
+            scan_store=get_scan_store() if persist else None
+        )
+        run = scan_runner(scan_id, master.domain, timeout, request_timeout, False, include_links)
+        job = scan_jobs.submit(scan_id, master, fit_to_budget(master), run)
+
+    except AdmissionError as e:
+        return jsonify({
+            "error": str(e),
+            "scan_id": scan_id,
+            "status": "rejected",
+            "jobs": scan_jobs.describe()
+        }), 503
+
+    except Exception as e:
+        print(f"Ошибка при возобновлении сканирования: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify(failed_scan_response(scan_id, config['domain'], str(e), timeout, request_timeout)), 500
+
+    return jsonify({
+        "scan_id": scan_id,
+        "status": job.status,
+        "domain": master.domain,
+        "resume_count": master.resume_count,
+        "pages_done": master._results_count(),
+        "frontier_size": master.url_queue.qsize(),
+        "result_url": f"/api/scan/{scan_id}/result",
+        "progress_url": f"/api/scan/{scan_id}/progress",
+        "jobs": scan_jobs.describe()
+    }), 202
+
+
+@app.route('/api/scan/<scan_id>/progress')
+def get_scan_progress(scan_id):
+    """Получить прогресс активного сканирования"""
+    if scan_id in active_scans:
+        # Последний снимок из буфера: опрос не вызывает работу в контроллере
         return jsonify({
             "scan_id": scan_id,
             "status": "running",
-            "progress": progress_data
+            "progress": active_scans[scan_id].progress_feed.latest()
+        })
+
+    job = scan_jobs.get(scan_id)
+    if job is not None and job.status == 'queued':
+        return jsonify({
+            "scan_id": scan_id,
+            "status": "queued",
+            "jobs": scan_jobs.describe()
         })
 
     return jsonify({
@@ -212,6 +606,150 @@ def get_scan_progress(scan_id):
     }), 404
 
 
+def page_params():
+    """Параметры постраничной выдачи limit/offset"""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return limit, offset
+
+
+@app.route('/api/scans')
+def list_stored_scans():
+    """Сохраненные сканирования (можно отфильтровать по домену)"""
+    limit, offset = page_params()
+    scans = get_scan_store().list_scans(request.args.get('domain'), limit, offset)
+    return jsonify({"scans": scans, "limit": limit, "offset": offset})
+
+
+@app.route('/api/scan/<scan_id>/pages')
+def get_stored_pages(scan_id):
+    """Страницы сохраненного сканирования с фильтром по коду ответа"""
+    limit, offset = page_params()
+    pages = get_scan_store().get_pages(
+        scan_id,
+        status_code=request.args.get('status_code', None, type=int),
+        status_category=request.args.get('status_category'),
+        limit=limit,
+        offset=offset
+    )
+    return jsonify({"scan_id": scan_id, "pages": pages, "limit": limit, "offset": offset})
+
+
+@app.route('/api/scan/<scan_id>/links')
+def get_stored_links(scan_id):
+    """Ссылки сохраненного сканирования с фильтром по типу ресурса, домену и типу ссылки"""
+    limit, offset = page_params()
+    links = get_scan_store().get_links(
+        scan_id,
+        resource_type=request.args.get('resource_type'),
+        domain=request.args.get('domain'),
+        link_type=request.args.get('type'),
+        limit=limit,
+        offset=offset
+    )
+    return jsonify({"scan_id": scan_id, "links": links, "limit": limit, "offset": offset})
+
+
+@app.route('/api/scan/<scan_id>/inlinks')
+def get_stored_inlinks(scan_id):
+    """Страницы сохраненного сканирования, ссылающиеся на url"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({"error": "Параметр url обязателен"}), 400
+    limit, offset = page_params()
+    sources = get_scan_store().get_inlinks(scan_id, url, limit, offset)
+    return jsonify({
+        "scan_id": scan_id,
+        "url": url,
+        "found_on_pages": [row['url'] for row in sources],
+        "limit": limit,
+        "offset": offset
+    })
+
+
+@app.route('/api/scan/<scan_id>/diff/<other_id>')
+def get_scan_diff(scan_id, other_id):
+    """Что изменилось от сканирования scan_id к other_id того же домена"""
+    store = get_scan_store()
+    scans = {key: store.get_scan(key) for key in (scan_id, other_id)}
+    missing = [key for key, scan in scans.items() if scan is None]
+    if missing:
+        return jsonify({
+            "status": "not_found",
+            "missing_scans": missing,
+            "message": "Сканирование не найдено в хранилище"
+        }), 404
+
+    if scans[scan_id]['base_domain'] != scans[other_id]['base_domain']:
+        return jsonify({
+            "error": "Сравнивать можно только сканирования одного домена",
+            "domains": {key: scan['base_domain'] for key, scan in scans.items()}
+        }), 400
+
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    diff = store.diff_scans(scan_id, other_id, limit)
+    diff['domain'] = scans[scan_id]['base_domain']
+    diff['scans'] = {key: {"status": scan['status'], "started_at": scan['started_at'],
+                           "finished_at": scan['finished_at']} for key, scan in scans.items()}
+    return jsonify(diff)
+
+
+def sse_event(event, data, event_id=None):
+    """Форматирует событие Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+@app.route('/api/scan/<scan_id>/events')
+def scan_events(scan_id):
+    """Поток прогресса сканирования (Server-Sent Events)"""
+    job = scan_jobs.get(scan_id)
+    master = job.master if job is not None else active_scans.get(scan_id)
+    if master is None:
+        return jsonify({
+            "scan_id": scan_id,
+            "status": "not_found",
+            "message": "Сканирование не найдено или завершено"
+        }), 404
+
+    feed = master.progress_feed
+    # После переподключения браузер присылает номер последнего полученного снимка
+    last_id = request.headers.get('Last-Event-ID', 0, type=int)
+    keepalive = APP_CONFIG['sse_keepalive']
+
+    def stream():
+        after = last_id
+        while True:
+            events, closed = feed.wait(after, timeout=keepalive)
+            for sequence, snapshot in events:
+                after = sequence
+                yield sse_event('progress', snapshot, sequence)
+
+            # Задание могло завершиться, так и не начав сканирование (отмена в очереди)
+            if closed or (job is not None and job.finished_at is not None and not events):
+                if job is not None:
+                    # Итоговый снимок публикуется до сборки ответа — ждем, чтобы result_url был готов
+                    wait_futures([job.future], timeout=TIMEOUT_CONFIG['graceful_shutdown'])
+                yield sse_event('done', {
+                    "scan_id": scan_id,
+                    "status": job.status if job is not None else 'completed',
+                    "result_url": f"/api/scan/{scan_id}/result"
+                })
+                return
+
+            if not events:
+                yield ': keep-alive\n\n'
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/api/scan/status')
 def scan_status():
     """Endpoint для проверки статуса всех сканирований"""
@@ -219,6 +757,8 @@ def scan_status():
         "status": "ready",
         "active_scans": len(active_scans),
         "max_workers": APP_CONFIG['max_workers'],
+        "jobs": scan_jobs.describe(),
+        "available_engines": list(SCAN_ENGINES),
         "available_devices": [
             {"id": device['id'], "name": device['name'], "type": device['platform']}
             for device in DEVICE_CONFIGS
@@ -239,7 +779,7 @@ def get_statistics():
             "5xx": "Server Error"
         },
         "device_profiles": DEVICE_CONFIGS,
-        "app_config": APP_CONFIG
+        "app_config": {key: value for key, value in APP_CONFIG.items() if key not in PRIVATE_CONFIG_KEYS}
     })
 
 
@@ -1,3 +1,5 @@
+import os
+
 # Список user-agent'ов для имитации разных устройств
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -89,6 +91,8 @@ DEVICE_CONFIGS = [
 TIMEOUT_CONFIG = {
     'total_scan_timeout': 100,  # Максимальное время сканирования (5 минут)
     'request_timeout': 15,      # Таймаут на HTTP запрос
+    'connect_timeout': 5,       # Таймаут на установку соединения
+    'parse_timeout': 5,         # Время на разбор одной страницы
     'queue_timeout': 2,         # Таймаут ожидания из очереди
     'graceful_shutdown': 5,     # Время на graceful shutdown
     'health_check_timeout': 30, # Таймаут health check
@@ -100,7 +104,77 @@ APP_CONFIG = {
     'default_max_pages': 50,
     'default_max_depth': 3,
     'request_timeout': TIMEOUT_CONFIG['request_timeout'],
-    'min_delay': 0.5,
-    'max_delay': 2.0,
+    'default_crawl_delay': 0.25,     # Минимальный интервал между запросами к одному хосту
+    'host_crawl_delays': {},         # Интервалы для отдельных хостов: {'example.com': 1.0}
     'total_scan_timeout': TIMEOUT_CONFIG['total_scan_timeout'],  # Новый параметр
+    'html_parser': 'auto',           # Бэкенд разбора HTML: auto, lxml или html.parser
+    'parse_mode': 'inline',          # Где разбирать HTML: inline (в потоке слейва) или process
+    'parse_processes': None,         # Размер пула разбора; None — по числу ядер
+    'shared_memory_threshold': 64 * 1024,  # С какого размера тело передается через shared memory
+    'visited_filter': 'exact',       # Множество посещенных URL: exact или bloom
+    'bloom_capacity': 1_000_000,     # Ожидаемое число URL для фильтра Блума
+    'bloom_error_rate': 0.001,       # Допустимая доля ложных срабатываний фильтра Блума
+    'found_on_pages_cap': None,      # Сколько страниц-источников хранить на ссылку (None — все, 0 — только счетчик)
+    'link_store_shards': 16,         # Число шардов хранилища ссылок (у каждого своя блокировка)
+    'default_engine': 'threads',     # Движок сканирования: threads или async
+    'async_concurrency': 100,        # Запросов в полете для async движка
+    'max_async_concurrency': 500,    # Верхний предел для параметра concurrency
+    'default_scan_mode': 'sync',     # sync — ответ после сканирования, job — сразу возвращается scan_id
+    'max_concurrent_scans': 4,       # Сколько сканирований выполняется одновременно
+    'max_queued_scans': 20,          # Сколько сканирований может ждать в очереди
+    'global_worker_budget': 40,      # Сумма рабочих всех одновременно запущенных сканирований
+    'job_result_retention': 50,      # Сколько завершенных заданий хранить для /api/scan/<id>/result
+    'progress_interval': 0.5,        # Не чаще одного снимка прогресса за столько секунд
+    'progress_buffer_size': 100,     # Сколько последних снимков хранится для подписчиков
+    'sse_keepalive': 15,             # Интервал keep-alive комментариев в потоке событий
+    'persist_scans': True,           # Сохранять страницы, ссылки и связи сканирований в SQLite
+    'scan_store_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scans.db'),
+    'scan_store_batch_size': 500,    # Сколько записей писатель сохраняет одной транзакцией
+    'scan_store_flush_interval': 0.5,  # Максимальная задержка записи пачки, секунды
+    'scan_store_queue_size': 10000,  # Предел очереди записи (дальше рабочие ждут писателя)
+    'http_pool_hosts': 100,          # Сколько хостов держат открытые пулы соединений
+    'http_pool_maxsize': 40,         # Keep-alive соединений на хост (по общему бюджету рабочих)
+    'max_body_size': 5 * 1024 * 1024,  # Максимальный размер загружаемого тела страницы, байты
+    'http_version': '1.1',           # Протокол движка threads: '1.1' (requests) или '2' (httpx + h2)
+    'dns_cache_ttl': 300,            # Время жизни записей общего кеша DNS, секунды
+    'conditional_requests': True,    # If-None-Match/If-Modified-Since по валидаторам прошлых сканирований
+    'adaptive_concurrency': True,    # AIMD-регулировка числа одновременных запросов по ответам сервера
+    'adaptive_growth': 2,            # Во сколько раз предел может превысить начальное число рабочих
+    'adaptive_decrease': 0.5,        # Множитель предела при перегрузке сервера
+    'adaptive_error_threshold': 0.1,  # Доля 429/503/таймаутов в окне, после которой предел снижается
+    'adaptive_latency_tolerance': 2.0,  # Во сколько раз p90 окна может превысить лучший прошлый
+    'adaptive_window': 10,           # Минимум ответов в окне регулятора
+    'max_retry_after': 120,          # Дольше этого Retry-After не соблюдается, секунды
+    'retry_max_attempts': 3,         # Повторов одного URL после временной ошибки (0 — без повторов)
+    'retry_backoff_base': 0.5,       # Задержка перед первым повтором, секунды (дальше удваивается)
+    'retry_backoff_max': 30,         # Предел задержки между повторами, секунды
+    'retry_statuses': (429, 500, 502, 503, 504),  # Коды ответа, после которых URL повторяется
+    'respect_robots': True,          # Не загружать URL, запрещенные robots.txt
+    'robots_cache_ttl': 3600,        # Время жизни разобранного robots.txt в общем кеше, секунды
+    'robots_error_ttl': 60,          # То же, если robots.txt не загрузился (сеть, 5xx)
+    'robots_product_token': 'SiteScanner',  # Имя краулера для групп User-agent в robots.txt
+    'use_sitemaps': True,            # Засевать фронтир страницами из sitemap.xml
+    'sitemap_depth': 1,              # Глубина, с которой страницы из sitemap попадают во фронтир
+    'sitemap_max_urls': 10000,       # Сколько URL читать из sitemap за сканирование
+    'sitemap_max_files': 50,         # Сколько файлов sitemap (с индексами) загружать
+    'sitemap_max_bytes': 50 * 1024 * 1024,  # Предел размера файла sitemap после распаковки, байты
+    'sitemap_timeout': 30,           # Общий лимит на загрузку sitemap перед стартом, секунды
+    'crawl_strategy': 'bfs',         # Порядок обхода: bfs, dfs, inlinks, shortest или sitemap
+    'near_duplicate_detection': True,  # SimHash текста страниц для поиска почти дубликатов
+    'simhash_shingle_size': 3,       # Слов в шингле
+    'simhash_max_shingles': 2000,    # Сколько уникальных шинглов страницы учитывать
+    'simhash_distance': 3,           # Расстояние Хэмминга, до которого страницы считаются дублями
+    'near_duplicate_action': 'deprioritize',  # Ссылки со страниц-дублей: deprioritize или drop
+    'trap_min_duplicates': 5,        # Дублей одного шаблона URL, после которых он считается ловушкой
+    'trap_duplicate_ratio': 0.5,     # Доля дублей среди страниц шаблона для ловушки
+    'canonical_sort_query': True,    # Сортировать ключи query при нормализации URL
+    # Параметры отслеживания, удаляемые из URL (* — любой суффикс имени)
+    'canonical_drop_params': ('utm_*', 'gclid', 'dclid', 'fbclid', 'yclid', 'msclkid',
+                              'mc_cid', 'mc_eid', '_openstat', '_ga', '_gl'),
+    'crawl_include': (),             # Шаблоны пути (с * и $), вне которых ссылки не загружаются
+    'crawl_exclude': (),             # Шаблоны пути, ссылки по которым не загружаются
+    'checkpoint_enabled': True,      # Сохранять контрольные точки для возобновления сканирования
+    'checkpoint_interval': 30,       # Секунд между контрольными точками
+    # Каталог контрольных точок
+    'checkpoint_dir': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'checkpoints')
 }
\ No newline at end of file
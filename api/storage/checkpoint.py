@@ -0,0 +1,50 @@
+import json
+import os
+import re
+import zlib
+from config import APP_CONFIG
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path(scan_id):
+    """Путь к файлу контрольной точки сканирования"""
+    # scan_id приходит из URL запроса — не даем выйти за пределы каталога
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', scan_id)
+    return os.path.join(APP_CONFIG['checkpoint_dir'], f"{safe_id}.ckpt")
+
+
+def save_checkpoint(scan_id, state):
+    """Атомарно записывает контрольную точку (JSON, сжатый zlib)"""
+    path = checkpoint_path(scan_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = zlib.compress(json.dumps(dict(state, version=CHECKPOINT_VERSION),
+                                    separators=(',', ':')).encode('utf-8'), 6)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Старая точка заменяется только целиком записанной новой
+    os.replace(temp_path, path)
+    return len(data)
+
+
+def load_checkpoint(scan_id):
+    """Читает контрольную точку; None, если ее нет"""
+    path = checkpoint_path(scan_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        state = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия контрольной точки: {state.get('version')}")
+    return state
+
+
+def delete_checkpoint(scan_id):
+    """Удаляет контрольную точку, если она есть"""
+    try:
+        os.remove(checkpoint_path(scan_id))
+    except FileNotFoundError:
+        pass
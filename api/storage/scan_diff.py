@@ -0,0 +1,133 @@
+# Разница между двумя сохраненными сканированиями.
+# Страницы и связи обоих сканирований читаются курсорами, упорядоченными по ID
+# из таблицы urls (общей для всех сканирований), и сливаются за один проход:
+# в памяти только текущие строки и ограниченные выборки примеров.
+
+PAGES_SQL = ('SELECT url_id, success, status_code, content_hash FROM pages '
+             'WHERE scan_id = ? ORDER BY url_id')
+
+# Связи сравниваются только для страниц, загруженных в обоих сканированиях,
+# иначе каждая добавленная или удаленная страница дала бы шум из всех своих ссылок
+EDGES_SQL = ('SELECT e.source_id, e.target_id FROM edges e WHERE e.scan_id = ? AND EXISTS '
+             '(SELECT 1 FROM pages p WHERE p.scan_id = ? AND p.url_id = e.source_id) '
+             'ORDER BY e.source_id, e.target_id')
+
+SECTIONS = ('added_pages', 'removed_pages', 'status_changed', 'content_changed',
+            'newly_broken', 'links_added', 'links_removed')
+
+
+def merge_sorted(left, right, key):
+    """Сливает два отсортированных по key потока: (ключ, строка слева или None, строка справа или None)"""
+    left_row = next(left, None)
+    right_row = next(right, None)
+    while left_row is not None or right_row is not None:
+        if right_row is None or (left_row is not None and key(left_row) < key(right_row)):
+            yield key(left_row), left_row, None
+            left_row = next(left, None)
+        elif left_row is None or key(right_row) < key(left_row):
+            yield key(right_row), None, right_row
+            right_row = next(right, None)
+        else:
+            yield key(left_row), left_row, right_row
+            left_row = next(left, None)
+            right_row = next(right, None)
+
+
+def _is_broken(row):
+    """Страница загружена с ошибкой или ответом 4xx/5xx"""
+    return not row[1] or (row[2] or 0) >= 400
+
+
+class ScanDiff:
+    """Счетчики изменений и первые limit примеров каждого вида"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.sections = {name: {'count': 0, 'items': []} for name in SECTIONS}
+        self.pages = {'base': 0, 'compared': 0, 'unchanged': 0}
+
+    def add(self, section, item):
+        entry = self.sections[section]
+        entry['count'] += 1
+        if len(entry['items']) < self.limit:
+            entry['items'].append(item)
+
+    def compare_pages(self, base_rows, other_rows):
+        for url_id, old, new in merge_sorted(base_rows, other_rows, key=lambda row: row[0]):
+            if old is not None:
+                self.pages['base'] += 1
+            if new is not None:
+                self.pages['compared'] += 1
+
+            if old is None:
+                self.add('added_pages', {'url_id': url_id, 'status_code': new[2]})
+                if _is_broken(new):
+                    self.add('newly_broken', {'url_id': url_id, 'old_status': None, 'new_status': new[2]})
+                continue
+            if new is None:
+                self.add('removed_pages', {'url_id': url_id, 'status_code': old[2]})
+                continue
+
+            changed = False
+            if old[1] != new[1] or old[2] != new[2]:
+                changed = True
+                self.add('status_changed', {'url_id': url_id, 'old_status': old[2], 'new_status': new[2]})
+            # Без отпечатка (старые записи) изменение содержимого не определить
+            if old[3] and new[3] and old[3] != new[3]:
+                changed = True
+                self.add('content_changed', {'url_id': url_id})
+            if _is_broken(new) and not _is_broken(old):
+                self.add('newly_broken', {'url_id': url_id, 'old_status': old[2], 'new_status': new[2]})
+            if not changed:
+                self.pages['unchanged'] += 1
+
+    def compare_edges(self, base_rows, other_rows):
+        for (source_id, target_id), old, new in merge_sorted(base_rows, other_rows, key=tuple):
+            if old is None:
+                self.add('links_added', {'source_id': source_id, 'target_id': target_id})
+            elif new is None:
+                self.add('links_removed', {'source_id': source_id, 'target_id': target_id})
+
+
+def _resolve_urls(conn, url_ids):
+    """URL по ID пачками (только для попавших в выборку примеров)"""
+    url_ids = sorted(url_ids)
+    urls = {}
+    for start in range(0, len(url_ids), 500):
+        chunk = url_ids[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for row in conn.execute(f'SELECT id, url FROM urls WHERE id IN ({placeholders})', chunk):
+            urls[row[0]] = row[1]
+    return urls
+
+
+def diff_scans(conn, scan_id, other_id, limit=100):
+    """Изменения от сканирования scan_id к other_id"""
+    diff = ScanDiff(limit)
+    diff.compare_pages(iter(conn.execute(PAGES_SQL, (scan_id,))),
+                       iter(conn.execute(PAGES_SQL, (other_id,))))
+    diff.compare_edges(iter(conn.execute(EDGES_SQL, (scan_id, other_id))),
+                       iter(conn.execute(EDGES_SQL, (other_id, scan_id))))
+
+    # Для новых поломок — сколько страниц нового сканирования на них ссылаются
+    for item in diff.sections['newly_broken']['items']:
+        item['found_on_count'] = conn.execute(
+            'SELECT COUNT(*) FROM edges WHERE scan_id = ? AND target_id = ?', (other_id, item['url_id'])
+        ).fetchone()[0]
+
+    # ID заменяются на URL только у примеров
+    id_keys = {'url_id': 'url', 'source_id': 'source', 'target_id': 'target'}
+    items = [item for section in diff.sections.values() for item in section['items']]
+    urls = _resolve_urls(conn, {item[key] for item in items for key in id_keys if key in item})
+    for item in items:
+        for key, name in id_keys.items():
+            if key in item:
+                item[name] = urls.get(item.pop(key))
+
+    return {
+        'base_scan_id': scan_id,
+        'compared_scan_id': other_id,
+        'pages': diff.pages,
+        'changes': diff.sections,
+        'limit': limit
+    }
@@ -0,0 +1,393 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from config import APP_CONFIG
+from utils.resource_detector import get_status_code_category
+from storage.scan_diff import diff_scans
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS urls (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS scans (
+        scan_id TEXT PRIMARY KEY,
+        domain TEXT NOT NULL,
+        base_domain TEXT NOT NULL,
+        engine TEXT,
+        status TEXT NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        configuration TEXT,
+        summary TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_scans_domain ON scans (base_domain, started_at)",
+    """CREATE TABLE IF NOT EXISTS pages (
+        scan_id TEXT NOT NULL,
+        url_id INTEGER NOT NULL,
+        depth INTEGER,
+        success INTEGER NOT NULL,
+        status_code INTEGER,
+        status_category TEXT,
+        content_type TEXT,
+        page_type TEXT,
+        page_size_kb REAL,
+        processing_time REAL,
+        device TEXT,
+        slave_id TEXT,
+        title TEXT,
+        error_type TEXT,
+        error TEXT,
+        links_count INTEGER,
+        fetched_at REAL,
+        content_hash TEXT,
+        PRIMARY KEY (scan_id, url_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_pages_status ON pages (scan_id, status_code)",
+    """CREATE TABLE IF NOT EXISTS links (
+        scan_id TEXT NOT NULL,
+        url_id INTEGER NOT NULL,
+        domain TEXT,
+        link_type TEXT,
+        resource_type TEXT,
+        element TEXT,
+        text TEXT,
+        found_on_count INTEGER,
+        first_seen_at TEXT,
+        PRIMARY KEY (scan_id, url_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_links_resource_type ON links (scan_id, resource_type)",
+    "CREATE INDEX IF NOT EXISTS idx_links_domain ON links (scan_id, domain)",
+    """CREATE TABLE IF NOT EXISTS edges (
+        scan_id TEXT NOT NULL,
+        source_id INTEGER NOT NULL,
+        target_id INTEGER NOT NULL,
+        PRIMARY KEY (scan_id, source_id, target_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_edges_target ON edges (scan_id, target_id)",
+    """CREATE TABLE IF NOT EXISTS validators (
+        url_id INTEGER PRIMARY KEY,
+        base_domain TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        content_type TEXT,
+        page_size_kb REAL,
+        page BLOB,
+        updated_at REAL
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_validators_domain ON validators (base_domain)",
+)
+
+# Колонки, добавленные после первой версии схемы: (таблица, колонка, тип)
+MIGRATIONS = (
+    ('pages', 'content_hash', 'TEXT'),
+)
+
+# Сколько URL держать в кеше ID писателя, прежде чем сбросить его
+URL_CACHE_LIMIT = 100_000
+
+
+class ScanStore:
+    """Хранилище сканирований в SQLite (WAL).
+
+    Все записи идут через очередь в один поток-писатель, который складывает
+    их пачками в одну транзакцию. Очередь ограничена, поэтому при медленном
+    диске рабочие притормаживают, а не копят результаты в памяти. Чтение
+    идет через отдельные соединения и не блокирует писателя.
+    """
+
+    def __init__(self, path=None, batch_size=None, flush_interval=None, queue_size=None):
+        self.path = path or APP_CONFIG['scan_store_path']
+        self.batch_size = batch_size or APP_CONFIG['scan_store_batch_size']
+        self.flush_interval = flush_interval or APP_CONFIG['scan_store_flush_interval']
+        self.queue = queue.Queue(maxsize=queue_size or APP_CONFIG['scan_store_queue_size'])
+        self.url_ids = {}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._migrate(conn)
+        conn.close()
+
+        self.thread = threading.Thread(target=self._write_loop, name='scan-store-writer', daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _migrate(conn):
+        """Добавляет в существующую базу колонки новых версий схемы"""
+        for table, column, column_type in MIGRATIONS:
+            columns = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if column not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # --- Запись (вызывается из потоков сканирования) ---
+
+    def scan_started(self, scan_id, domain, base_domain, engine, configuration=None):
+        """Регистрирует начало сканирования"""
+        self.queue.put(('scan_started', (scan_id, domain, base_domain, engine, time.time(),
+                                         json.dumps(configuration or {}, default=str))))
+
+    def add_page(self, scan_id, result, link_urls):
+        """Ставит в очередь запись страницы и ее исходящих ссылок"""
+        if result['success']:
+            status_category = get_status_code_category(result['status_code'])
+        else:
+            status_category = 'error'
+        row = (
+            result['url'], result.get('depth'), int(bool(result['success'])), result.get('status_code'),
+            status_category, result.get('content_type'), result.get('page_type'),
+            result.get('page_size_kb'), result.get('processing_time'), result.get('device_used'),
+            result.get('slave_id'), result.get('title'), result.get('error_type'), result.get('error'),
+            len(result.get('links', ())), time.time(), result.get('content_hash')
+        )
+        self.queue.put(('page', (scan_id, row, link_urls)))
+
+    def add_links(self, scan_id, link_records):
+        """Ставит в очередь описания уникальных ссылок пачками по batch_size"""
+        batch = []
+        for record in link_records:
+            batch.append((
+                record['url'], urlparse(record['url']).netloc, record['type'], record['resource_type'],
+                record['element'], record['text'], record['found_on_pages_count'], record['first_seen_at']
+            ))
+            if len(batch) >= self.batch_size:
+                self.queue.put(('links', (scan_id, batch)))
+                batch = []
+        if batch:
+            self.queue.put(('links', (scan_id, batch)))
+
+    def scan_finished(self, scan_id, status, summary):
+        """Сохраняет итог сканирования"""
+        self.queue.put(('scan_finished', (scan_id, status, time.time(), json.dumps(summary, default=str))))
+
+    def save_validator(self, url, base_domain, etag, last_modified, content_type, page_size_kb, page):
+        """Ставит в очередь валидаторы страницы и ее сжатое содержимое (ссылки, заголовок, мета)"""
+        self.queue.put(('validator', (url, (base_domain, etag, last_modified, content_type,
+                                            page_size_kb, page, time.time()))))
+
+    def flush(self, timeout=None):
+        """Ждет, пока писатель сохранит все, что было поставлено в очередь до вызова"""
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        return done.wait(timeout)
+
+    # --- Поток-писатель ---
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            flushed = [payload for operation, payload in batch if operation == 'flush']
+            try:
+                with conn:
+                    for operation, payload in batch:
+                        if operation != 'flush':
+                            getattr(self, f'_write_{operation}')(conn, *payload)
+            except Exception as e:
+                # Транзакция пачки откачена: повторяем записи по одной, чтобы потерять только ошибочные
+                print(f"Ошибка записи пачки в хранилище сканирований: {e}, повтор по одной записи")
+                self.url_ids.clear()
+                self._write_one_by_one(conn, batch)
+            for event in flushed:
+                event.set()
+
+    def _write_one_by_one(self, conn, batch):
+        """Записывает операции пачки (и строки пачек ссылок) в отдельных транзакциях"""
+        for operation, payload in batch:
+            if operation == 'flush':
+                continue
+            if operation == 'links':
+                scan_id, rows = payload
+                items = [(scan_id, [row]) for row in rows]
+            else:
+                items = [payload]
+            for item in items:
+                try:
+                    with conn:
+                        getattr(self, f'_write_{operation}')(conn, *item)
+                except Exception as e:
+                    # ID URL из откаченной транзакции могли попасть в кеш
+                    self.url_ids.clear()
+                    print(f"Потеряна запись {operation} ({self._describe_item(operation, item)}): {e}")
+
+    @staticmethod
+    def _describe_item(operation, item):
+        """Сканирование и URL записи для сообщения об ошибке"""
+        if operation in ('page', 'links'):
+            row = item[1] if operation == 'page' else item[1][0]
+            return f"scan {item[0]}, {row[0]}"
+        if operation == 'validator':
+            return item[0]
+        return f"scan {item[0]}"
+
+    def _url_id(self, conn, url):
+        url_id = self.url_ids.get(url)
+        if url_id is None:
+            if len(self.url_ids) >= URL_CACHE_LIMIT:
+                self.url_ids.clear()
+            conn.execute('INSERT OR IGNORE INTO urls (url) VALUES (?)', (url,))
+            url_id = conn.execute('SELECT id FROM urls WHERE url = ?', (url,)).fetchone()[0]
+            self.url_ids[url] = url_id
+        return url_id
+
+    def _write_scan_started(self, conn, scan_id, domain, base_domain, engine, started_at, configuration):
+        conn.execute(
+            'INSERT OR REPLACE INTO scans (scan_id, domain, base_domain, engine, status, started_at, configuration) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (scan_id, domain, base_domain, engine, 'running', started_at, configuration)
+        )
+
+    def _write_page(self, conn, scan_id, row, link_urls):
+        url_id = self._url_id(conn, row[0])
+        conn.execute(
+            'INSERT OR REPLACE INTO pages (scan_id, url_id, depth, success, status_code, status_category, '
+            'content_type, page_type, page_size_kb, processing_time, device, slave_id, title, error_type, '
+            'error, links_count, fetched_at, content_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (scan_id, url_id) + row[1:]
+        )
+        if link_urls:
+            conn.executemany(
+                'INSERT OR IGNORE INTO edges (scan_id, source_id, target_id) VALUES (?, ?, ?)',
+                [(scan_id, url_id, self._url_id(conn, target)) for target in link_urls]
+            )
+
+    def _write_links(self, conn, scan_id, rows):
+        conn.executemany(
+            'INSERT OR REPLACE INTO links (scan_id, url_id, domain, link_type, resource_type, element, text, '
+            'found_on_count, first_seen_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(scan_id, self._url_id(conn, row[0])) + row[1:] for row in rows]
+        )
+
+    def _write_validator(self, conn, url, row):
+        conn.execute(
+            'INSERT OR REPLACE INTO validators (url_id, base_domain, etag, last_modified, content_type, '
+            'page_size_kb, page, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self._url_id(conn, url),) + row
+        )
+
+    def _write_scan_finished(self, conn, scan_id, status, finished_at, summary):
+        conn.execute(
+            'UPDATE scans SET status = ?, finished_at = ?, summary = ? WHERE scan_id = ?',
+            (status, finished_at, summary, scan_id)
+        )
+
+    # --- Чтение ---
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def get_scan(self, scan_id):
+        """Сканирование с итоговой статистикой или None"""
+        rows = self._query('SELECT * FROM scans WHERE scan_id = ?', (scan_id,))
+        if not rows:
+            return None
+        scan = rows[0]
+        for key in ('configuration', 'summary'):
+            scan[key] = json.loads(scan[key]) if scan[key] else None
+        return scan
+
+    def list_scans(self, base_domain=None, limit=50, offset=0):
+        """Последние сканирования (по домену, если указан)"""
+        sql = 'SELECT scan_id, domain, base_domain, engine, status, started_at, finished_at FROM scans'
+        params = []
+        if base_domain:
+            sql += ' WHERE base_domain = ?'
+            params.append(base_domain)
+        sql += ' ORDER BY started_at DESC LIMIT ? OFFSET ?'
+        return self._query(sql, params + [limit, offset])
+
+    def get_pages(self, scan_id, status_code=None, status_category=None, limit=100, offset=0):
+        """Страницы сканирования с фильтром по коду или категории ответа"""
+        sql = 'SELECT u.url, p.* FROM pages p JOIN urls u ON u.id = p.url_id WHERE p.scan_id = ?'
+        params = [scan_id]
+        if status_code is not None:
+            sql += ' AND p.status_code = ?'
+            params.append(status_code)
+        if status_category:
+            sql += ' AND p.status_category = ?'
+            params.append(status_category)
+        sql += ' ORDER BY p.url_id LIMIT ? OFFSET ?'
+        return self._query(sql, params + [limit, offset])
+
+    def get_links(self, scan_id, resource_type=None, domain=None, link_type=None, limit=100, offset=0):
+        """Уникальные ссылки сканирования с фильтром по типу ресурса, домену и типу ссылки"""
+        sql = 'SELECT u.url, l.* FROM links l JOIN urls u ON u.id = l.url_id WHERE l.scan_id = ?'
+        params = [scan_id]
+        if resource_type:
+            sql += ' AND l.resource_type = ?'
+            params.append(resource_type)
+        if domain:
+            sql += ' AND l.domain = ?'
+            params.append(domain)
+        if link_type:
+            sql += ' AND l.link_type = ?'
+            params.append(link_type)
+        sql += ' ORDER BY l.url_id LIMIT ? OFFSET ?'
+        return self._query(sql, params + [limit, offset])
+
+    def diff_scans(self, scan_id, other_id, limit=100):
+        """Изменения страниц и ссылок от сканирования scan_id к other_id"""
+        conn = self._connect()
+        try:
+            return diff_scans(conn, scan_id, other_id, limit)
+        finally:
+            conn.close()
+
+    def load_validators(self, base_domain):
+        """Валидаторы всех страниц домена: {url: запись}"""
+        rows = self._query(
+            'SELECT u.url, v.etag, v.last_modified, v.content_type, v.page_size_kb, v.page '
+            'FROM validators v JOIN urls u ON u.id = v.url_id WHERE v.base_domain = ?',
+            (base_domain,)
+        )
+        return {row.pop('url'): row for row in rows}
+
+    def get_inlinks(self, scan_id, url, limit=100, offset=0):
+        """Страницы сканирования, ссылающиеся на URL"""
+        return self._query(
+            'SELECT s.url FROM edges e JOIN urls t ON t.id = e.target_id JOIN urls s ON s.id = e.source_id '
+            'WHERE e.scan_id = ? AND t.url = ? ORDER BY e.source_id LIMIT ? OFFSET ?',
+            (scan_id, url, limit, offset)
+        )
+
+
+_scan_store = None
+_scan_store_lock = threading.Lock()
+
+
+def get_scan_store():
+    """Возвращает общее для процесса хранилище (создается при первом обращении)"""
+    global _scan_store
+    with _scan_store_lock:
+        if _scan_store is None:
+            _scan_store = ScanStore()
+        return _scan_store
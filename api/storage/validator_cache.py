@@ -0,0 +1,64 @@
+import json
+import zlib
+
+
+def _header(headers, name):
+    """Значение заголовка без учета регистра имени"""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class ValidatorCache:
+    """Валидаторы HTTP (ETag/Last-Modified) страниц домена из прошлых сканирований.
+
+    Загружаются одним запросом при старте сканирования. Рабочие отправляют по
+    ним условные запросы, а на 304 берут ссылки, заголовок и мета-теги из кеша
+    без загрузки тела и разбора. Новые валидаторы уходят в поток-писатель
+    хранилища и будут использованы следующим сканированием.
+    """
+
+    def __init__(self, store, base_domain):
+        self.store = store
+        self.base_domain = base_domain
+        self.entries = store.load_validators(base_domain)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def request_headers(self, url):
+        """Заголовки условного запроса для URL (пустой словарь, если валидаторов нет)"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def cached_page(self, url):
+        """Сохраненная страница для ответа 304 или None"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        page = json.loads(zlib.decompress(entry['page']).decode('utf-8'))
+        page['content_type'] = entry['content_type']
+        page['page_size_kb'] = entry['page_size_kb']
+        return page
+
+    def remember(self, url, result):
+        """Сохраняет валидаторы и разобранное содержимое успешно загруженной страницы"""
+        headers = result.get('headers') or {}
+        etag = _header(headers, 'ETag')
+        last_modified = _header(headers, 'Last-Modified')
+        if not etag and not last_modified:
+            return
+        page = {'links': result.get('links', []), 'title': result.get('title'), 'meta': result.get('meta', {}),
+                'content_hash': result.get('content_hash')}
+        blob = zlib.compress(json.dumps(page, separators=(',', ':')).encode('utf-8'), 6)
+        self.store.save_validator(url, self.base_domain, etag, last_modified,
+                                  result.get('content_type', ''), result.get('page_size_kb', 0), blob)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули API импортируются от каталога api, как при запуске api.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import time
+from email.utils import formatdate
+import pytest
+from config import APP_CONFIG
+from workers.concurrency import AdaptiveConcurrency, parse_retry_after
+
+
+def ok(processing_time=0.01):
+    return {'processing_time': processing_time, 'status_code': 200}
+
+
+def fill_window(limiter, result):
+    for _ in range(max(limiter.min_window, limiter.limit)):
+        limiter.record(dict(result))
+
+
+def saturate(limiter):
+    while limiter.try_acquire():
+        pass
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after(' 5 ') == 5
+    assert parse_retry_after('999999') == APP_CONFIG['max_retry_after']
+    assert parse_retry_after('not a date') is None
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    # Дата в прошлом — ждать не нужно
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0
+
+
+def test_additive_increase_only_when_saturated():
+    limiter = AdaptiveConcurrency(2, 4)
+    fill_window(limiter, ok())
+    assert limiter.limit == 2
+
+    saturate(limiter)
+    fill_window(limiter, ok())
+    assert limiter.limit == 3
+    assert limiter.increases == 1
+
+
+def test_increase_stops_at_max_limit():
+    limiter = AdaptiveConcurrency(2, 3)
+    for _ in range(5):
+        saturate(limiter)
+        fill_window(limiter, ok())
+    assert limiter.limit == 3
+
+
+def test_multiplicative_decrease_on_errors():
+    limiter = AdaptiveConcurrency(8, 8)
+    fill_window(limiter, {'processing_time': 0.01, 'status_code': 503})
+    assert limiter.limit == int(8 * APP_CONFIG['adaptive_decrease'])
+    assert limiter.history[-1]['reason'] == 'errors'
+
+
+def test_decrease_on_latency_against_baseline():
+    limiter = AdaptiveConcurrency(8, 8)
+    fill_window(limiter, ok(0.1))
+    assert limiter.baseline == pytest.approx(0.1, rel=0.05)
+    fill_window(limiter, ok(0.1 * APP_CONFIG['adaptive_latency_tolerance'] * 2))
+    assert limiter.limit == 4
+    assert limiter.history[-1]['reason'] == 'latency'
+
+
+def test_retry_after_decreases_immediately_once():
+    limiter = AdaptiveConcurrency(8, 8)
+    limiter.record({'processing_time': 0.01, 'status_code': 429, 'retry_after': 5})
+    assert limiter.limit == 4
+    # Ответ на запрос, начатый до снижения, не снижает предел повторно
+    limiter.record({'processing_time': 10, 'status_code': 429, 'retry_after': 5})
+    assert limiter.limit == 4
+    assert limiter.retry_after_responses == 2
+
+
+def test_decrease_respects_min_limit():
+    limiter = AdaptiveConcurrency(2, 2, min_limit=2)
+    limiter.record({'processing_time': 0, 'retry_after': 1})
+    assert limiter.limit == 2
+
+
+def test_disabled_limiter_keeps_limit():
+    limiter = AdaptiveConcurrency(4, 8, enabled=False)
+    fill_window(limiter, {'processing_time': 0.01, 'status_code': 503})
+    assert limiter.limit == 4
+
+
+def test_acquire_release_and_cap():
+    limiter = AdaptiveConcurrency(2, 10)
+    assert limiter.acquire(timeout=0)
+    assert limiter.try_acquire()
+    assert not limiter.acquire(timeout=0)
+    limiter.release()
+    assert limiter.try_acquire()
+
+    limiter.cap(1)
+    assert (limiter.limit, limiter.max_limit, limiter.min_limit) == (1, 1, 1)
+    assert limiter.describe()['in_use'] == 2
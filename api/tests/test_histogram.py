@@ -0,0 +1,58 @@
+import pytest
+from utils.histogram import LatencyHistogram, GROWTH
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    assert histogram.mean() == 0
+    assert histogram.summary()['count'] == 0
+
+
+def test_percentiles_within_bucket_error():
+    histogram = LatencyHistogram()
+    values = [i / 1000 for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+
+    for percent, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert expected <= histogram.percentile(percent) <= expected * GROWTH
+    assert histogram.percentile(100) == 1.0
+    assert histogram.mean() == pytest.approx(sum(values) / len(values))
+
+
+def test_percentile_never_exceeds_max():
+    histogram = LatencyHistogram()
+    histogram.record(0.123)
+    assert histogram.percentile(99) == 0.123
+
+
+def test_tiny_and_huge_values_are_clamped_to_edge_buckets():
+    histogram = LatencyHistogram()
+    histogram.record(0)
+    histogram.record(10 * 3600)
+    assert histogram.count == 2
+    assert histogram.percentile(50) < 0.001
+    assert histogram.percentile(100) == 10 * 3600
+
+
+def test_merge_equals_single_histogram():
+    left, right, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 200):
+        value = i / 100
+        (left if i % 2 else right).record(value)
+        combined.record(value)
+
+    merged = left.merge(right)
+    assert merged.buckets == combined.buckets
+    assert merged.count == combined.count
+    assert merged.max_value == combined.max_value
+    assert merged.summary() == combined.summary()
+
+
+def test_dump_load_roundtrip():
+    histogram = LatencyHistogram()
+    for value in (0.01, 0.02, 0.5, 3.0):
+        histogram.record(value)
+    restored = LatencyHistogram.load(histogram.dump())
+    assert restored.summary() == histogram.summary()
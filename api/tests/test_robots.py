@@ -0,0 +1,65 @@
+from utils.robots import RobotsFile, RobotsRules
+
+ROBOTS = """
+User-agent: *
+Disallow: /private
+Crawl-delay: 1
+
+User-agent: SiteScanner/2.0
+User-agent: OtherBot
+Disallow: /tmp
+Allow: /tmp/public
+Crawl-delay: 3
+
+# Одноименная группа объединяется с первой
+User-agent: sitescanner
+Disallow: /*.pdf$
+
+Sitemap: https://example.com/sitemap.xml
+"""
+
+
+def test_own_group_replaces_wildcard_and_merges_same_name():
+    rules = RobotsFile(ROBOTS).rules_for('SiteScanner')
+    assert rules.crawl_delay == 3
+    assert rules.allowed('https://example.com/private/page')
+    assert not rules.allowed('https://example.com/tmp/file')
+    assert rules.allowed('https://example.com/tmp/public/file')
+    assert not rules.allowed('https://example.com/doc.pdf')
+    assert rules.allowed('https://example.com/doc.pdf?x=1')
+
+
+def test_product_token_is_not_a_substring_match():
+    # "Scanner" не должен совпадать с группой SiteScanner — действуют правила '*'
+    rules = RobotsFile(ROBOTS).rules_for('Scanner')
+    assert rules.crawl_delay == 1
+    assert not rules.allowed('https://example.com/private')
+    assert rules.allowed('https://example.com/tmp/file')
+
+
+def test_no_matching_group_allows_everything():
+    rules = RobotsFile("User-agent: OtherBot\nDisallow: /\n").rules_for('SiteScanner')
+    assert rules.allowed('https://example.com/anything')
+    assert rules.crawl_delay is None
+
+
+def test_sitemaps_and_compiled_rules_cache():
+    robots = RobotsFile(ROBOTS)
+    assert robots.sitemaps == ['https://example.com/sitemap.xml']
+    assert robots.rules_for('SiteScanner') is robots.rules_for('SiteScanner')
+
+
+def test_longest_match_wins_and_allow_breaks_ties():
+    rules = RobotsRules([(False, '/a'), (True, '/a/b'), (False, '/a/b/c'), (True, '/x'), (False, '/x')])
+    assert not rules.allowed('http://h/a/z')
+    assert rules.allowed('http://h/a/b/z')
+    assert not rules.allowed('http://h/a/b/c')
+    assert rules.allowed('http://h/x')
+
+
+def test_wildcards_and_robots_txt_itself():
+    rules = RobotsRules([(False, '/'), (True, '/*?page=*'), (True, '/$')])
+    assert rules.allowed('http://h/')
+    assert rules.allowed('http://h/list?page=2')
+    assert not rules.allowed('http://h/list')
+    assert rules.allowed('http://h/robots.txt')
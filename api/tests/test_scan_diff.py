@@ -0,0 +1,61 @@
+import sqlite3
+from storage.scan_diff import merge_sorted, ScanDiff, diff_scans
+
+
+def test_merge_sorted_pairs_equal_keys():
+    left = iter([(1, 'a'), (3, 'c'), (5, 'e')])
+    right = iter([(2, 'B'), (3, 'C'), (6, 'F')])
+    merged = [(key, old and old[1], new and new[1])
+              for key, old, new in merge_sorted(left, right, key=lambda row: row[0])]
+    assert merged == [(1, 'a', None), (2, None, 'B'), (3, 'c', 'C'), (5, 'e', None), (6, None, 'F')]
+
+
+def test_merge_sorted_empty_sides():
+    assert list(merge_sorted(iter([]), iter([]), key=tuple)) == []
+    assert [key for key, _, _ in merge_sorted(iter([(1, 2)]), iter([]), key=tuple)] == [(1, 2)]
+
+
+def test_compare_pages_sections():
+    # (url_id, success, status_code, content_hash)
+    base = [(1, 1, 200, 'h1'), (2, 1, 200, 'h2'), (3, 1, 200, 'h3'), (4, 1, 200, None), (5, 1, 200, 'h5')]
+    other = [(1, 1, 200, 'h1'), (2, 1, 404, 'h2'), (3, 1, 200, 'x3'), (4, 1, 200, 'h4'), (6, 0, None, None)]
+    diff = ScanDiff(limit=10)
+    diff.compare_pages(iter(base), iter(other))
+
+    counts = {name: section['count'] for name, section in diff.sections.items()}
+    assert counts['added_pages'] == 1
+    assert counts['removed_pages'] == 1
+    assert counts['status_changed'] == 1
+    assert counts['content_changed'] == 1
+    # 404 на существующей странице и новая страница с ошибкой загрузки
+    assert [item['url_id'] for item in diff.sections['newly_broken']['items']] == [2, 6]
+    # Страница без старого отпечатка не считается измененной
+    assert diff.pages == {'base': 5, 'compared': 5, 'unchanged': 2}
+
+
+def test_limit_keeps_counting():
+    diff = ScanDiff(limit=2)
+    diff.compare_edges(iter([]), iter([(1, i) for i in range(5)]))
+    assert diff.sections['links_added']['count'] == 5
+    assert len(diff.sections['links_added']['items']) == 2
+
+
+def test_diff_scans_resolves_urls():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT);
+        CREATE TABLE pages (scan_id TEXT, url_id INTEGER, success INTEGER, status_code INTEGER, content_hash TEXT);
+        CREATE TABLE edges (scan_id TEXT, source_id INTEGER, target_id INTEGER);
+        INSERT INTO urls VALUES (1, 'http://a/'), (2, 'http://a/old'), (3, 'http://a/new');
+        INSERT INTO pages VALUES ('s1', 1, 1, 200, 'h'), ('s1', 2, 1, 200, 'h2'),
+                                 ('s2', 1, 1, 200, 'h'), ('s2', 3, 1, 500, 'h3');
+        INSERT INTO edges VALUES ('s1', 1, 2), ('s2', 1, 3);
+    """)
+    result = diff_scans(conn, 's1', 's2')
+    changes = result['changes']
+    assert changes['removed_pages']['items'] == [{'status_code': 200, 'url': 'http://a/old'}]
+    assert changes['newly_broken']['items'] == [
+        {'old_status': None, 'new_status': 500, 'found_on_count': 1, 'url': 'http://a/new'}]
+    assert changes['links_added']['items'] == [{'source': 'http://a/', 'target': 'http://a/new'}]
+    assert changes['links_removed']['items'] == [{'source': 'http://a/', 'target': 'http://a/old'}]
+    assert result['pages'] == {'base': 2, 'compared': 2, 'unchanged': 1}
@@ -0,0 +1,112 @@
+import queue
+import pytest
+from workers import scheduler as scheduler_module
+from workers.scheduler import PolitenessScheduler
+from workers.crawl_strategy import DepthFirst, InLinksFirst
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(scheduler_module, 'time', fake)
+    return fake
+
+
+def drain(frontier):
+    items = []
+    while True:
+        try:
+            items.append(frontier.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def test_breadth_first_within_host(clock):
+    frontier = PolitenessScheduler(default_delay=0)
+    for url, depth in (('http://a/2', 2), ('http://a/1', 1), ('http://a/1b', 1), ('http://a/0', 0)):
+        frontier.put((url, depth))
+    assert [url for url, _ in drain(frontier)] == ['http://a/0', 'http://a/1', 'http://a/1b', 'http://a/2']
+
+
+def test_strategy_and_penalty_order(clock):
+    frontier = PolitenessScheduler(default_delay=0, strategy=DepthFirst())
+    frontier.put(('http://a/dup', 5), penalty=1)
+    frontier.put(('http://a/shallow', 1))
+    frontier.put(('http://a/deep', 3))
+    # Страницы со штрафом идут после всех остальных, даже если глубже
+    assert [url for url, _ in drain(frontier)] == ['http://a/deep', 'http://a/shallow', 'http://a/dup']
+
+
+def test_reprioritize_moves_pending_url(clock):
+    inlinks = {}
+    frontier = PolitenessScheduler(default_delay=0, strategy=InLinksFirst(lambda url: inlinks.get(url, 0)))
+    frontier.put(('http://a/x', 1))
+    frontier.put(('http://a/y', 1))
+    inlinks['http://a/y'] = 3
+    frontier.reprioritize('http://a/y')
+    assert [url for url, _ in drain(frontier)] == ['http://a/y', 'http://a/x']
+    assert frontier.qsize() == 0
+
+
+def test_crawl_delay_per_host(clock):
+    frontier = PolitenessScheduler(default_delay=1.0, host_delays={'slow': 5.0})
+    frontier.put(('http://slow/1', 0))
+    frontier.put(('http://slow/2', 0))
+    frontier.put(('http://fast/1', 0))
+    frontier.put(('http://fast/2', 0))
+
+    first = {frontier.get_nowait()[0], frontier.get_nowait()[0]}
+    assert first == {'http://slow/1', 'http://fast/1'}
+    # Оба хоста ждут своей задержки
+    with pytest.raises(queue.Empty):
+        frontier.get_nowait()
+    assert frontier.next_ready_in() == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert frontier.get_nowait()[0] == 'http://fast/2'
+    with pytest.raises(queue.Empty):
+        frontier.get_nowait()
+
+    clock.now += 4.0
+    assert frontier.get_nowait()[0] == 'http://slow/2'
+
+
+def test_set_host_delay_and_defer_host(clock):
+    frontier = PolitenessScheduler(default_delay=0)
+    frontier.set_host_delay('a', 2.0)
+    assert frontier.get_host_delay('a') == 2.0
+    assert frontier.get_host_delay('b') == 0
+
+    frontier.put(('http://a/1', 0))
+    frontier.defer_host('a', 10)
+    with pytest.raises(queue.Empty):
+        frontier.get_nowait()
+    clock.now += 10
+    assert frontier.get_nowait()[0] == 'http://a/1'
+
+
+def test_retry_waits_for_delay_and_keeps_task(clock):
+    frontier = PolitenessScheduler(default_delay=0)
+    frontier.put(('http://a/1', 0))
+    item = frontier.get_nowait()
+    frontier.retry(item, 3)
+    assert frontier.retries_pending() == 1
+    assert frontier.snapshot() == [item]
+    with pytest.raises(queue.Empty):
+        frontier.get_nowait()
+
+    clock.now += 3
+    assert frontier.get_nowait() == item
+    frontier.task_done(item[0])
+    assert not frontier.all_tasks_done()
+    frontier.task_done(item[0])
+    assert frontier.all_tasks_done()
+    assert frontier.snapshot() == []
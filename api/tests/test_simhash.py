@@ -0,0 +1,72 @@
+import random
+from utils.simhash import SimHasher, SimHashIndex
+from workers.duplicates import DuplicateDetector, url_pattern
+
+WORDS = ('alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi rho '
+         'sigma tau upsilon phi chi psi omega').split()
+
+
+def text(seed, words=300):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def fingerprint(*chunks):
+    hasher = SimHasher(shingle_size=3, max_shingles=2000)
+    for chunk in chunks:
+        hasher.feed(chunk)
+    return hasher.digest()
+
+
+def distance(left, right):
+    return bin(int(left, 16) ^ int(right, 16)).count('1')
+
+
+def test_chunk_boundaries_do_not_change_fingerprint():
+    page = text(1)
+    whole = fingerprint(page)
+    assert len(whole) == 16
+    assert fingerprint(*(page[i:i + 7] for i in range(0, len(page), 7))) == whole
+
+
+def test_short_text_has_no_fingerprint():
+    assert fingerprint('too few words here') is None
+
+
+def test_small_edit_is_close_and_other_page_is_far():
+    page = text(1)
+    edited = page.replace('alpha', 'ALPHA', 1) + ' footer'
+    assert distance(fingerprint(page), fingerprint(edited)) <= 3
+    assert distance(fingerprint(page), fingerprint(text(2))) > 3
+
+
+def test_index_finds_within_distance_only():
+    index = SimHashIndex(max_distance=3)
+    base = 0x0123456789abcdef
+    index.add(base, 'page')
+    # Отличия в разных блоках: поиск идет через совпавший блок
+    assert index.find(base ^ (1 << 0) ^ (1 << 20) ^ (1 << 40)) == 'page'
+    assert index.find(base ^ (1 << 0) ^ (1 << 20) ^ (1 << 40) ^ (1 << 60)) is None
+    assert index.size == 1
+
+
+def test_url_pattern():
+    assert url_pattern('http://a/cal/2024/05?day=3&view=m') == '/cal/{n}/{n}?day&view'
+    assert url_pattern('http://a/cal/1999/1?view=m&day=9') == '/cal/{n}/{n}?day&view'
+    assert url_pattern('http://a') == '/'
+
+
+def test_detector_marks_trap_pattern():
+    detector = DuplicateDetector(max_distance=3)
+    page = fingerprint(text(1))
+    assert detector.check('http://a/cal/0', page) is None
+    for day in range(1, detector.trap_min_duplicates):
+        assert detector.check(f'http://a/cal/{day}', page) == 'http://a/cal/0'
+    assert not detector.is_trap('http://a/cal/99')
+
+    detector.check(f'http://a/cal/{detector.trap_min_duplicates}', page)
+    assert detector.is_trap('http://a/cal/99')
+    assert not detector.is_trap('http://a/news/1')
+    described = detector.describe()
+    assert described['near_duplicates'] == detector.trap_min_duplicates
+    assert described['trap_patterns'][0]['pattern'] == '/cal/{n}'
@@ -0,0 +1,42 @@
+from utils.url_rules import UrlCanonicalizer, UrlFilter, canonical_netloc
+
+
+def test_canonical_netloc():
+    assert canonical_netloc('https', 'Example.COM:443') == 'example.com'
+    assert canonical_netloc('http', 'example.com:443') == 'example.com:443'
+    assert canonical_netloc('http', 'example.com') == 'example.com'
+
+
+def test_canonicalize_drops_fragment_default_port_and_trailing_slash():
+    canonicalizer = UrlCanonicalizer(sort_query=True, drop_params=())
+    assert canonicalizer.canonicalize('HTTP://Example.com:80/Path/#top') == 'http://example.com/Path'
+
+
+def test_query_sorted_stably_and_tracking_params_dropped():
+    canonicalizer = UrlCanonicalizer(sort_query=True, drop_params=('utm_*', 'gclid'))
+    url = 'https://a/p?b=2&utm_source=x&a=1&b=1&GCLID=z&c%20d=3'
+    assert canonicalizer.canonicalize(url) == 'https://a/p?a=1&b=2&b=1&c%20d=3'
+
+
+def test_query_order_kept_without_sorting():
+    canonicalizer = UrlCanonicalizer(sort_query=False, drop_params=('utm_*',))
+    assert canonicalizer.canonicalize('https://a/p?z=1&utm_medium=m&a=2') == 'https://a/p?z=1&a=2'
+    assert canonicalizer.canonicalize('https://a/p?utm_medium=m') == 'https://a/p'
+
+
+def test_filter_include_then_exclude():
+    url_filter = UrlFilter(include=['/blog/*', '/docs'], exclude=['/blog/*/print$', '/*?session='])
+    assert url_filter.active
+    assert url_filter.allowed('https://a/blog/post')
+    assert url_filter.allowed('https://a/docs/intro')
+    assert not url_filter.allowed('https://a/shop')
+    assert not url_filter.allowed('https://a/blog/post/print')
+    assert url_filter.allowed('https://a/blog/post/print/2')
+    assert not url_filter.allowed('https://a/blog/post?session=1')
+
+
+def test_empty_filter_allows_everything():
+    url_filter = UrlFilter(include=(), exclude=())
+    assert not url_filter.active
+    assert url_filter.allowed('https://a/anything?x=1')
+    assert url_filter.describe() == {'include': [], 'exclude': []}
@@ -0,0 +1,187 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TimeoutException(Exception):
+    """Исключение при превышении времени выполнения"""
+    pass
+
+
+class _DeadlineWatchdog:
+    """Один фоновый поток на процесс, вызывающий обработчики истекших сроков.
+
+    В отличие от SIGALRM работает из любого потока и не мешает параллельным
+    сканированиям: у каждой операции свой срок и свои обработчики.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, when, handle):
+        """Ставит обработчик на срабатывание в момент when (time.monotonic)"""
+        with self.condition:
+            heapq.heappush(self.heap, (when, next(self.counter), handle))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='deadline-watchdog', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    wait_time = self.heap[0][0] - time.monotonic() if self.heap else None
+                    self.condition.wait(wait_time)
+                _, _, handle = heapq.heappop(self.heap)
+            handle.fire()
+
+
+_watchdog = _DeadlineWatchdog()
+
+
+class ExpireHandle:
+    """Регистрация обработчика истечения срока; cancel() снимает ее"""
+
+    def __init__(self, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.done = False
+
+    def fire(self):
+        """Вызывает обработчик не более одного раза"""
+        with self.lock:
+            if self.done:
+                return
+            self.done = True
+        self.deadline._forget(self)
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"Ошибка в обработчике срока {self.deadline.name}: {e}")
+
+    def cancel(self):
+        """Отменяет обработчик, если он еще не сработал"""
+        with self.lock:
+            self.done = True
+        self.deadline._forget(self)
+
+
+class Deadline:
+    """Абсолютный срок операции с наследованием от родительского срока.
+
+    Срок URL создается как потомок срока сканирования, поэтому он никогда не
+    переживает сканирование, а отмена сканирования (cancel) сразу делает
+    истекшими все дочерние сроки и вызывает их обработчики.
+    """
+
+    def __init__(self, seconds=None, parent=None, name='operation'):
+        self.name = name
+        self.parent = parent
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        if parent is not None and parent.expires_at is not None:
+            if self.expires_at is None or parent.expires_at < self.expires_at:
+                self.expires_at = parent.expires_at
+        self.cancelled = False
+        self.handles = set()
+        self.lock = threading.Lock()
+
+    def child(self, seconds=None, name=None):
+        """Создает дочерний срок, не превышающий текущий"""
+        return Deadline(seconds, parent=self, name=name or self.name)
+
+    def is_cancelled(self):
+        """Проверяет, отменен ли срок или любой из его родителей"""
+        deadline = self
+        while deadline is not None:
+            if deadline.cancelled:
+                return True
+            deadline = deadline.parent
+        return False
+
+    def remaining(self):
+        """Оставшееся время в секундах (None если срок не ограничен)"""
+        if self.is_cancelled():
+            return 0
+        if self.expires_at is None:
+            return None
+        return max(0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """Проверяет, истек ли срок"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def timeout_for(self, limit):
+        """Таймаут для блокирующего вызова: не больше limit и не больше остатка срока"""
+        remaining = self.remaining()
+        if remaining is None:
+            return limit
+        if limit is None:
+            return remaining
+        return min(limit, remaining)
+
+    def check(self, stage=None):
+        """Бросает TimeoutException, если срок истек"""
+        if self.expired():
+            reason = 'отменена' if self.is_cancelled() else 'превысила срок'
+            stage_info = f" ({stage})" if stage else ''
+            raise TimeoutException(f"Операция {self.name}{stage_info} {reason}")
+
+    def on_expire(self, callback):
+        """Вызывает callback из фонового потока, когда срок истечет или будет отменен"""
+        handle = ExpireHandle(self, callback)
+        if self.expired():
+            handle.fire()
+            return handle
+
+        deadline = self
+        while deadline is not None:
+            with deadline.lock:
+                deadline.handles.add(handle)
+            deadline = deadline.parent
+
+        if self.expires_at is not None:
+            _watchdog.schedule(self.expires_at, handle)
+        return handle
+
+    def cancel(self):
+        """Отменяет срок: все дочерние сроки становятся истекшими"""
+        self.cancelled = True
+        with self.lock:
+            handles = list(self.handles)
+        for handle in handles:
+            handle.fire()
+
+    def _forget(self, handle):
+        deadline = self
+        while deadline is not None:
+            with deadline.lock:
+                deadline.handles.discard(handle)
+            deadline = deadline.parent
+
+
+_current_deadline = contextvars.ContextVar('current_deadline', default=None)
+
+
+def current_deadline():
+    """Возвращает срок текущего контекста (потока или asyncio-задачи)"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds=None, name='operation', parent=None):
+    """Устанавливает дочерний срок для кода внутри блока with"""
+    deadline = Deadline(seconds, parent=parent or current_deadline(), name=name)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
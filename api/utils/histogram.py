@@ -0,0 +1,100 @@
+import math
+
+# Нижняя граница различимых значений (0.1 мс) и шаг бакетов (~2% относительной погрешности)
+MIN_VALUE = 0.0001
+GROWTH = 1.02
+LOG_GROWTH = math.log(GROWTH)
+# Верхний бакет покрывает все, что дольше часа
+MAX_BUCKET = int(math.log(3600 / MIN_VALUE) / LOG_GROWTH) + 1
+
+
+class LatencyHistogram:
+    """Гистограмма времени ответа с логарифмическими бакетами.
+
+    Память ограничена числом бакетов и не растет с длиной сканирования,
+    а перцентили считаются с относительной погрешностью около 2%.
+    Гистограммы разных потоков складываются через merge().
+    """
+
+    __slots__ = ('buckets', 'count', 'total', 'max_value')
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+
+    @staticmethod
+    def _bucket(value):
+        if value <= MIN_VALUE:
+            return 0
+        return min(int(math.log(value / MIN_VALUE) / LOG_GROWTH) + 1, MAX_BUCKET)
+
+    @staticmethod
+    def _upper_bound(index):
+        return MIN_VALUE * GROWTH ** index
+
+    def record(self, value):
+        """Добавляет значение в секундах"""
+        index = self._bucket(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max_value:
+            self.max_value = value
+
+    def merge(self, other):
+        """Прибавляет значения другой гистограммы"""
+        for index, count in dict(other.buckets).items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+        return self
+
+    def mean(self):
+        """Среднее значение"""
+        return self.total / self.count if self.count else 0
+
+    def percentile(self, percent):
+        """Значение, не меньше которого percent% наблюдений (верхняя граница бакета)"""
+        buckets = dict(self.buckets)
+        observed = sum(buckets.values())
+        if not observed:
+            return 0
+        target = max(1, math.ceil(observed * percent / 100))
+        seen = 0
+        for index in sorted(buckets):
+            seen += buckets[index]
+            if seen >= target:
+                # У верхнего бакета нет границы: в нем все, что дольше часа
+                if index == MAX_BUCKET:
+                    return self.max_value
+                return min(self._upper_bound(index), self.max_value)
+        return self.max_value
+
+    def dump(self):
+        """Состояние для контрольной точки"""
+        return {'buckets': sorted(self.buckets.items()), 'count': self.count,
+                'total': self.total, 'max': self.max_value}
+
+    @classmethod
+    def load(cls, state):
+        """Восстанавливает гистограмму из dump()"""
+        histogram = cls()
+        histogram.buckets = {index: count for index, count in state['buckets']}
+        histogram.count = state['count']
+        histogram.total = state['total']
+        histogram.max_value = state['max']
+        return histogram
+
+    def summary(self):
+        """Количество, среднее, p50/p90/p99 и максимум в секундах"""
+        return {
+            'count': self.count,
+            'mean': round(self.mean(), 4),
+            'p50': round(self.percentile(50), 4),
+            'p90': round(self.percentile(90), 4),
+            'p99': round(self.percentile(99), 4),
+            'max': round(self.max_value, 4)
+        }
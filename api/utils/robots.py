@@ -0,0 +1,189 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+from config import APP_CONFIG
+from utils.transport import create_session
+from utils.url_rules import pattern_source
+
+
+def _parse_groups(robots_text):
+    """Группы robots.txt [(агенты, правила, crawl-delay)] и адреса Sitemap"""
+    groups = []
+    sitemaps = []
+    current_agents = []
+    rules = []
+    delay = None
+    in_rules = False
+
+    for raw_line in robots_text.splitlines():
+        line = raw_line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = (part.strip() for part in line.split(':', 1))
+        key = key.lower()
+
+        if key == 'sitemap':
+            # Sitemap не относится к группам
+            if value:
+                sitemaps.append(value)
+        elif key == 'user-agent':
+            # Новая группа начинается с user-agent после правил предыдущей
+            if in_rules:
+                groups.append((current_agents, rules, delay))
+                current_agents, rules, delay, in_rules = [], [], None, False
+            current_agents.append(value.lower())
+        elif key == 'crawl-delay':
+            in_rules = True
+            try:
+                delay = float(value)
+            except ValueError:
+                pass
+        elif key in ('allow', 'disallow'):
+            in_rules = True
+            # Пустой Disallow ничего не запрещает
+            if value:
+                rules.append((key == 'allow', value))
+        else:
+            in_rules = True
+
+    if current_agents:
+        groups.append((current_agents, rules, delay))
+    return groups, sitemaps
+
+
+def _compile_pattern(pattern):
+    """Шаблон пути с * и $ в регулярное выражение; None для простого префикса"""
+    anchored = pattern.endswith('$')
+    if '*' not in pattern and not anchored:
+        return None
+    return re.compile(pattern_source(pattern))
+
+
+class RobotsRules:
+    """Скомпилированные Allow/Disallow одной группы robots.txt.
+
+    Побеждает самое длинное совпавшее правило, при равной длине — Allow.
+    Правила отсортированы так, что решает первое совпадение; шаблоны без
+    подстановок проверяются через startswith, без регулярных выражений.
+    """
+
+    def __init__(self, rules, crawl_delay=None):
+        self.crawl_delay = crawl_delay
+        ordered = sorted(set(rules), key=lambda rule: (-len(rule[1]), not rule[0]))
+        self.rules = [(allow, pattern, _compile_pattern(pattern)) for allow, pattern in ordered]
+
+    def allowed(self, url):
+        """Можно ли загружать URL (или путь с query)"""
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        if path == '/robots.txt':
+            return True
+        for allow, pattern, regex in self.rules:
+            if regex.match(path) if regex is not None else path.startswith(pattern):
+                return allow
+        return True
+
+    def describe(self):
+        """Число правил и Crawl-delay"""
+        return {
+            'allow_rules': sum(1 for allow, _, _ in self.rules if allow),
+            'disallow_rules': sum(1 for allow, _, _ in self.rules if not allow),
+            'crawl_delay': self.crawl_delay
+        }
+
+
+class RobotsFile:
+    """Разобранный robots.txt хоста; правила для user-agent компилируются один раз"""
+
+    def __init__(self, robots_text='', status=None):
+        self.groups, self.sitemaps = _parse_groups(robots_text)
+        self.status = status
+        self.compiled = {}
+        self.lock = threading.Lock()
+
+    def _matching_groups(self, product_token):
+        token = product_token.lower()
+        specific = []
+        default = []
+        for agents, rules, delay in self.groups:
+            # Строка User-agent сравнивается с токеном продукта целиком, без учета регистра и версии
+            if any(robots_agent.split('/')[0].strip().lower() == token for robots_agent in agents):
+                specific.append((rules, delay))
+            elif '*' in agents:
+                default.append((rules, delay))
+        # Группы своего агента заменяют группы '*', одноименные группы объединяются
+        return specific or default
+
+    def rules_for(self, product_token):
+        """Правила для токена продукта краулера (из кеша, если уже компилировались)"""
+        with self.lock:
+            rules = self.compiled.get(product_token)
+            if rules is None:
+                groups = self._matching_groups(product_token)
+                delays = [delay for _, delay in groups if delay is not None]
+                rules = self.compiled[product_token] = RobotsRules(
+                    [rule for group_rules, _ in groups for rule in group_rules],
+                    delays[0] if delays else None
+                )
+            return rules
+
+
+class RobotsCache:
+    """Разобранные robots.txt по хостам с TTL, общие для всех сканирований процесса"""
+
+    def __init__(self, ttl=None, error_ttl=None):
+        self.ttl = APP_CONFIG['robots_cache_ttl'] if ttl is None else ttl
+        self.error_ttl = APP_CONFIG['robots_error_ttl'] if error_ttl is None else error_ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+
+    def get(self, origin, user_agent, timeout):
+        """RobotsFile для scheme://host; загружается, если его нет в кеше или TTL истек"""
+        with self.lock:
+            entry = self.entries.get(origin)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+        robots, ttl = self._fetch(origin, user_agent, timeout)
+        with self.lock:
+            self.fetches += 1
+            self.entries[origin] = (time.monotonic() + ttl, robots)
+        return robots
+
+    def _fetch(self, origin, user_agent, timeout):
+        robots_url = f"{origin}/robots.txt"
+        try:
+            response = create_session().get(robots_url, headers={'User-Agent': user_agent}, timeout=timeout)
+        except Exception as e:
+            print(f"Не удалось прочитать {robots_url}: {e}")
+            # Сбой сети не запрещает сканирование, но повторяем загрузку скоро
+            return RobotsFile(), self.error_ttl
+
+        if response.status_code == 200:
+            return RobotsFile(response.text, response.status_code), self.ttl
+        # 4xx — ограничений нет; 5xx — тоже, но с коротким TTL
+        ttl = self.ttl if response.status_code < 500 else self.error_ttl
+        return RobotsFile(status=response.status_code), ttl
+
+    def describe(self):
+        """Размер кеша, попадания и загрузки"""
+        return {'hosts': len(self.entries), 'ttl_seconds': self.ttl, 'hits': self.hits, 'fetches': self.fetches}
+
+
+_robots_cache = None
+_robots_cache_lock = threading.Lock()
+
+
+def get_robots_cache():
+    """Возвращает общий для процесса кеш robots.txt"""
+    global _robots_cache
+    with _robots_cache_lock:
+        if _robots_cache is None:
+            _robots_cache = RobotsCache()
+        return _robots_cache
@@ -0,0 +1,96 @@
+import hashlib
+import re
+from collections import defaultdict, deque
+from config import APP_CONFIG
+
+WORD_RE = re.compile(r'\w+')
+FINGERPRINT_BITS = 64
+# Меньше шинглов — текста слишком мало, чтобы сравнивать страницы
+MIN_SHINGLES = 8
+
+
+def _shingle_hash(shingle):
+    # Встроенный hash() зависит от процесса, а отпечатки считаются и в пуле разбора
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class SimHasher:
+    """SimHash текста страницы по шинглам из shingle_size слов.
+
+    Текст подается кусками по мере разбора; слово, разрезанное границей
+    кусков, склеивается. Учитываются первые max_shingles уникальных шинглов.
+    """
+
+    def __init__(self, shingle_size=None, max_shingles=None):
+        self.shingle_size = shingle_size or APP_CONFIG['simhash_shingle_size']
+        self.max_shingles = max_shingles or APP_CONFIG['simhash_max_shingles']
+        self.window = deque(maxlen=self.shingle_size)
+        self.shingles = set()
+        self.tail = ''
+
+    def feed(self, text):
+        """Добавляет кусок видимого текста"""
+        if len(self.shingles) >= self.max_shingles:
+            return
+        text = self.tail + text
+        words = WORD_RE.findall(text.lower())
+        # Последнее слово может продолжиться в следующем куске
+        self.tail = words.pop() if words and WORD_RE.match(text[-1]) else ''
+        self._add_words(words)
+
+    def _add_words(self, words):
+        for word in words:
+            self.window.append(word)
+            if len(self.window) == self.shingle_size:
+                self.shingles.add(_shingle_hash(' '.join(self.window)))
+                if len(self.shingles) >= self.max_shingles:
+                    break
+
+    def digest(self):
+        """Отпечаток в виде 16 hex-символов; None, если текста слишком мало"""
+        if self.tail:
+            self._add_words([self.tail])
+            self.tail = ''
+        if len(self.shingles) < MIN_SHINGLES:
+            return None
+        half = len(self.shingles) / 2
+        value = 0
+        for bit in range(FINGERPRINT_BITS):
+            if sum((shingle >> bit) & 1 for shingle in self.shingles) > half:
+                value |= 1 << bit
+        return f"{value:016x}"
+
+
+class SimHashIndex:
+    """Поиск отпечатков на расстоянии Хэмминга не больше max_distance.
+
+    Отпечаток делится на max_distance + 1 блоков: у близких отпечатков хотя бы
+    один блок совпадает целиком, поэтому сравниваются только отпечатки из
+    корзин с тем же значением блока, а не весь индекс.
+    """
+
+    def __init__(self, max_distance=None):
+        self.max_distance = APP_CONFIG['simhash_distance'] if max_distance is None else max_distance
+        blocks = self.max_distance + 1
+        width = FINGERPRINT_BITS // blocks
+        self.blocks = []
+        for index in range(blocks):
+            shift = index * width
+            bits = FINGERPRINT_BITS - shift if index == blocks - 1 else width
+            self.blocks.append((shift, (1 << bits) - 1))
+        self.tables = [defaultdict(list) for _ in self.blocks]
+        self.size = 0
+
+    def find(self, fingerprint):
+        """Ключ ближайшего найденного отпечатка в пределах max_distance или None"""
+        for (shift, mask), table in zip(self.blocks, self.tables):
+            for other, key in table.get((fingerprint >> shift) & mask, ()):
+                if (fingerprint ^ other).bit_count() <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint, key):
+        """Добавляет отпечаток с ключом"""
+        for (shift, mask), table in zip(self.blocks, self.tables):
+            table[(fingerprint >> shift) & mask].append((fingerprint, key))
+        self.size += 1
@@ -0,0 +1,129 @@
+import itertools
+import zlib
+import xml.etree.ElementTree as ET
+from config import APP_CONFIG
+from utils.transport import create_session
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class SitemapTooLarge(ValueError):
+    """Файл sitemap (после распаковки) больше допустимого размера"""
+    pass
+
+
+def _local_name(tag):
+    """Имя тега без пространства имен"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_priority(value):
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_sitemap(chunks):
+    """Потоково разбирает sitemap или sitemap index из кусков байт.
+
+    Выдает ('url', loc, priority) для страниц и ('sitemap', loc, None) для
+    вложенных файлов индекса. Разобранные элементы сразу удаляются из дерева,
+    поэтому память не растет с размером файла.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    entry = {}
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+
+            name = _local_name(element.tag)
+            if name in ('loc', 'priority'):
+                entry[name] = (element.text or '').strip()
+            elif name in ('url', 'sitemap'):
+                if entry.get('loc'):
+                    yield name, entry['loc'], _parse_priority(entry.get('priority')) if name == 'url' else None
+                entry = {}
+                root.clear()
+    parser.close()
+
+
+def _gunzip(chunks, chunk_size):
+    """Распаковывает gzip порциями не больше chunk_size (max_length)"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk, chunk_size)
+            chunk = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+
+def iter_body(response, max_bytes=None, chunk_size=64 * 1024):
+    """Куски тела ответа; сжатый файл (sitemap.xml.gz) распаковывается на лету.
+
+    Распаковка ограничена по выходу, поэтому gzip-бомба не раздувается в
+    памяти: как только тело превышает max_bytes, чтение прерывается
+    SitemapTooLarge.
+    """
+    max_bytes = max_bytes or APP_CONFIG['sitemap_max_bytes']
+    # Content-Encoding снимает requests, а сам файл .gz приходит как есть
+    chunks = response.iter_content(chunk_size)
+    first = next(chunks, b'')
+    chunks = itertools.chain([first], chunks)
+    if first[:2] == GZIP_MAGIC:
+        chunks = _gunzip(chunks, chunk_size)
+
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise SitemapTooLarge(f"больше {max_bytes} байт")
+        yield chunk
+
+
+def fetch_sitemap_urls(sitemap_urls, user_agent, timeout, max_urls=None, max_files=None, deadline=None):
+    """Обходит sitemap и индексы, выдает (url, priority) страниц.
+
+    Не больше max_urls страниц и max_files загруженных файлов; файлы с
+    ошибками пропускаются. Обход прекращается, когда истекает или
+    отменяется deadline, а таймаут запроса не превышает его остаток.
+    """
+    max_urls = max_urls or APP_CONFIG['sitemap_max_urls']
+    max_files = max_files or APP_CONFIG['sitemap_max_files']
+    pending = list(sitemap_urls)
+    seen = set(pending)
+    session = create_session({'User-Agent': user_agent})
+    fetched = 0
+    found = 0
+
+    while pending and fetched < max_files and found < max_urls:
+        if deadline is not None and deadline.expired():
+            print(f"sitemap: срок загрузки истек, пропущено файлов: {len(pending)}")
+            break
+        sitemap_url = pending.pop(0)
+        fetched += 1
+        request_timeout = deadline.timeout_for(timeout) if deadline is not None else timeout
+        try:
+            with session.get(sitemap_url, timeout=request_timeout, stream=True) as response:
+                if response.status_code != 200:
+                    continue
+                for kind, loc, priority in iter_sitemap(iter_body(response)):
+                    # Медленно отдаваемый файл не должен держать сканирование дольше срока
+                    if deadline is not None and deadline.expired():
+                        break
+                    if kind == 'sitemap':
+                        if loc not in seen:
+                            seen.add(loc)
+                            pending.append(loc)
+                        continue
+                    found += 1
+                    yield loc, priority
+                    if found >= max_urls:
+                        break
+        except (OSError, ET.ParseError, zlib.error, SitemapTooLarge) as e:
+            print(f"Не удалось разобрать sitemap {sitemap_url}: {e}")
@@ -1,38 +1,35 @@
-import signal
 import functools
 import threading
 import time
+from utils.deadline import TimeoutException, deadline_scope
 
 
-class TimeoutError(Exception):
+class TimeoutError(TimeoutException):
     """Исключение при превышении таймаута"""
     pass
 
 
 def timeout(seconds, error_message="Превышено время выполнения"):
-    """Декоратор для установки таймаута на функцию"""
+    """Декоратор для установки таймаута на функцию.
 
-    def decorator(func):
-        def _handle_timeout(signum, frame):
-            raise TimeoutError(error_message)
+    Функция выполняется внутри срока (deadline_scope), который видят вложенные
+    вызовы через current_deadline(). Работает в любом потоке и не затрагивает
+    таймауты других сканирований, в отличие от SIGALRM.
+    """
 
+    def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Устанавливаем таймаут для Unix систем
-            try:
-                signal.signal(signal.SIGALRM, _handle_timeout)
-                signal.alarm(seconds)
-            except (AttributeError, ValueError):
-                pass  # На Windows нет signal.alarm
-
-            try:
-                result = func(*args, **kwargs)
-            finally:
-                # Сбрасываем таймер
+            with deadline_scope(seconds, name=func.__name__) as deadline:
                 try:
-                    signal.alarm(0)
-                except (AttributeError, ValueError):
-                    pass
+                    result = func(*args, **kwargs)
+                except TimeoutException as e:
+                    if deadline.expired():
+                        raise TimeoutError(error_message) from e
+                    raise
+
+                if deadline.expired():
+                    raise TimeoutError(error_message)
 
             return result
 
@@ -112,37 +109,39 @@ class TimeoutManager:
     def __init__(self, default_timeout=30):
         self.default_timeout = default_timeout
         self.active_timeouts = {}
+        self.lock = threading.Lock()
 
     def execute_with_timeout(self, func, timeout=None, *args, **kwargs):
-        """Выполняет функцию с таймаутом"""
+        """Выполняет функцию с таймаутом; TimeoutError бросается в вызывающем потоке"""
         timeout = timeout or self.default_timeout
         timeout_id = f"{func.__name__}_{time.time()}"
+        error_message = f"Операция {func.__name__} превысила таймаут {timeout} секунд"
 
-        def timeout_handler():
-            raise TimeoutError(f"Операция {func.__name__} превысила таймаут {timeout} секунд")
-
-        # Создаем таймер
-        timer = threading.Timer(timeout, timeout_handler)
-        timer.daemon = True
-        self.active_timeouts[timeout_id] = timer
+        with deadline_scope(timeout, name=func.__name__) as deadline:
+            with self.lock:
+                self.active_timeouts[timeout_id] = deadline
+            try:
+                result = func(*args, **kwargs)
+            except TimeoutException as e:
+                if deadline.expired():
+                    raise TimeoutError(error_message) from e
+                raise
+            finally:
+                # Удаляем срок из активных
+                with self.lock:
+                    self.active_timeouts.pop(timeout_id, None)
 
-        try:
-            timer.start()
-            result = func(*args, **kwargs)
+            if deadline.expired():
+                raise TimeoutError(error_message)
             return result
-        except TimeoutError:
-            raise
-        finally:
-            # Останавливаем таймер и удаляем из активных
-            if timeout_id in self.active_timeouts:
-                self.active_timeouts[timeout_id].cancel()
-                del self.active_timeouts[timeout_id]
 
     def cancel_all_timeouts(self):
-        """Отменяет все активные таймауты"""
-        for timer in self.active_timeouts.values():
-            timer.cancel()
-        self.active_timeouts.clear()
+        """Отменяет все активные таймауты: их сроки сразу становятся истекшими"""
+        with self.lock:
+            deadlines = list(self.active_timeouts.values())
+            self.active_timeouts.clear()
+        for deadline in deadlines:
+            deadline.cancel()
 
     def get_active_timeouts(self):
         """Возвращает список активных таймаутов"""
@@ -0,0 +1,233 @@
+import asyncio
+import importlib.util
+import socket
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util import connection
+from aiohttp.abc import AbstractResolver
+from config import APP_CONFIG
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+# Без пакета h2 httpx умеет только HTTP/1.1
+if httpx is not None and importlib.util.find_spec('h2') is None:
+    httpx = None
+
+# Сколько имен хранить в кеше DNS, прежде чем сбросить его
+DNS_CACHE_LIMIT = 10_000
+
+
+class DnsCache:
+    """Кеш getaddrinfo с TTL, общий для всех рабочих и сканирований процесса"""
+
+    def __init__(self, ttl=None):
+        self.ttl = APP_CONFIG['dns_cache_ttl'] if ttl is None else ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, host, port, family=socket.AF_UNSPEC):
+        """Адреса из кеша или None, если их нет или TTL истек"""
+        key = (host, port, family)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def store(self, host, port, family, infos):
+        """Запоминает результат getaddrinfo на ttl секунд"""
+        with self.lock:
+            if len(self.entries) >= DNS_CACHE_LIMIT:
+                self.entries.clear()
+            self.misses += 1
+            self.entries[(host, port, family)] = (time.monotonic() + self.ttl, infos)
+
+    def resolve(self, host, port, family=socket.AF_UNSPEC):
+        """Адреса хоста (getaddrinfo вызывается только при промахе кеша)"""
+        infos = self.lookup(host, port, family)
+        if infos is None:
+            # Разрешение идет без блокировки: два потока могут разрешить одно имя параллельно
+            infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+            self.store(host, port, family, infos)
+        return infos
+
+    def describe(self):
+        """Размер кеша и доля попаданий"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0
+        }
+
+
+class CachedDnsConnectionMixin:
+    """Соединение urllib3, которое берет адреса хоста из общего кеша DNS"""
+
+    def _new_conn(self):
+        try:
+            infos = get_dns_cache().resolve(self._dns_host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+        error = None
+        for _, _, _, _, sockaddr in infos:
+            try:
+                return connection.create_connection(
+                    (sockaddr[0], self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except socket.timeout as e:
+                error = ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+                )
+                error.__cause__ = e
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+                error.__cause__ = e
+        raise error or NewConnectionError(self, f"Нет адресов для {self.host}")
+
+
+class CachedDnsHTTPConnection(CachedDnsConnectionMixin, HTTPConnection):
+    pass
+
+
+class CachedDnsHTTPSConnection(CachedDnsConnectionMixin, HTTPSConnection):
+    pass
+
+
+class CachedDnsHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedDnsHTTPConnection
+
+
+class CachedDnsHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedDnsHTTPSConnection
+
+
+class SharedHTTPAdapter(HTTPAdapter):
+    """Адаптер requests с пулами соединений по хостам и кешем DNS.
+
+    Один экземпляр монтируется во все сессии рабочих, поэтому keep-alive
+    соединения (и установленные на них TLS сессии) переиспользуются между
+    рабочими и сканированиями. Сессия рабочего хранит только заголовки
+    профиля устройства и cookies.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CachedDnsHTTPConnectionPool,
+            'https': CachedDnsHTTPSConnectionPool
+        }
+
+    def close(self):
+        # Адаптер общий для процесса: закрытие одной сессии не должно рвать чужие соединения
+        pass
+
+
+class CachedResolver(AbstractResolver):
+    """Резолвер aiohttp поверх общего кеша DNS (getaddrinfo уходит в поток только при промахе)"""
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        cache = get_dns_cache()
+        infos = cache.lookup(host, port, family)
+        if infos is None:
+            infos = await asyncio.to_thread(socket.getaddrinfo, host, port, family, socket.SOCK_STREAM)
+            cache.store(host, port, family, infos)
+        return [
+            {
+                'hostname': host,
+                'host': sockaddr[0],
+                'port': sockaddr[1],
+                'family': info_family,
+                'proto': proto,
+                'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV
+            }
+            for info_family, _, proto, _, sockaddr in infos
+        ]
+
+    async def close(self):
+        pass
+
+
+_dns_cache = None
+_http_adapter = None
+_http2_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_dns_cache():
+    """Возвращает общий для процесса кеш DNS"""
+    global _dns_cache
+    with _transport_lock:
+        if _dns_cache is None:
+            _dns_cache = DnsCache()
+        return _dns_cache
+
+
+def get_http_adapter():
+    """Возвращает общий для процесса адаптер с пулами соединений"""
+    global _http_adapter
+    with _transport_lock:
+        if _http_adapter is None:
+            _http_adapter = SharedHTTPAdapter(
+                pool_connections=APP_CONFIG['http_pool_hosts'],
+                pool_maxsize=APP_CONFIG['http_pool_maxsize'],
+                pool_block=False
+            )
+        return _http_adapter
+
+
+def http2_available():
+    """Установлены ли httpx и h2"""
+    return httpx is not None
+
+
+def get_http2_transport():
+    """Возвращает общий для процесса транспорт httpx с HTTP/2.
+
+    К одному хосту идет одно соединение, запросы всех рабочих мультиплексируются
+    в нем потоками HTTP/2. Хосты без HTTP/2 (ALPN) и адреса http:// обслуживаются
+    по HTTP/1.1 тем же транспортом.
+    """
+    global _http2_transport
+    with _transport_lock:
+        if _http2_transport is None:
+            _http2_transport = httpx.HTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=None,
+                                    max_keepalive_connections=APP_CONFIG['http_pool_hosts']),
+                retries=0
+            )
+        return _http2_transport
+
+
+def create_http2_client(headers=None):
+    """Клиент httpx на общем HTTP/2 транспорте; свои у него только заголовки и cookies"""
+    return httpx.Client(transport=get_http2_transport(), headers=headers,
+                        follow_redirects=True, max_redirects=5)
+
+
+def create_session(headers=None):
+    """Сессия requests на общем транспорте; свои у нее только заголовки и cookies"""
+    session = requests.Session()
+    adapter = get_http_adapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
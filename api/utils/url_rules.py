@@ -0,0 +1,108 @@
+import re
+from urllib.parse import urlparse, urlunparse, unquote_plus
+from config import APP_CONFIG
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def canonical_netloc(scheme, netloc):
+    """Хост в нижнем регистре без порта по умолчанию для схемы"""
+    netloc = netloc.lower()
+    host, _, port = netloc.rpartition(':')
+    if host and port == DEFAULT_PORTS.get(scheme.lower()):
+        return host
+    return netloc
+
+
+def pattern_source(pattern):
+    """Шаблон пути с * и $ (синтаксис robots.txt) в исходник регулярного выражения"""
+    anchored = pattern.endswith('$')
+    body = pattern[:-1] if anchored else pattern
+    return '.*'.join(re.escape(part) for part in body.split('*')) + ('$' if anchored else '')
+
+
+def _compile_names(names):
+    """Имена параметров (name или prefix*) в одно регулярное выражение; None для пустого списка"""
+    if not names:
+        return None
+    return re.compile('|'.join(f'(?:{pattern_source(name.lower())}$)' for name in names))
+
+
+class UrlCanonicalizer:
+    """Приводит URL к одному виду, чтобы варианты одной страницы не дублировались во фронтире.
+
+    Убираются фрагмент и params, хост приводится к нижнему регистру, порт по
+    умолчанию отбрасывается. Параметры отслеживания (utm_* и подобные)
+    удаляются, остальные ключи query сортируются; значения и их кодирование
+    не меняются.
+    """
+
+    def __init__(self, sort_query=None, drop_params=None):
+        self.sort_query = APP_CONFIG['canonical_sort_query'] if sort_query is None else sort_query
+        self.drop_params = tuple(APP_CONFIG['canonical_drop_params'] if drop_params is None else drop_params)
+        self.drop_regex = _compile_names(self.drop_params)
+
+    def canonicalize(self, url):
+        """Канонический вид URL"""
+        parsed = urlparse(url)
+        query = self._canonical_query(parsed.query) if parsed.query else ''
+        canonical = urlunparse((parsed.scheme.lower(), canonical_netloc(parsed.scheme, parsed.netloc),
+                                parsed.path, '', query, ''))
+        return canonical.rstrip('/') if canonical.endswith('/') else canonical
+
+    def _canonical_query(self, query):
+        pairs = []
+        for part in query.split('&'):
+            if not part:
+                continue
+            key = unquote_plus(part.split('=', 1)[0])
+            if self.drop_regex is not None and self.drop_regex.match(key.lower()):
+                continue
+            pairs.append((key, part))
+        if self.sort_query:
+            # Сортировка устойчивая: повторы одного ключа сохраняют порядок значений
+            pairs.sort(key=lambda pair: pair[0])
+        return '&'.join(part for _, part in pairs)
+
+    def describe(self):
+        """Правила канонизации"""
+        return {'sort_query': self.sort_query, 'drop_params': list(self.drop_params)}
+
+
+class UrlFilter:
+    """Шаблоны include/exclude по пути с query, собранные в одно выражение на каждый список.
+
+    Вместо перебора шаблонов для каждой ссылки выполняется не больше двух
+    проверок регулярным выражением. Пустой include пропускает все URL,
+    exclude применяется после include.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = tuple(APP_CONFIG['crawl_include'] if include is None else include)
+        self.exclude = tuple(APP_CONFIG['crawl_exclude'] if exclude is None else exclude)
+        self.include_regex = self._compile(self.include)
+        self.exclude_regex = self._compile(self.exclude)
+
+    @staticmethod
+    def _compile(patterns):
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{pattern_source(pattern)})' for pattern in patterns))
+
+    @property
+    def active(self):
+        return self.include_regex is not None or self.exclude_regex is not None
+
+    def allowed(self, url):
+        """Проходит ли URL правила сканирования"""
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        if self.include_regex is not None and not self.include_regex.match(path):
+            return False
+        return self.exclude_regex is None or not self.exclude_regex.match(path)
+
+    def describe(self):
+        """Шаблоны фильтра"""
+        return {'include': list(self.include), 'exclude': list(self.exclude)}
@@ -0,0 +1,191 @@
+import base64
+import hashlib
+import math
+import threading
+
+
+class UrlTable:
+    """Интернирование URL: каждый нормализованный URL получает компактный целочисленный ID.
+
+    Строка URL хранится один раз, остальные структуры сканирования
+    (множества ссылок, детали, списки страниц) ссылаются на ID.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.urls = []
+        self.lock = threading.Lock()
+
+    def intern(self, url):
+        """Возвращает ID URL, присваивая новый при первом обращении"""
+        url_id = self.ids.get(url)
+        if url_id is None:
+            with self.lock:
+                url_id = self.ids.get(url)
+                if url_id is None:
+                    url_id = len(self.urls)
+                    self.urls.append(url)
+                    self.ids[url] = url_id
+        return url_id
+
+    def lookup(self, url):
+        """Возвращает ID URL или None, если URL еще не встречался"""
+        return self.ids.get(url)
+
+    def url(self, url_id):
+        """Возвращает URL по его ID"""
+        return self.urls[url_id]
+
+    def __len__(self):
+        return len(self.urls)
+
+    def dump(self):
+        """Список URL в порядке ID (для контрольной точки)"""
+        return list(self.urls)
+
+    @classmethod
+    def load(cls, urls):
+        """Восстанавливает таблицу с теми же ID"""
+        table = cls()
+        table.urls = list(urls)
+        table.ids = {url: url_id for url_id, url in enumerate(table.urls)}
+        return table
+
+
+class BloomFilter:
+    """Фильтр Блума: проверка принадлежности с фиксированной памятью и редкими ложными срабатываниями"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Двойное хеширование: k позиций из двух 64-битных половин одного дайджеста
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """Добавляет ключ; возвращает True, если его (вероятно) не было"""
+        added = False
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            mask = 1 << bit
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key):
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def memory_bytes(self):
+        """Размер битового массива в байтах"""
+        return len(self.bits)
+
+
+class ExactVisitedSet:
+    """Точное множество посещенных URL, хранящее только ID из таблицы URL"""
+
+    mode = 'exact'
+
+    def __init__(self, url_table):
+        self.url_table = url_table
+        self.ids = set()
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        """Отмечает URL посещенным; возвращает True, если он не был отмечен раньше"""
+        url_id = self.url_table.intern(url)
+        with self.lock:
+            if url_id in self.ids:
+                return False
+            self.ids.add(url_id)
+            return True
+
+    def __contains__(self, url):
+        url_id = self.url_table.lookup(url)
+        return url_id is not None and url_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def describe(self):
+        return {'mode': self.mode, 'size': len(self.ids)}
+
+    def dump(self):
+        with self.lock:
+            return {'mode': self.mode, 'ids': sorted(self.ids)}
+
+    def load(self, state):
+        self.ids = set(state['ids'])
+
+
+class BloomVisitedSet:
+    """Множество посещенных URL на фильтре Блума для очень больших сканирований.
+
+    Память не зависит от длины URL; изредка новый URL может быть ошибочно
+    принят за посещенный (с вероятностью error_rate) и пропущен.
+    """
+
+    mode = 'bloom'
+
+    def __init__(self, capacity, error_rate):
+        self.filter = BloomFilter(capacity, error_rate)
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        """Отмечает URL посещенным; возвращает True, если он не был отмечен раньше"""
+        with self.lock:
+            return self.filter.add(url)
+
+    def __contains__(self, url):
+        return url in self.filter
+
+    def __len__(self):
+        return len(self.filter)
+
+    def describe(self):
+        return {
+            'mode': self.mode,
+            'size': len(self.filter),
+            'capacity': self.filter.capacity,
+            'error_rate': self.filter.error_rate,
+            'memory_mb': round(self.filter.memory_bytes() / (1024 * 1024), 2)
+        }
+
+    def dump(self):
+        with self.lock:
+            return {
+                'mode': self.mode,
+                'count': self.filter.count,
+                'bits': base64.b64encode(bytes(self.filter.bits)).decode('ascii')
+            }
+
+    def load(self, state):
+        bits = base64.b64decode(state['bits'])
+        if len(bits) != len(self.filter.bits):
+            raise ValueError("Размер фильтра Блума в контрольной точке не совпадает с настройками")
+        self.filter.bits = bytearray(bits)
+        self.filter.count = state['count']
+
+
+def create_visited_set(mode, url_table, capacity, error_rate):
+    """Создает множество посещенных URL выбранного типа"""
+    if mode == 'bloom':
+        return BloomVisitedSet(capacity, error_rate)
+    return ExactVisitedSet(url_table)
@@ -0,0 +1,287 @@
+import asyncio
+import queue
+import time
+import aiohttp
+from workers.master_controller import MasterController
+from workers.slave_worker import SlaveWorker
+from workers.body_reader import BodyReader, wants_body
+from utils.transport import CachedResolver
+from utils.deadline import Deadline, TimeoutException, current_deadline
+from config import DEVICE_CONFIGS, APP_CONFIG, TIMEOUT_CONFIG
+
+
+class AsyncSlaveWorker(SlaveWorker):
+    """Асинхронный слейв: один профиль устройства, много запросов в полете"""
+
+    def _create_session(self):
+        """Сессия общая для всего event loop и передается в process_url"""
+        return None
+
+    async def process_url(self, session, url, depth, timeout=None, deadline=None):
+        """Асинхронно обрабатывает одну страницу с таймаутом"""
+        start_time = time.time()
+        operation_timeout = timeout or self.request_timeout
+        deadline = Deadline(operation_timeout, parent=deadline or current_deadline(), name=url)
+
+        try:
+            print(f"Слейв {self.slave_id} обрабатывает: {url} (глубина: {depth}, таймаут: {operation_timeout}с)")
+            deadline.check('ожидание запроса')
+
+            async with session.get(
+                    url,
+                    headers={**self._build_headers(), **self._conditional_headers(url)},
+                    timeout=aiohttp.ClientTimeout(
+                        total=deadline.timeout_for(operation_timeout),
+                        connect=deadline.timeout_for(TIMEOUT_CONFIG['connect_timeout'])
+                    ),
+                    allow_redirects=True,
+                    max_redirects=5
+            ) as response:
+                response.raise_for_status()
+                reader = None
+                if wants_body(response.status, response.headers):
+                    reader = BodyReader.for_worker(self, url, response.charset)
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        if not reader.feed(chunk):
+                            break
+                # Недочитанное тело (не-HTML или сверх лимита): соединение закрывается, а не возвращается в пул
+                unread = reader.truncated if reader is not None else response.status != 304
+                if unread:
+                    response.close()
+                processing_time = time.time() - start_time
+                redirect_chain = [str(r.url) for r in response.history] + [str(response.url)]
+
+                return self._build_success_result(
+                    url, depth, response.status, response.headers,
+                    reader, redirect_chain, processing_time,
+                    http_version=f"HTTP/{response.version.major}.{response.version.minor}"
+                )
+
+        except TimeoutException as e:
+            processing_time = time.time() - start_time
+            self.stats['timeout_errors'] += 1
+            return self._process_timeout_error(e, url, depth, processing_time)
+
+        except asyncio.TimeoutError:
+            processing_time = time.time() - start_time
+            self.stats['timeout_errors'] += 1
+            error = TimeoutException(f"Превышено время запроса: {operation_timeout} секунд")
+            return self._process_timeout_error(error, url, depth, processing_time)
+
+        except aiohttp.ClientResponseError as e:
+            processing_time = time.time() - start_time
+            return self._process_error_response(e, url, depth, processing_time,
+                                                status_code=e.status, headers=e.headers)
+
+        except aiohttp.ClientError as e:
+            processing_time = time.time() - start_time
+            return self._process_error_response(e, url, depth, processing_time)
+
+        except Exception as e:
+            processing_time = time.time() - start_time
+            return self._process_exception(e, url, depth, processing_time)
+
+
+class AsyncMasterController(MasterController):
+    """Мастер-контроллер на asyncio: сотни запросов в полете в одном потоке"""
+
+    engine = 'async'
+
+    def __init__(self, *args, concurrency=None, **kwargs):
+        # aiohttp работает только по HTTP/1.1
+        kwargs['http_version'] = '1.1'
+        self.concurrency = min(concurrency or APP_CONFIG['async_concurrency'],
+                               APP_CONFIG['max_async_concurrency'])
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.work_condition = None
+
+    def _fetch_slot_bounds(self):
+        """Регулятор управляет числом запросов в полете, начиная с concurrency"""
+        if not self.adaptive:
+            return self.concurrency, self.concurrency
+        ceiling = min(APP_CONFIG['max_async_concurrency'], self.concurrency * APP_CONFIG['adaptive_growth'])
+        return self.concurrency, max(self.concurrency, ceiling)
+
+    def _create_workers(self):
+        """Создает асинхронных слейвов, по одному на профиль устройства"""
+        workers = []
+        for i in range(self.num_workers):
+            device_config = DEVICE_CONFIGS[i % len(DEVICE_CONFIGS)]
+            worker = AsyncSlaveWorker(
+                slave_id=f"slave-{i + 1}",
+                device_config=device_config,
+                request_timeout=self.request_timeout
+            )
+            workers.append(worker)
+        return workers
+
+    def _checkpoint_config(self):
+        """Добавляет к параметрам продолжения число запросов в полете"""
+        config = super()._checkpoint_config()
+        config['concurrency'] = self.concurrency
+        return config
+
+    def _build_progress(self):
+        """Добавляет к прогрессу число запросов в полете"""
+        progress = super()._build_progress()
+        progress['in_flight'] = self.in_flight
+        return progress
+
+    async def _wait_for_work(self):
+        """Ждет готовности хоста, появления новых URL или завершения запросов в полете"""
+        wait_time = TIMEOUT_CONFIG['queue_timeout']
+        ready_in = self.url_queue.next_ready_in()
+        if ready_in is not None:
+            wait_time = min(wait_time, ready_in)
+
+        async with self.work_condition:
+            try:
+                await asyncio.wait_for(self.work_condition.wait(), timeout=wait_time)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _notify_work(self):
+        """Будит корутины, ожидающие работу"""
+        async with self.work_condition:
+            self.work_condition.notify_all()
+
+    async def fetch_task(self, session, worker):
+        """Корутина-выборщик: берет URL из очереди и обрабатывает его"""
+        while not self.stop_event.is_set():
+            # Пауза не блокирует event loop
+            if not self.pause_event.is_set():
+                await asyncio.sleep(0.1)
+                continue
+
+            if self._check_scan_timeout():
+                break
+
+            if not self.pages_semaphore.acquire(blocking=False):
+                break
+
+            # Слот регулятора: при сниженном пределе лишние выборщики ждут
+            if not self.fetch_slots.try_acquire():
+                self.pages_semaphore.release()
+                await self._wait_for_work()
+                continue
+
+            try:
+                url, depth = self.url_queue.get_nowait()
+            except queue.Empty:
+                self.fetch_slots.release()
+                self.pages_semaphore.release()
+                # Очередь пуста и ничего не в полете — новых ссылок уже не будет
+                if self.in_flight == 0 and self.url_queue.empty():
+                    break
+                await self._wait_for_work()
+                continue
+
+            self.in_flight += 1
+            # При отмене задачи URL остается выданным и попадает в контрольную точку
+            handled = False
+            released = False
+            try:
+                result = await worker.process_url(session, url, depth, timeout=self.request_timeout,
+                                                  deadline=self.scan_deadline)
+                # Слот держит только сетевой запрос, разбор в пуле его не занимает
+                self._observe_response(url, result)
+                self.fetch_slots.release()
+                released = True
+
+                parse_future = result.pop('parse_future', None)
+                if parse_future is not None:
+                    # Разбор идет в пуле процессов, event loop свободен для других запросов
+                    await asyncio.wait([asyncio.wrap_future(parse_future)])
+                    worker.apply_parsed_page(result, self._parse_result(parse_future, url))
+
+                handled = self._handle_result(worker, result, depth, url)
+            except Exception as e:
+                print(f"Ошибка в рабочем {worker.slave_id}: {e}")
+                self._local_stats()['slave_stats'][worker.slave_id]['errors'] += 1
+                self.pages_semaphore.release()
+                handled = True
+            finally:
+                self.in_flight -= 1
+                if not released:
+                    self.fetch_slots.release()
+                self.url_queue.task_done(url if handled else None)
+                await self._notify_work()
+
+    async def _watch_scan(self, tasks):
+        """Следит за таймаутом и остановкой, отменяя запросы в полете"""
+        while not all(task.done() for task in tasks):
+            if self.stop_event.is_set() or self.shutdown_requested or self._check_scan_timeout():
+                for task in tasks:
+                    task.cancel()
+                break
+
+            pages_done = self._results_count()
+            if pages_done % 10 == 0 and pages_done > 0:
+                elapsed = time.time() - self.scan_start_time
+                print(f"Прогресс: {pages_done}/{self.max_pages} страниц, "
+                      f"{self.in_flight} в полете, "
+                      f"{self.link_store.unique_count()} ссылок, "
+                      f"{elapsed:.1f} секунд")
+
+            await asyncio.sleep(0.5)
+            # Снимок строится под блокировками потоков, event loop его не ждет
+            await asyncio.to_thread(self._maybe_checkpoint)
+
+    async def _crawl(self):
+        """Запускает выборщиков на общей HTTP сессии"""
+        self.work_condition = asyncio.Condition()
+        # Event loop у каждого сканирования свой, поэтому пул соединений тоже; DNS — общий кеш процесса
+        connector = aiohttp.TCPConnector(limit=self.max_fetch_slots,
+                                         limit_per_host=min(self.max_fetch_slots, APP_CONFIG['http_pool_maxsize']),
+                                         resolver=CachedResolver(), use_dns_cache=False)
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            tasks = [
+                asyncio.create_task(self.fetch_task(session, self.workers[i % len(self.workers)]))
+                for i in range(self.max_fetch_slots)
+            ]
+            watcher = asyncio.create_task(self._watch_scan(tasks))
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+            watcher.cancel()
+
+    def run_scan(self, include_links=True):
+        """Запускает асинхронное сканирование с таймаутом"""
+        self.scan_start_time = time.time()
+        print(f"Начинаем асинхронное сканирование {self.domain}: "
+              f"{self.concurrency} запросов в полете, {self.num_workers} профилей устройств")
+        print(f"Общий таймаут: {self.total_timeout}с, Таймаут запроса: {self.request_timeout}с")
+
+        self._start_timeout_timer()
+        self._prepare_frontier()
+        self._store_scan_started()
+        self._load_validators()
+
+        failed = False
+        try:
+            asyncio.run(self._crawl())
+        except KeyboardInterrupt:
+            print("Сканирование прервано пользователем (Ctrl+C)")
+            self.shutdown_requested = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.scan_completed = True
+
+            if self.timeout_timer:
+                self.timeout_timer.cancel()
+
+            self.stop_event.set()
+            self.pause_event.set()
+            self._final_checkpoint(failed)
+
+        scan_duration = time.time() - self.scan_start_time
+
+        final_stats = self._compile_final_stats(scan_duration, include_links)
+        final_stats['configuration']['concurrency'] = self.concurrency
+        self._store_scan_finished(final_stats)
+        self.progress_feed.close()
+
+        return self.results, final_stats
@@ -0,0 +1,100 @@
+import codecs
+import hashlib
+import time
+from workers.html_extractor import create_extractor
+
+
+def wants_body(status_code, headers):
+    """Нужно ли загружать тело: разбираются только HTML страницы, у 304 тела нет"""
+    return status_code != 304 and 'html' in headers.get('Content-Type', '').lower()
+
+
+def declared_size(headers):
+    """Размер тела по Content-Length (0, если заголовка нет или он некорректен)"""
+    try:
+        return max(int(headers.get('Content-Length') or 0), 0)
+    except ValueError:
+        return 0
+
+
+class BodyReader:
+    """Принимает тело ответа по частям по мере загрузки.
+
+    Ограничивает размер тела (лишнее не читается), считает отпечаток и,
+    если передан экстрактор, разбирает HTML прямо во время загрузки — тогда
+    тело целиком в памяти не держится. Без экстрактора тело собирается для
+    отправки в пул процессов.
+    """
+
+    def __init__(self, max_size, encoding=None, extractor=None, parse_timeout=None, url=None):
+        self.max_size = max_size
+        self.url = url
+        self.size = 0
+        self.truncated = False
+        self.digest = hashlib.blake2b(digest_size=8)
+        self.extractor = extractor
+        self.chunks = [] if extractor is None else None
+        self.encoding = encoding or 'utf-8'
+        self.decoder = None
+        if extractor is not None:
+            try:
+                self.decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+            except LookupError:
+                self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.parse_timeout = parse_timeout
+        self.parse_time = 0.0
+        self.page = None
+
+    @classmethod
+    def for_worker(cls, worker, url, encoding):
+        """Читатель с настройками слейва: разбор на лету без пула процессов, иначе — сбор тела"""
+        if worker.parse_pool is None:
+            extractor = create_extractor(url, worker.html_parser, worker.fingerprint_text)
+        else:
+            extractor = None
+        return cls(worker.max_body_size, encoding, extractor, worker.parse_timeout, url)
+
+    def feed(self, chunk):
+        """Добавляет часть тела; False — достигнут лимит размера и чтение нужно прервать"""
+        room = self.max_size - self.size
+        if len(chunk) > room:
+            self.truncated = True
+            chunk = chunk[:room]
+        self.size += len(chunk)
+        self.digest.update(chunk)
+
+        if self.chunks is not None:
+            self.chunks.append(chunk)
+        elif self.extractor is not None:
+            self._parse(self.decoder.decode(chunk))
+        return not self.truncated
+
+    def _parse(self, text):
+        if not text or self.extractor is None:
+            return
+        if self.parse_timeout is not None and self.parse_time > self.parse_timeout:
+            print(f"Прервано извлечение ссылок из {self.url} - превышено время")
+            # Уже найденные ссылки сохраняются, остаток тела не разбирается
+            self.page = self.extractor.close()
+            self.extractor = None
+            return
+        start = time.monotonic()
+        self.extractor.feed(text)
+        self.parse_time += time.monotonic() - start
+
+    def body(self):
+        """Собранное тело (только без разбора на лету)"""
+        return b''.join(self.chunks or ())
+
+    def content_hash(self):
+        """Отпечаток прочитанной части тела"""
+        return self.digest.hexdigest()
+
+    def finish(self):
+        """Завершает разбор на лету и возвращает страницу (ссылки, заголовок, мета)"""
+        if self.extractor is not None:
+            self._parse(self.decoder.decode(b'', final=True))
+        if self.extractor is not None:
+            self.page = self.extractor.close()
+            self.extractor = None
+        return self.page or {'links': [], 'title': 'No title', 'meta': {}}
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from config import APP_CONFIG
+from utils.histogram import LatencyHistogram
+
+# Ответы, которыми сервер сообщает о перегрузке
+OVERLOAD_STATUSES = (429, 503)
+# p90 быстрее этого считается шумом и не снижает предел
+LATENCY_FLOOR = 0.05
+# На сколько базовая задержка может подрасти за одно окно (сервер мог стать медленнее насовсем)
+BASELINE_DRIFT = 0.1
+# Сколько последних изменений предела хранить для статистики
+HISTORY_SIZE = 50
+
+
+def parse_retry_after(value):
+    """Секунды из заголовка Retry-After (число или HTTP-дата); None, если заголовка нет"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = int(value)
+    else:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), APP_CONFIG['max_retry_after'])
+
+
+class AdaptiveConcurrency:
+    """AIMD-регулятор числа одновременных запросов сканирования.
+
+    Перед запросом рабочий занимает слот, после ответа передает ответ в record()
+    и освобождает слот. Ответы собираются в окна; если в окне много
+    429/503/таймаутов или p90 времени ответа заметно выше лучшего из прошлых окон,
+    предел умножается на adaptive_decrease, иначе растет на один слот.
+    После снижения ответы на запросы, начатые до него, не учитываются,
+    поэтому одна перегрузка снижает предел один раз.
+    """
+
+    def __init__(self, initial, max_limit, min_limit=1, enabled=True):
+        self.enabled = enabled
+        self.max_limit = max(max_limit, initial)
+        self.min_limit = max(1, min(min_limit, initial))
+        self.limit = initial
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+        self.decrease_factor = APP_CONFIG['adaptive_decrease']
+        self.error_threshold = APP_CONFIG['adaptive_error_threshold']
+        self.latency_tolerance = APP_CONFIG['adaptive_latency_tolerance']
+        self.min_window = APP_CONFIG['adaptive_window']
+
+        # Текущее окно ответов
+        self.window = LatencyHistogram()
+        self.window_overloads = 0
+        self.saturated = False
+        self.adjusted_at = 0
+        # Лучший p90 прошлых окон — ориентир задержки ненагруженного сервера
+        self.baseline = None
+
+        self.started_at = time.time()
+        self.increases = 0
+        self.decreases = 0
+        self.retry_after_responses = 0
+        self.peak_limit = initial
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+    def cap(self, max_limit):
+        """Снижает верхний предел (например, до выделенного сканированию бюджета)"""
+        with self.condition:
+            self.max_limit = max(1, min(self.max_limit, max_limit))
+            self.min_limit = min(self.min_limit, self.max_limit)
+            self.limit = min(self.limit, self.max_limit)
+            self.peak_limit = min(self.peak_limit, self.max_limit)
+
+    def acquire(self, timeout=None):
+        """Занимает слот; False, если свободного слота не появилось за timeout"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_use < self.limit, timeout):
+                return False
+            self._take()
+            return True
+
+    def try_acquire(self):
+        """Занимает слот без ожидания"""
+        with self.condition:
+            if self.in_use >= self.limit:
+                return False
+            self._take()
+            return True
+
+    def _take(self):
+        self.in_use += 1
+        if self.in_use >= self.limit:
+            self.saturated = True
+
+    def release(self):
+        """Освобождает слот"""
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def record(self, result):
+        """Учитывает ответ и при заполнении окна пересчитывает предел"""
+        if not self.enabled:
+            return
+        processing_time = result.get('processing_time', 0)
+        overloaded = bool(result.get('timeout_exceeded')) or result.get('status_code') in OVERLOAD_STATUSES
+        now = time.time()
+
+        with self.condition:
+            if result.get('retry_after') is not None:
+                self.retry_after_responses += 1
+            # Запрос начат до последнего снижения предела и описывает уже прошлую нагрузку
+            if now - processing_time < self.adjusted_at:
+                return
+
+            if result.get('retry_after') is not None:
+                # Сервер явно просит подождать — не дожидаемся конца окна
+                self._decrease('retry_after', now)
+                return
+
+            self.window.record(processing_time)
+            self.window_overloads += overloaded
+            if self.window.count >= max(self.min_window, self.limit):
+                self._evaluate_window(now)
+
+    def _evaluate_window(self, now):
+        """Решение по заполненному окну: мультипликативное снижение или рост на слот"""
+        overload_rate = self.window_overloads / self.window.count
+        p90 = self.window.percentile(90)
+        slow = (self.baseline is not None and p90 > LATENCY_FLOOR and
+                p90 > self.baseline * self.latency_tolerance)
+
+        if overload_rate > self.error_threshold:
+            self._decrease('errors', now)
+        elif slow:
+            self._decrease('latency', now)
+        else:
+            self.baseline = p90 if self.baseline is None else min(p90, self.baseline * (1 + BASELINE_DRIFT))
+            # Расти имеет смысл, только если все слоты были заняты
+            if self.saturated and self.limit < self.max_limit:
+                self.increases += 1
+                self._set_limit(self.limit + 1, 'increase', now)
+            self._reset_window()
+
+    def _decrease(self, reason, now):
+        new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        if new_limit < self.limit:
+            self.decreases += 1
+            self._set_limit(new_limit, reason, now)
+        self.adjusted_at = now
+        self._reset_window()
+
+    def _set_limit(self, limit, reason, now):
+        self.history.append({'at': round(now - self.started_at, 2), 'limit': limit, 'reason': reason})
+        self.limit = limit
+        self.peak_limit = max(self.peak_limit, limit)
+        self.condition.notify_all()
+
+    def _reset_window(self):
+        self.window = LatencyHistogram()
+        self.window_overloads = 0
+        self.saturated = self.in_use >= self.limit
+
+    def describe(self):
+        """Текущий предел, границы и история изменений"""
+        with self.condition:
+            return {
+                'enabled': self.enabled,
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'peak_limit': self.peak_limit,
+                'in_use': self.in_use,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'retry_after_responses': self.retry_after_responses,
+                'baseline_p90': round(self.baseline, 4) if self.baseline is not None else None,
+                'history': list(self.history)
+            }
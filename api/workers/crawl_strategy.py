@@ -0,0 +1,87 @@
+from abc import ABC, abstractmethod
+
+
+class CrawlStrategy(ABC):
+    """Порядок обхода фронтира: ключ приоритета URL (меньше — раньше).
+
+    При равных ключах URL выдаются в порядке добавления.
+    """
+
+    name = None
+    # Ключ зависит от данных, которые меняются во время сканирования (нужен пересчет)
+    dynamic = False
+
+    @abstractmethod
+    def key(self, url, depth):
+        """Ключ приоритета URL в куче фронтира"""
+
+
+class BreadthFirst(CrawlStrategy):
+    """Уровень за уровнем, как раньше делала очередь FIFO"""
+
+    name = 'bfs'
+
+    def key(self, url, depth):
+        return depth
+
+
+class DepthFirst(CrawlStrategy):
+    """Сначала самые глубокие найденные страницы"""
+
+    name = 'dfs'
+
+    def key(self, url, depth):
+        return -depth
+
+
+class InLinksFirst(CrawlStrategy):
+    """Сначала страницы, на которые ссылается больше уже загруженных страниц"""
+
+    name = 'inlinks'
+    dynamic = True
+
+    def __init__(self, inlinks):
+        self.inlinks = inlinks
+
+    def key(self, url, depth):
+        return -self.inlinks(url), depth
+
+
+class ShortestUrlFirst(CrawlStrategy):
+    """Сначала короткие URL: обычно это разделы, а не карточки и фильтры"""
+
+    name = 'shortest'
+
+    def key(self, url, depth):
+        return len(url), depth
+
+
+class SitemapPriority(CrawlStrategy):
+    """Сначала страницы с высоким <priority> из sitemap (без него — 0.5 по спецификации)"""
+
+    name = 'sitemap'
+    default_priority = 0.5
+
+    def __init__(self, priorities):
+        self.priorities = priorities
+
+    def key(self, url, depth):
+        return -self.priorities.get(url, self.default_priority), depth
+
+
+STRATEGIES = ('bfs', 'dfs', 'inlinks', 'shortest', 'sitemap')
+
+
+def create_strategy(name, inlinks=None, sitemap_priorities=None):
+    """Создает стратегию обхода по имени"""
+    if name == 'bfs':
+        return BreadthFirst()
+    if name == 'dfs':
+        return DepthFirst()
+    if name == 'inlinks':
+        return InLinksFirst(inlinks)
+    if name == 'shortest':
+        return ShortestUrlFirst()
+    if name == 'sitemap':
+        return SitemapPriority(sitemap_priorities if sitemap_priorities is not None else {})
+    raise ValueError(f"Неизвестная стратегия обхода: {name}")
@@ -0,0 +1,81 @@
+import re
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse, parse_qsl
+from config import APP_CONFIG
+from utils.simhash import SimHashIndex
+
+DIGITS_RE = re.compile(r'\d+')
+# Сколько шаблонов-ловушек показывать в статистике
+MAX_REPORTED_TRAPS = 20
+
+
+def url_pattern(url):
+    """Шаблон URL: числа в пути заменены на {n}, от query остаются отсортированные ключи"""
+    parsed = urlparse(url)
+    path = DIGITS_RE.sub('{n}', parsed.path) or '/'
+    keys = sorted({key for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+    return path + ('?' + '&'.join(keys) if keys else '')
+
+
+class DuplicateDetector:
+    """Почти дубликаты страниц по SimHash и шаблоны URL, которые их порождают.
+
+    Отпечаток каждой новой страницы ищется в индексе по расстоянию Хэмминга;
+    уникальные страницы добавляются в индекс. Шаблон URL, страницы которого
+    часто оказываются дубликатами (фасетные фильтры, календари, идентификаторы
+    сессий), помечается ловушкой, и его ссылки больше не попадают во фронтир.
+    """
+
+    def __init__(self, max_distance=None):
+        self.index = SimHashIndex(max_distance)
+        self.action = APP_CONFIG['near_duplicate_action']
+        self.trap_min_duplicates = APP_CONFIG['trap_min_duplicates']
+        self.trap_ratio = APP_CONFIG['trap_duplicate_ratio']
+        self.patterns = defaultdict(lambda: [0, 0])
+        self.traps = set()
+        self.duplicates = 0
+        self.lock = threading.Lock()
+
+    def check(self, url, fingerprint):
+        """URL страницы, почти дублем которой является url, или None (страница добавляется в индекс)"""
+        value = int(fingerprint, 16)
+        pattern = url_pattern(url)
+        with self.lock:
+            counts = self.patterns[pattern]
+            counts[0] += 1
+            original = self.index.find(value)
+            if original is None:
+                self.index.add(value, url)
+                return None
+
+            self.duplicates += 1
+            counts[1] += 1
+            if (pattern not in self.traps and counts[1] >= self.trap_min_duplicates and
+                    counts[1] / counts[0] >= self.trap_ratio):
+                self.traps.add(pattern)
+                print(f"Шаблон URL {pattern} похож на ловушку: {counts[1]} дублей из {counts[0]} страниц")
+            return original
+
+    def is_trap(self, url):
+        """Совпадает ли URL с шаблоном-ловушкой"""
+        if not self.traps:
+            return False
+        return url_pattern(url) in self.traps
+
+    def describe(self):
+        """Размер индекса, число дублей и шаблоны-ловушки"""
+        with self.lock:
+            traps = sorted(self.traps, key=lambda pattern: -self.patterns[pattern][1])[:MAX_REPORTED_TRAPS]
+            return {
+                'enabled': True,
+                'max_distance': self.index.max_distance,
+                'action': self.action,
+                'indexed_pages': self.index.size,
+                'near_duplicates': self.duplicates,
+                'trap_patterns': [
+                    {'pattern': pattern, 'pages': self.patterns[pattern][0],
+                     'duplicates': self.patterns[pattern][1]}
+                    for pattern in traps
+                ]
+            }
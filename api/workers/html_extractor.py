@@ -0,0 +1,232 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+from config import APP_CONFIG
+from utils.resource_detector import get_resource_type
+from utils.simhash import SimHasher
+from utils.url_rules import canonical_netloc
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Теги со ссылками и атрибут, в котором лежит адрес
+LINK_ATTRIBUTES = {
+    'a': 'href',
+    'link': 'href',
+    'script': 'src',
+    'img': 'src',
+    'iframe': 'src',
+}
+
+# Атрибуты элемента, которые сохраняются в описании ссылки
+KEPT_ATTRIBUTES = ('rel', 'type', 'target', 'title', 'alt', 'media', 'hreflang')
+
+SKIPPED_PREFIXES = ('#', 'javascript:', 'mailto:', 'tel:', 'data:')
+
+# Содержимое этих тегов не входит в видимый текст страницы
+NON_TEXT_TAGS = ('script', 'style', 'noscript', 'template')
+
+MAX_META_TAGS = 50
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class PageCollector:
+    """Собирает ссылки, заголовок, мета-теги и SimHash текста из потока событий парсера.
+
+    Интерфейс start/end/data/close совпадает с target-интерфейсом lxml,
+    поэтому один и тот же сборщик работает с любым потоковым бэкендом
+    и не строит дерево документа.
+    """
+
+    def __init__(self, base_url, fingerprint=None):
+        self.base_url = base_url
+        parsed = urlparse(base_url)
+        self.base_domain = canonical_netloc(parsed.scheme, parsed.netloc)
+        self.links = []
+        self.title_parts = None
+        self.title = None
+        self.meta = {}
+        self.anchor = None
+        self.anchor_text = []
+        self.resolved = {}
+        # Отпечаток видимого текста для поиска почти дубликатов (флаг задает сканирование)
+        if fingerprint is None:
+            fingerprint = APP_CONFIG['near_duplicate_detection']
+        self.fingerprint = SimHasher() if fingerprint else None
+        self.non_text_depth = 0
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if tag in NON_TEXT_TAGS:
+            self.non_text_depth += 1
+
+        if tag == 'title' and self.title is None:
+            self.title_parts = []
+        elif tag == 'base' and attrs.get('href') and not self.links:
+            self.base_url = urljoin(self.base_url, attrs['href'])
+            self.resolved.clear()
+        elif tag == 'meta':
+            self._collect_meta(attrs)
+
+        attribute = LINK_ATTRIBUTES.get(tag)
+        if attribute is None:
+            return
+
+        if tag == 'link' and attrs.get('rel', '').lower() == 'canonical' and attrs.get('href'):
+            self.meta['canonical'] = urljoin(self.base_url, attrs['href'])
+
+        href = attrs.get(attribute)
+        if not href:
+            return
+        href = href.strip()
+        if not href or href.startswith(SKIPPED_PREFIXES):
+            return
+
+        if tag == 'a':
+            self._finish_anchor()
+
+        absolute_url, link_type, resource_type = self._resolve(href)
+        link = {
+            'url': absolute_url,
+            'type': link_type,
+            'resource_type': resource_type,
+            'element': tag,
+            'text': '',
+            'attributes': {k: attrs[k] for k in KEPT_ATTRIBUTES if k in attrs}
+        }
+        self.links.append(link)
+
+        if tag == 'a':
+            self.anchor = link
+            self.anchor_text = []
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in NON_TEXT_TAGS:
+            self.non_text_depth = max(0, self.non_text_depth - 1)
+        if tag == 'a':
+            self._finish_anchor()
+        elif tag == 'title' and self.title_parts is not None:
+            self.title = ''.join(self.title_parts).strip()[:200]
+            self.title_parts = None
+
+    def data(self, data):
+        if self.title_parts is not None:
+            self.title_parts.append(data)
+        if self.anchor is not None:
+            stripped = data.strip()
+            if stripped:
+                self.anchor_text.append(stripped)
+        if self.fingerprint is not None and not self.non_text_depth:
+            self.fingerprint.feed(data)
+
+    def close(self):
+        self._finish_anchor()
+        if self.title is None and self.title_parts:
+            self.title = ''.join(self.title_parts).strip()[:200]
+        return {
+            'links': self.links,
+            'title': self.title or 'No title',
+            'meta': self.meta,
+            'simhash': self.fingerprint.digest() if self.fingerprint is not None else None
+        }
+
+    def _resolve(self, href):
+        """Абсолютный URL, тип и тип ресурса; повторяющиеся на странице ссылки считаются один раз"""
+        resolved = self.resolved.get(href)
+        if resolved is None:
+            absolute_url = urljoin(self.base_url, href)
+            absolute_url = absolute_url.split('#')[0].rstrip('/')
+            parsed = urlparse(absolute_url)
+            # Регистр хоста и порт по умолчанию не делают ссылку внешней
+            link_type = 'internal' if canonical_netloc(parsed.scheme, parsed.netloc) == self.base_domain else 'external'
+            resolved = self.resolved[href] = (absolute_url, link_type, get_resource_type(absolute_url))
+        return resolved
+
+    def _finish_anchor(self):
+        if self.anchor is not None:
+            self.anchor['text'] = ''.join(self.anchor_text)[:100]
+            self.anchor = None
+            self.anchor_text = []
+
+    def _collect_meta(self, attrs):
+        name = attrs.get('name') or attrs.get('property') or attrs.get('http-equiv')
+        content = attrs.get('content')
+        if name and content is not None and len(self.meta) < MAX_META_TAGS:
+            self.meta.setdefault(name.lower(), content.strip()[:500])
+
+
+class HtmlParserExtractor(HTMLParser):
+    """Потоковый экстрактор на стандартном html.parser (без зависимостей)"""
+
+    name = 'html.parser'
+
+    def __init__(self, base_url, fingerprint=None):
+        super().__init__(convert_charrefs=True)
+        self.collector = PageCollector(base_url, fingerprint)
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {k: v or '' for k, v in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+    def close(self):
+        super().close()
+        return self.collector.close()
+
+
+class LxmlExtractor:
+    """Потоковый экстрактор на libxml2: события идут прямо в сборщик, дерево не строится"""
+
+    name = 'lxml'
+
+    def __init__(self, base_url, fingerprint=None):
+        self.collector = PageCollector(base_url, fingerprint)
+        self.parser = etree.HTMLParser(target=self.collector, recover=True)
+
+    def feed(self, data):
+        self.parser.feed(data)
+
+    def close(self):
+        try:
+            return self.parser.close()
+        except etree.XMLSyntaxError:
+            return self.collector.close()
+
+
+EXTRACTOR_BACKENDS = {
+    'html.parser': HtmlParserExtractor,
+}
+if etree is not None:
+    EXTRACTOR_BACKENDS['lxml'] = LxmlExtractor
+
+
+def create_extractor(base_url, backend=None, fingerprint=None):
+    """Создает экстрактор выбранного бэкенда ('auto' — самый быстрый из доступных)"""
+    backend = backend or APP_CONFIG['html_parser']
+    if backend == 'auto':
+        backend = 'lxml' if 'lxml' in EXTRACTOR_BACKENDS else 'html.parser'
+    if backend not in EXTRACTOR_BACKENDS:
+        raise ValueError(f"Неизвестный HTML парсер: {backend}")
+    return EXTRACTOR_BACKENDS[backend](base_url, fingerprint)
+
+
+def extract_page(html, base_url, backend=None, deadline=None, fingerprint=None):
+    """Один проход по HTML: ссылки, заголовок, мета-теги и SimHash текста"""
+    extractor = create_extractor(base_url, backend, fingerprint)
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        # Проверяем время разбора между порциями
+        if deadline is not None and deadline.expired():
+            print(f"Прервано извлечение ссылок из {base_url} - превышено время")
+            break
+        extractor.feed(html[start:start + FEED_CHUNK_SIZE])
+    return extractor.close()
@@ -0,0 +1,118 @@
+import socket
+import time
+from config import TIMEOUT_CONFIG
+from utils.deadline import Deadline, TimeoutException, current_deadline
+from utils.transport import httpx, create_http2_client
+from workers.body_reader import BodyReader, wants_body
+from workers.slave_worker import SlaveWorker
+
+# Заголовки соединения HTTP/1.1, запрещенные в HTTP/2
+CONNECTION_HEADERS = ('Connection', 'Keep-Alive', 'Upgrade-Insecure-Requests')
+
+
+class Http2SlaveWorker(SlaveWorker):
+    """Слейв на httpx: запросы всех рабочих к хосту идут потоками одного HTTP/2 соединения"""
+
+    def _create_session(self):
+        """Клиент httpx на общем транспорте процесса"""
+        return create_http2_client(self._build_headers())
+
+    def _build_headers(self):
+        """Заголовки профиля устройства без заголовков соединения HTTP/1.1"""
+        headers = super()._build_headers()
+        for name in CONNECTION_HEADERS:
+            headers.pop(name, None)
+        return headers
+
+    def process_url(self, url, depth, timeout=None, deadline=None):
+        """Обрабатывает одну страницу по HTTP/2 (или HTTP/1.1, если сервер не поддерживает h2)"""
+        start_time = time.time()
+        operation_timeout = timeout or self.request_timeout
+        deadline = Deadline(operation_timeout, parent=deadline or current_deadline(), name=url)
+
+        try:
+            print(f"Слейв {self.slave_id} обрабатывает: {url} (глубина: {depth}, таймаут: {operation_timeout}с)")
+            deadline.check('ожидание запроса')
+
+            with self.session.stream(
+                    'GET', url,
+                    headers=self._conditional_headers(url),
+                    timeout=httpx.Timeout(deadline.timeout_for(operation_timeout),
+                                          connect=deadline.timeout_for(TIMEOUT_CONFIG['connect_timeout']))
+            ) as response:
+                # По истечении срока поток закрывается, даже если сервер отдает тело по байту
+                abort_handle = deadline.on_expire(lambda: self._abort_response(response))
+                try:
+                    # 3xx (в т.ч. 304) — не ошибка, raise_for_status в httpx считает иначе
+                    if response.status_code >= 400:
+                        response.raise_for_status()
+                    # Непрочитанный поток не-HTML ответа сбрасывается при выходе, соединение остается
+                    reader = None
+                    if wants_body(response.status_code, response.headers):
+                        reader = BodyReader.for_worker(self, url, response.encoding)
+                        self._read_body(response, reader, deadline)
+                finally:
+                    abort_handle.cancel()
+
+            processing_time = time.time() - start_time
+            redirect_chain = [str(r.url) for r in response.history] + [str(response.url)]
+            return self._build_success_result(
+                url, depth, response.status_code, response.headers,
+                reader, redirect_chain, processing_time,
+                http_version=response.http_version
+            )
+
+        except TimeoutException as e:
+            processing_time = time.time() - start_time
+            self.stats['timeout_errors'] += 1
+            return self._process_timeout_error(e, url, depth, processing_time)
+
+        except httpx.TimeoutException as e:
+            processing_time = time.time() - start_time
+            self.stats['timeout_errors'] += 1
+            return self._process_timeout_error(e, url, depth, processing_time)
+
+        except httpx.HTTPStatusError as e:
+            processing_time = time.time() - start_time
+            return self._process_error_response(e, url, depth, processing_time,
+                                                status_code=e.response.status_code)
+
+        except httpx.HTTPError as e:
+            processing_time = time.time() - start_time
+            if deadline.expired():
+                self.stats['timeout_errors'] += 1
+                error = TimeoutException(f"Операция {url} прервана по сроку: {e}")
+                return self._process_timeout_error(error, url, depth, processing_time)
+            return self._process_error_response(e, url, depth, processing_time, status_code=0)
+
+        except Exception as e:
+            processing_time = time.time() - start_time
+            return self._process_exception(e, url, depth, processing_time)
+
+    def _read_body(self, response, reader, deadline):
+        """Читает тело ответа кадрами по мере прихода, проверяя срок между ними"""
+        # Без chunk_size httpx отдает данные сразу, а не копит их до размера куска
+        for chunk in response.iter_bytes():
+            deadline.check('чтение ответа')
+            if not reader.feed(chunk):
+                break
+
+    @staticmethod
+    def _abort_response(response):
+        """Обрывает соединение HTTP/1.1-ответа, разблокируя чтение в потоке слейва.
+
+        Соединение HTTP/2 общее для всех рабочих хоста, а закрытие одного потока
+        в httpcore не будит ожидающий его поток, поэтому HTTP/2 не трогается:
+        срок проверяется между кадрами, а таймаут чтения не длиннее срока.
+        """
+        if response.http_version != 'HTTP/1.1':
+            return
+        stream = response.extensions.get('network_stream')
+        sock = stream.get_extra_info('socket') if stream is not None else None
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+            else:
+                response.close()
+        except (httpx.HTTPError, OSError):
+            pass
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+from utils.resource_detector import get_resource_type
+
+LINK_TYPES = ('internal', 'external')
+
+
+class LinkRecord:
+    """Детали уникальной ссылки; сам URL и страницы, где она найдена, хранятся как ID"""
+
+    __slots__ = ('resource_type', 'element', 'text', 'found_on_pages', 'found_on_count', 'first_seen_at')
+
+    def __init__(self, resource_type, element, text, first_seen_at):
+        self.resource_type = resource_type
+        self.element = element
+        self.text = text
+        self.found_on_pages = set()
+        self.found_on_count = 0
+        self.first_seen_at = first_seen_at
+
+    def add_source(self, page_id, cap=None):
+        """Учитывает страницу со ссылкой; ID страниц хранятся не больше cap штук (0 — только счетчик)"""
+        self.found_on_count += 1
+        if cap is None or len(self.found_on_pages) < cap:
+            self.found_on_pages.add(page_id)
+
+
+class LinkShard:
+    """Часть хранилища ссылок со своей блокировкой"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_type = {link_type: defaultdict(set) for link_type in LINK_TYPES}
+        self.details = {link_type: {} for link_type in LINK_TYPES}
+
+
+class LinkStore:
+    """Уникальные ссылки сканирования, разбитые на шарды по ID URL.
+
+    Ссылки страницы группируются по шардам, и каждая блокировка берется один
+    раз на страницу, поэтому рабочие, разбирающие разные страницы, почти не
+    ждут друг друга.
+    """
+
+    def __init__(self, url_table, base_domain, found_on_cap=None, num_shards=16):
+        self.url_table = url_table
+        self.base_domain = base_domain
+        self.found_on_cap = found_on_cap
+        self.shards = [LinkShard() for _ in range(max(1, num_shards))]
+
+    def add_page_links(self, links, source_url, normalize):
+        """Сохраняет ссылки страницы; возвращает (url_id, link_type, resource_type) для каждой ссылки"""
+        source_id = self.url_table.intern(source_url)
+        batches = defaultdict(list)
+        kinds = []
+
+        for link in links:
+            url = normalize(link['url'])
+            url_id = self.url_table.intern(url)
+            link_type = 'internal' if urlparse(url).netloc == self.base_domain else 'external'
+            resource_type = link.get('resource_type') or get_resource_type(url)
+            kinds.append((url_id, link_type, resource_type))
+            batches[url_id % len(self.shards)].append((url_id, link_type, resource_type, link))
+
+        now = time.time()
+        for shard_index, batch in batches.items():
+            shard = self.shards[shard_index]
+            # Один URL всегда попадает в один шард, поэтому повторы на странице видны внутри пачки
+            seen_on_page = set()
+            with shard.lock:
+                for url_id, link_type, resource_type, link in batch:
+                    shard.by_type[link_type][resource_type].add(url_id)
+                    details = shard.details[link_type]
+                    record = details.get(url_id)
+                    if record is None:
+                        record = details[url_id] = LinkRecord(
+                            resource_type, link.get('element', 'unknown'), link.get('text', ''), now
+                        )
+                    # Повтор ссылки на той же странице не считается новым источником
+                    if url_id in seen_on_page:
+                        continue
+                    seen_on_page.add(url_id)
+                    if source_id not in record.found_on_pages:
+                        record.add_source(source_id, self.found_on_cap)
+
+        return kinds
+
+    def found_on_count(self, url):
+        """Сколько страниц ссылаются на URL (0, если ссылка не встречалась)"""
+        url_id = self.url_table.lookup(url)
+        if url_id is None:
+            return 0
+        shard = self.shards[url_id % len(self.shards)]
+        with shard.lock:
+            for details in shard.details.values():
+                record = details.get(url_id)
+                if record is not None:
+                    return record.found_on_count
+        return 0
+
+    def count(self, link_type):
+        """Количество уникальных ссылок данного типа"""
+        return sum(len(shard.details[link_type]) for shard in self.shards)
+
+    def unique_count(self):
+        """Количество всех уникальных ссылок"""
+        return sum(self.count(link_type) for link_type in LINK_TYPES)
+
+    def details(self, link_type):
+        """Пары (url_id, LinkRecord) всех ссылок данного типа"""
+        items = []
+        for shard in self.shards:
+            with shard.lock:
+                items.extend(shard.details[link_type].items())
+        return items
+
+    def dump(self):
+        """Все записи о ссылках в виде списков (для контрольной точки)"""
+        rows = []
+        for shard in self.shards:
+            with shard.lock:
+                for link_type, details in shard.details.items():
+                    for url_id, record in details.items():
+                        rows.append([url_id, link_type, record.resource_type, record.element, record.text,
+                                     sorted(record.found_on_pages), record.found_on_count, record.first_seen_at])
+        return rows
+
+    def load(self, rows):
+        """Восстанавливает записи из dump()"""
+        for url_id, link_type, resource_type, element, text, found_on_pages, found_on_count, first_seen_at in rows:
+            shard = self.shards[url_id % len(self.shards)]
+            record = LinkRecord(resource_type, element, text, first_seen_at)
+            record.found_on_pages = set(found_on_pages)
+            record.found_on_count = found_on_count
+            shard.details[link_type][url_id] = record
+            shard.by_type[link_type][resource_type].add(url_id)
+
+    def by_type(self, link_type):
+        """ID ссылок данного типа, сгруппированные по типу ресурса"""
+        merged = defaultdict(set)
+        for shard in self.shards:
+            with shard.lock:
+                for resource_type, url_ids in shard.by_type[link_type].items():
+                    merged[resource_type].update(url_ids)
+        return merged
@@ -1,32 +1,68 @@
 import threading
 import queue
 import time
+from concurrent.futures import wait as wait_futures, FIRST_COMPLETED
 from collections import defaultdict
-from urllib.parse import urlparse, urlunparse
+from urllib.parse import urlparse
 from datetime import datetime
 from workers.slave_worker import SlaveWorker, TimeoutException
+from workers.http2_worker import Http2SlaveWorker
+from workers.scheduler import PolitenessScheduler
+from workers.concurrency import AdaptiveConcurrency
+from workers.retry import RetryPolicy
+from workers.crawl_strategy import create_strategy
+from workers.duplicates import DuplicateDetector
+from workers.parse_pool import get_parse_pool
+from workers.scan_stats import ScanStats
+from workers.link_store import LinkStore
+from workers.progress_feed import ProgressFeed
 from config import DEVICE_CONFIGS, APP_CONFIG, TIMEOUT_CONFIG
-from utils.resource_detector import get_status_code_category, get_resource_type
+from utils.resource_detector import get_status_code_category
+from utils.robots import get_robots_cache
+from utils.sitemap import fetch_sitemap_urls
+from utils.deadline import Deadline
+from utils.url_table import UrlTable, create_visited_set
+from utils.url_rules import UrlCanonicalizer, UrlFilter, canonical_netloc
+from utils.transport import get_dns_cache, http2_available
+from storage.checkpoint import save_checkpoint, delete_checkpoint
+from storage.scan_store import get_scan_store
+from storage.validator_cache import ValidatorCache
+
+
+# Статусы, после которых продолжать нечего и контрольная точка удаляется
+TERMINAL_STATUSES = ('queue_empty', 'max_pages_reached', 'completed')
 
 
 class MasterController:
     """Мастер-контроллер для управления слейвами с таймаутами"""
 
+    engine = 'threads'
+
     def __init__(self, scan_id, domain, max_pages=100, max_depth=3, num_workers=5,
-                 timeout=None, request_timeout=None):
+                 timeout=None, request_timeout=None, crawl_delay=None, parse_mode=None,
+                 visited_filter=None, found_on_cap=None, include_found_on=True, retain_results=True,
+                 scan_store=None, checkpoints=None, conditional=None, http_version=None,
+                 max_body_size=None, adaptive=None, max_retries=None, respect_robots=None,
+                 sitemaps=None, strategy=None, near_duplicates=None, sort_query=None, drop_params=None,
+                 include=None, exclude=None):
         if not domain.startswith(('http://', 'https://')):
             domain = 'https://' + domain
 
         self.scan_id = scan_id
         self.domain = domain
         parsed_domain = urlparse(domain)
-        self.base_domain = parsed_domain.netloc
         self.scheme = parsed_domain.scheme
+        self.base_domain = canonical_netloc(self.scheme, parsed_domain.netloc)
         self.max_pages = max_pages
         self.max_depth = max_depth
         self.num_workers = min(num_workers, APP_CONFIG['max_workers'])
         self.total_timeout = timeout or APP_CONFIG['total_scan_timeout']
         self.request_timeout = request_timeout or APP_CONFIG['request_timeout']
+        self.parse_mode = parse_mode or APP_CONFIG['parse_mode']
+
+        # Правила канонизации URL и фильтр include/exclude, общие для всех ссылок сканирования
+        self.canonicalizer = UrlCanonicalizer(sort_query, drop_params)
+        self.url_filter = UrlFilter(include, exclude)
 
         # Флаги состояния
         self.timed_out = False
@@ -34,15 +70,41 @@ class MasterController:
         self.scan_completed = False
         self.shutdown_requested = False
 
-        # Структуры для управления
-        self.visited_urls = set()
-        self.url_queue = queue.Queue()
-        self.results = []
+        # Структуры для управления: URL хранятся один раз в таблице, остальное ссылается на ID
+        self.url_table = UrlTable()
+        self.visited_urls = create_visited_set(
+            visited_filter or APP_CONFIG['visited_filter'],
+            self.url_table,
+            APP_CONFIG['bloom_capacity'],
+            APP_CONFIG['bloom_error_rate']
+        )
+        # Порядок обхода: при лимите страниц первыми загружаются самые важные по стратегии
+        self.strategy_name = strategy or APP_CONFIG['crawl_strategy']
+        self.sitemap_priorities = {}
+        self.url_queue = PolitenessScheduler(strategy=self._create_strategy())
+        if crawl_delay is not None:
+            self.url_queue.set_host_delay(self.base_domain, crawl_delay)
+        self.robots_crawl_delay = None
+
+        # robots.txt фильтрует фронтир, sitemap.xml засевает его страницами любой глубины
+        self.respect_robots = APP_CONFIG['respect_robots'] if respect_robots is None else respect_robots
+        self.use_sitemaps = APP_CONFIG['use_sitemaps'] if sitemaps is None else sitemaps
+        self.robots = None
+        self.robots_rules = None
+        self.sitemap_stats = {'enabled': self.use_sitemaps, 'sources': [], 'urls_found': 0, 'seeded': 0}
+
+        # Почти дубликаты по SimHash текста: их ссылки уходят в конец фронтира, ловушки отсекаются
+        if near_duplicates is None:
+            near_duplicates = APP_CONFIG['near_duplicate_detection']
+        self.near_duplicates = DuplicateDetector() if near_duplicates else None
         self.stats_lock = threading.Lock()
         self.progress_callback = None
+        # Снимки прогресса строятся с ограниченной частотой и читаются подписчиками из буфера
+        self.progress_feed = ProgressFeed(self._build_progress)
 
         # Таймеры и события
         self.timeout_timer = None
+        self.scan_deadline = None
         self.stop_event = threading.Event()
         self.pause_event = threading.Event()
         self.pause_event.set()
@@ -50,53 +112,221 @@ class MasterController:
         # Семафор для контроля количества обработанных страниц
         self.pages_semaphore = threading.Semaphore(max_pages)
 
-        # Хранилища для уникальных ссылок
-        self.all_unique_links = set()
-        self.internal_links_by_type = defaultdict(set)
-        self.external_links_by_type = defaultdict(set)
-        self.internal_links_details = {}
-        self.external_links_details = {}
-
-        # Статистика
-        self.stats = {
-            'status_codes': defaultdict(int),
-            'status_categories': defaultdict(int),
-            'content_types': defaultdict(int),
-            'resource_types': defaultdict(int),
-            'device_usage': defaultdict(int),
-            'slave_stats': defaultdict(lambda: {'processed': 0, 'errors': 0, 'total_time': 0, 'timeouts': 0}),
-            'redirects': defaultdict(int),
-            'response_times': [],
-            'depths': defaultdict(int),
-            'link_types': defaultdict(int),
-            'timeout_errors': 0,
-            'total_operations': 0,
-            'avg_operation_time': 0
-        }
+        # Сколько страниц-источников хранить для каждой ссылки (None — все, 0 — только счетчик)
+        self.found_on_cap = found_on_cap if found_on_cap is not None else APP_CONFIG['found_on_pages_cap']
+        self.include_found_on = include_found_on
+
+        # Уникальные ссылки (ID из url_table), разбитые на шарды со своими блокировками
+        self.link_store = LinkStore(self.url_table, self.base_domain, self.found_on_cap,
+                                    APP_CONFIG['link_store_shards'])
+
+        # Статистика и результаты: у каждого потока свои, сливаются при чтении
+        self.scan_stats = ScanStats(retain_results)
+
+        # Постоянное хранилище страниц, ссылок и связей (None — не сохранять)
+        self.scan_store = scan_store
+
+        # Условные запросы по ETag/Last-Modified прошлых сканирований (кеш загружается при старте)
+        self.conditional = APP_CONFIG['conditional_requests'] if conditional is None else conditional
+        self.validator_cache = None
+
+        # Контрольные точки: фронтир, посещенные URL и частичная статистика на диске
+        self.checkpoints_enabled = APP_CONFIG['checkpoint_enabled'] if checkpoints is None else checkpoints
+        self.last_checkpoint_at = time.time()
+        self.interrupted = []
+        self.previous_elapsed = 0
+        self.resume_count = 0
+
+        # HTTP/2 (httpx) мультиплексирует запросы рабочих в одном соединении с хостом
+        self.http_version = http_version or APP_CONFIG['http_version']
+        if self.http_version == '2' and not http2_available():
+            print("HTTP/2 недоступен (нужны пакеты httpx и h2), используется HTTP/1.1")
+            self.http_version = '1.1'
+
+        # Тело ответа читается потоком не дальше этого лимита, не-HTML тела не читаются вовсе
+        self.max_body_size = max_body_size or APP_CONFIG['max_body_size']
+
+        # AIMD-регулятор: num_workers — начальное число слотов, предел растет до max_fetch_slots
+        self.adaptive = APP_CONFIG['adaptive_concurrency'] if adaptive is None else adaptive
+        initial_slots, self.max_fetch_slots = self._fetch_slot_bounds()
+        self.fetch_slots = AdaptiveConcurrency(initial_slots, self.max_fetch_slots, enabled=self.adaptive)
+
+        # Временные ошибки повторяются через очередь отложенных повторов фронтира
+        self.retry_policy = RetryPolicy(max_attempts=max_retries)
+
+        # Разбор HTML в пуле процессов: результаты страниц приходят асинхронно
+        self.parse_pool = get_parse_pool() if self.parse_mode == 'process' else None
+        self.pending_parses = set()
+        # Готовые разборы ждут здесь рабочих потоков сканирования, а не обрабатываются в потоке пула
+        self.parsed_pages = queue.Queue()
 
         # Инициализация рабочих
         self.workers = self._create_workers()
+        for worker in self.workers:
+            worker.parse_pool = self.parse_pool
+            worker.max_body_size = self.max_body_size
+            worker.fingerprint_text = self.near_duplicates is not None
 
         # Добавляем начальный URL
         initial_url = self._normalize_url(domain)
         self.url_queue.put((initial_url, 0))
         self.visited_urls.add(initial_url)
 
+    @classmethod
+    def from_checkpoint(cls, state, **kwargs):
+        """Создает контроллер, продолжающий сканирование с контрольной точки"""
+        config = dict(state['config'])
+        config.update({key: value for key, value in kwargs.items() if value is not None})
+        master = cls(scan_id=state['scan_id'], **config)
+        master._restore(state)
+        return master
+
+    def _checkpoint_config(self):
+        """Параметры конструктора, с которыми сканирование продолжится"""
+        return {
+            'domain': self.domain,
+            'max_pages': self.max_pages,
+            'max_depth': self.max_depth,
+            'num_workers': self.num_workers,
+            'timeout': self.total_timeout,
+            'request_timeout': self.request_timeout,
+            'crawl_delay': self.url_queue.get_host_delay(self.base_domain),
+            'parse_mode': self.parse_mode,
+            'visited_filter': self.visited_urls.mode,
+            'found_on_cap': self.found_on_cap,
+            'include_found_on': self.include_found_on,
+            'conditional': self.conditional,
+            'http_version': self.http_version,
+            'max_body_size': self.max_body_size,
+            'adaptive': self.adaptive,
+            'max_retries': self.retry_policy.max_attempts,
+            'respect_robots': self.respect_robots,
+            'sitemaps': self.use_sitemaps,
+            'strategy': self.strategy_name,
+            'near_duplicates': self.near_duplicates is not None,
+            'sort_query': self.canonicalizer.sort_query,
+            'drop_params': list(self.canonicalizer.drop_params),
+            'include': list(self.url_filter.include),
+            'exclude': list(self.url_filter.exclude)
+        }
+
+    def build_checkpoint(self):
+        """Снимок состояния сканирования для продолжения с того же места"""
+        # Статистика снимается раньше фронтира: страница, учтенная после снимка, будет загружена повторно,
+        # но не потеряется. Таблица URL — последней, чтобы в ней были все ID из остальных частей.
+        stats = self.scan_stats.dump()
+        links = self.link_store.dump()
+        visited = self.visited_urls.dump()
+        frontier = self.url_queue.snapshot() + list(self.interrupted)
+        elapsed = time.time() - self.scan_start_time if self.scan_start_time else 0
+
+        return {
+            'scan_id': self.scan_id,
+            'engine': self.engine,
+            'config': self._checkpoint_config(),
+            'frontier': [[url, depth] for url, depth in dict(frontier).items()],
+            'visited': visited,
+            'stats': stats,
+            'links': links,
+            'workers': {worker.slave_id: dict(worker.stats) for worker in self.workers},
+            'robots_crawl_delay': self.robots_crawl_delay,
+            'sitemap_priorities': self.sitemap_priorities,
+            'elapsed': self.previous_elapsed + elapsed,
+            'resume_count': self.resume_count,
+            'checkpointed_at': time.time(),
+            'urls': self.url_table.dump()
+        }
+
+    def save_checkpoint(self):
+        """Записывает контрольную точку на диск"""
+        if not self.checkpoints_enabled:
+            return
+        self.last_checkpoint_at = time.time()
+        try:
+            size = save_checkpoint(self.scan_id, self.build_checkpoint())
+            print(f"Контрольная точка {self.scan_id} сохранена ({size / 1024:.1f} КБ)")
+        except Exception as e:
+            print(f"Не удалось сохранить контрольную точку {self.scan_id}: {e}")
+
+    def _final_checkpoint(self, failed=False):
+        """Сохраняет точку остановленного, упавшего или прерванного сканирования, у завершенного удаляет"""
+        if not self.checkpoints_enabled:
+            return
+        if failed or self.interrupted or self._get_completion_status() not in TERMINAL_STATUSES:
+            self.save_checkpoint()
+        else:
+            delete_checkpoint(self.scan_id)
+
+    def _maybe_checkpoint(self):
+        """Сохраняет контрольную точку, если прошел checkpoint_interval"""
+        if self.checkpoints_enabled and time.time() - self.last_checkpoint_at >= APP_CONFIG['checkpoint_interval']:
+            self.save_checkpoint()
+
+    def _restore(self, state):
+        """Восстанавливает фронтир, посещенные URL, ссылки и статистику из контрольной точки"""
+        self.url_table = UrlTable.load(state['urls'])
+        self.visited_urls = create_visited_set(
+            state['visited']['mode'], self.url_table,
+            APP_CONFIG['bloom_capacity'], APP_CONFIG['bloom_error_rate']
+        )
+        self.visited_urls.load(state['visited'])
+
+        self.link_store = LinkStore(self.url_table, self.base_domain, self.found_on_cap,
+                                    APP_CONFIG['link_store_shards'])
+        self.link_store.load(state['links'])
+        self.scan_stats.load(state['stats'])
+
+        for worker in self.workers:
+            worker.stats.update(state['workers'].get(worker.slave_id, {}))
+
+        # Очередь собирается заново только из необработанных URL
+        self.sitemap_priorities.update(state.get('sitemap_priorities', {}))
+        scheduler = PolitenessScheduler(strategy=self.url_queue.strategy)
+        scheduler.host_delays = dict(self.url_queue.host_delays)
+        for url, depth in state['frontier']:
+            scheduler.put((url, depth))
+        self.url_queue = scheduler
+
+        self.pages_semaphore = threading.Semaphore(max(0, self.max_pages - state['stats']['pages']))
+        self.robots_crawl_delay = state['robots_crawl_delay']
+        self.previous_elapsed = state['elapsed']
+        self.resume_count = state['resume_count'] + 1
+        print(f"Сканирование {self.scan_id} продолжается с контрольной точки: "
+              f"{state['stats']['pages']} страниц, {len(state['frontier'])} URL во фронтире")
+
+    def _create_strategy(self):
+        """Стратегия обхода фронтира; данные для ключей берутся у контроллера в момент вызова"""
+        return create_strategy(
+            self.strategy_name,
+            inlinks=lambda url: self.link_store.found_on_count(url),
+            sitemap_priorities=self.sitemap_priorities
+        )
+
     def _normalize_url(self, url):
-        """Нормализует URL: убирает фрагменты, приводит к единому виду"""
-        parsed = urlparse(url)
-        normalized = parsed._replace(fragment="", params="")
-        normalized_url = urlunparse(normalized)
-        if normalized_url.endswith('/'):
-            normalized_url = normalized_url.rstrip('/')
-        return normalized_url
+        """Нормализует URL по правилам канонизации сканирования"""
+        return self.canonicalizer.canonicalize(url)
+
+    def _fetch_slot_bounds(self):
+        """Начальное и наибольшее число одновременных запросов (рабочих потоков)"""
+        if not self.adaptive:
+            return self.num_workers, self.num_workers
+        ceiling = min(APP_CONFIG['max_workers'], self.num_workers * APP_CONFIG['adaptive_growth'])
+        return self.num_workers, max(self.num_workers, ceiling)
+
+    def limit_fetch_slots(self, slots):
+        """Ограничивает число одновременных запросов сканирования (до запуска)"""
+        if slots < self.max_fetch_slots:
+            self.max_fetch_slots = slots
+            self.fetch_slots.cap(slots)
 
     def _create_workers(self):
         """Создает и возвращает список рабочих с настройками таймаутов"""
         workers = []
-        for i in range(self.num_workers):
+        worker_class = Http2SlaveWorker if self.http_version == '2' else SlaveWorker
+        # Потоков столько, сколько допускает верхний предел; лишние ждут свободного слота
+        for i in range(self.max_fetch_slots):
             device_config = DEVICE_CONFIGS[i % len(DEVICE_CONFIGS)]
-            worker = SlaveWorker(
+            worker = worker_class(
                 slave_id=f"slave-{i + 1}",
                 device_config=device_config,
                 request_timeout=self.request_timeout
@@ -104,25 +334,78 @@ class MasterController:
             workers.append(worker)
         return workers
 
+    def _prepare_frontier(self):
+        """Перед стартом: правила robots.txt, Crawl-delay и страницы из sitemap"""
+        # Подготовка идет уже внутри срока сканирования: остановка и общий таймаут прерывают ее
+        if self.scan_deadline.expired():
+            return
+        self._load_robots()
+        # При возобновлении фронтир уже содержит страницы sitemap
+        if self.use_sitemaps and not self.resume_count and not self.scan_deadline.expired():
+            self._seed_from_sitemaps()
+
+    def _load_robots(self):
+        """Берет robots.txt сканируемого хоста из общего кеша: правила и Crawl-delay"""
+        origin = f"{self.scheme}://{self.base_domain}"
+        user_agent = self.workers[0].device['user_agent'] if self.workers else '*'
+
+        self.robots = get_robots_cache().get(origin, user_agent,
+                                             self.scan_deadline.timeout_for(self.request_timeout))
+        rules = self.robots.rules_for(APP_CONFIG['robots_product_token'])
+        if self.respect_robots:
+            self.robots_rules = rules
+
+        robots_delay = rules.crawl_delay
+        if robots_delay:
+            self.robots_crawl_delay = float(robots_delay)
+            delay = max(self.url_queue.get_host_delay(self.base_domain), self.robots_crawl_delay)
+            self.url_queue.set_host_delay(self.base_domain, delay)
+            print(f"robots.txt: Crawl-delay {self.robots_crawl_delay}с для {self.base_domain}")
+
+    def _seed_from_sitemaps(self):
+        """Добавляет во фронтир страницы хоста из sitemap (адреса из robots.txt или /sitemap.xml)"""
+        sources = self.robots.sitemaps or [f"{self.scheme}://{self.base_domain}/sitemap.xml"]
+        user_agent = self.workers[0].device['user_agent'] if self.workers else '*'
+        depth = min(APP_CONFIG['sitemap_depth'], self.max_depth)
+        self.sitemap_stats['sources'] = sources
+
+        started = time.time()
+        phase = self.scan_deadline.child(APP_CONFIG['sitemap_timeout'], name=f"sitemap {self.scan_id}")
+        for loc, priority in fetch_sitemap_urls(sources, user_agent, self.request_timeout, deadline=phase):
+            self.sitemap_stats['urls_found'] += 1
+            url = self._normalize_url(loc)
+            if urlparse(url).netloc != self.base_domain:
+                continue
+            if self.url_filter.active and not self.url_filter.allowed(url):
+                continue
+            if self.robots_rules is not None and not self.robots_rules.allowed(url):
+                continue
+            if priority is not None:
+                self.sitemap_priorities[url] = priority
+            if self.visited_urls.add(url):
+                self.url_queue.put((url, depth))
+                self.sitemap_stats['seeded'] += 1
+
+        if self.sitemap_stats['urls_found']:
+            print(f"sitemap: {self.sitemap_stats['seeded']} из {self.sitemap_stats['urls_found']} URL "
+                  f"добавлено во фронтир за {time.time() - started:.2f}с")
+
     def _start_timeout_timer(self):
-        """Запускает таймер общего таймаута сканирования"""
+        """Создает срок сканирования и запускает таймер общего таймаута"""
+        self.scan_deadline = Deadline(self.total_timeout if self.total_timeout > 0 else None,
+                                      name=f"сканирование {self.scan_id}")
         if self.total_timeout > 0:
-            self.timeout_timer = threading.Timer(
-                self.total_timeout,
-                self._handle_total_timeout
-            )
-            self.timeout_timer.daemon = True
-            self.timeout_timer.start()
+            self.timeout_timer = self.scan_deadline.on_expire(self._handle_total_timeout)
             print(f"Установлен общий таймаут сканирования: {self.total_timeout} секунд")
 
     def _handle_total_timeout(self):
         """Обрабатывает общий таймаут сканирования"""
+        if self.shutdown_requested or self.scan_completed:
+            return
         print(f"Сработал общий таймаут сканирования ({self.total_timeout} секунд)")
         self.timed_out = True
         self.stop_event.set()
-
-        with self.stats_lock:
-            self.stats['timeout_errors'] += 1
+        self._local_stats()['timeout_errors'] += 1
 
     def _check_scan_timeout(self):
         """Проверяет, не превышено ли общее время сканирования"""
@@ -137,6 +420,10 @@ class MasterController:
         """Устанавливает callback для отслеживания прогресса"""
         self.progress_callback = callback
 
+    def set_result_sink(self, sink):
+        """Устанавливает получателя результатов страниц по мере их готовности"""
+        self.scan_stats.result_sink = sink
+
     def pause_scan(self):
         """Приостанавливает сканирование"""
         self.pause_event.clear()
@@ -152,125 +439,326 @@ class MasterController:
         print("Получен запрос на остановку сканирования")
         self.shutdown_requested = True
         self.stop_event.set()
+        # Отмена срока сканирования прерывает запросы, которые сейчас в полете
+        if self.scan_deadline:
+            self.scan_deadline.cancel()
+
+    @property
+    def results(self):
+        """Результаты всех потоков (собираются при чтении)"""
+        return self.scan_stats.results()
+
+    def _results_count(self):
+        """Количество обработанных страниц"""
+        return self.scan_stats.results_count()
+
+    def _local_stats(self):
+        """Статистика текущего потока; обновляется без блокировок"""
+        return self.scan_stats.local_stats().stats
+
+    def _build_progress(self):
+        """Формирует снимок прогресса сканирования"""
+        pages_done = self._results_count()
+        elapsed = time.time() - self.scan_start_time if self.scan_start_time else 0
+        remaining = max(0, self.total_timeout - elapsed) if self.total_timeout > 0 else None
+
+        return {
+            'total': pages_done,
+            'max': self.max_pages,
+            'queue_size': self.url_queue.qsize(),
+            'visited': len(self.visited_urls),
+            'unique_links': self.link_store.unique_count(),
+            'elapsed_time': round(elapsed, 2),
+            'remaining_time': round(remaining, 2) if remaining is not None else None,
+            'percentage': min(100, round(pages_done / self.max_pages * 100, 1)),
+            'timed_out': self.timed_out,
+            'is_paused': not self.pause_event.is_set(),
+            'shutdown_requested': self.shutdown_requested,
+            'engine': self.engine,
+            'scan_completed': self.scan_completed,
+            'response_time': self.scan_stats.response_times().summary(),
+            'concurrency_limit': self.fetch_slots.limit,
+            'slave_performance': {worker.slave_id: worker.get_stats_summary() for worker in self.workers}
+        }
 
     def _update_progress(self):
-        """Обновляет информацию о прогрессе"""
-        if self.progress_callback:
-            elapsed = time.time() - self.scan_start_time if self.scan_start_time else 0
-            remaining = max(0, self.total_timeout - elapsed) if self.total_timeout > 0 else None
-
-            progress = {
-                'total': len(self.results),
-                'max': self.max_pages,
-                'queue_size': self.url_queue.qsize(),
-                'visited': len(self.visited_urls),
-                'unique_links': len(self.all_unique_links),
-                'elapsed_time': round(elapsed, 2),
-                'remaining_time': round(remaining, 2) if remaining is not None else None,
-                'percentage': min(100, round(len(self.results) / self.max_pages * 100, 1)),
-                'timed_out': self.timed_out,
-                'is_paused': not self.pause_event.is_set(),
-                'shutdown_requested': self.shutdown_requested
-            }
-            self.progress_callback(progress)
+        """Отмечает изменение прогресса; снимок публикуется не чаще progress_interval"""
+        snapshot = self.progress_feed.update()
+        if snapshot is not None and self.progress_callback:
+            self.progress_callback(snapshot)
 
-    def _process_and_store_link(self, link, source_url):
-        """Обрабатывает и сохраняет информацию о ссылке"""
-        url = self._normalize_url(link['url'])
+    def _update_statistics(self, worker, result, depth, source_url):
+        """Обновляет статистику текущего потока на основе результата"""
+        # Добавляем результат (или только передаем его в потоковую выдачу)
+        stats = self.scan_stats.add_result(result).stats
+        targets = ()
+
+        # Статистика по глубине
+        stats['depths'][depth] += 1
+
+        # Статистика по слейву
+        slave_stats = stats['slave_stats'][worker.slave_id]
+        slave_stats['processed'] += 1
+        processing_time = result.get('processing_time', 0)
+        slave_stats['total_time'] += processing_time
+
+        # Время ответа по слейву, устройству и категории статуса
+        status_category = get_status_code_category(result['status_code']) if result['success'] else 'error'
+        stats['latency_by_slave'][worker.slave_id].record(processing_time)
+        stats['latency_by_device'][result.get('device_used', 'unknown')].record(processing_time)
+        stats['latency_by_status'][status_category].record(processing_time)
+
+        stats['outcomes']['success' if result['success'] else 'error'] += 1
+        if result.get('timeout_exceeded'):
+            stats['outcomes']['timeout'] += 1
+
+        if result['success']:
+            # Статистика успешных запросов
+            status_code = result['status_code']
+            stats['status_codes'][status_code] += 1
+            stats['status_categories'][status_category] += 1
+            stats['content_types'][result.get('content_type', '')] += 1
+            stats['device_usage'][result['device_used']] += 1
+            stats['http_versions'][result.get('http_version') or 'unknown'] += 1
+            if result.get('body_skipped'):
+                stats['outcomes']['body_skipped'] += 1
+            elif result.get('body_truncated'):
+                stats['outcomes']['body_truncated'] += 1
+            stats['response_times'].record(processing_time)
+
+            # Статистика по редиректам
+            if 'redirect_chain' in result and len(result['redirect_chain']) > 1:
+                stats['redirects'][len(result['redirect_chain'])] += 1
+
+            # Ответ 304 отдан из кеша, у полного ответа запоминаем валидаторы
+            if result.get('not_modified'):
+                stats['outcomes']['not_modified'] += 1
+            elif self.validator_cache is not None and status_code == 200:
+                self.validator_cache.remember(source_url, result)
+
+            # Сохраняем все ссылки страницы в шарды хранилища
+            if 'links' in result:
+                kinds = self.link_store.add_page_links(result['links'], source_url, self._normalize_url)
+                for url_id, link_type, resource_type in kinds:
+                    stats['resource_types'][resource_type] += 1
+                    stats['link_types'][link_type] += 1
+                targets = {url_id for url_id, _, _ in kinds}
+        else:
+            # Статистика ошибок
+            slave_stats['errors'] += 1
+            stats['status_codes'][result.get('status_code', 0)] += 1
+            stats['status_categories']['error'] += 1
 
-        self.all_unique_links.add(url)
+        if self.scan_store is not None:
+            self.scan_store.add_page(self.scan_id, result, [self.url_table.url(url_id) for url_id in targets])
 
-        parsed_url = urlparse(url)
-        is_internal = parsed_url.netloc == self.base_domain
+    def _add_new_links_to_queue(self, links, current_depth, source_url, duplicate=False):
+        """Добавляет новые ссылки в очередь для обработки (со страницы-дубля — в конец очереди)"""
+        if self._results_count() >= self.max_pages:
+            return
+        penalty = 0
+        if duplicate:
+            if self.near_duplicates.action == 'drop':
+                return
+            penalty = 1
+
+        # Ссылки со страниц последнего уровня не ставятся в очередь, но могут поднять приоритет уже найденных
+        enqueue = current_depth < self.max_depth
+        reprioritize = self.url_queue.strategy.dynamic
+        if not enqueue and not reprioritize:
+            return
 
-        resource_type = link.get('resource_type', get_resource_type(url))
+        url_filter = self.url_filter if self.url_filter.active else None
+        for link in links:
+            # Добавляем только внутренние HTML-ссылки
+            if link['type'] == 'internal' and link['resource_type'] == 'html':
 
-        link_details = {
-            'url': url,
-            'type': 'internal' if is_internal else 'external',
-            'resource_type': resource_type,
-            'element': link.get('element', 'unknown'),
-            'text': link.get('text', ''),
-            'found_on_pages': [],
-            'first_seen_at': time.time()
-        }
+                normalized_url = self._normalize_url(link['url'])
+                if not enqueue:
+                    self.url_queue.reprioritize(normalized_url)
+                    continue
+                # add() атомарно проверяет и отмечает URL, поэтому фильтры ниже выполняются один раз на URL
+                if self.visited_urls.add(normalized_url):
+                    if url_filter is not None and not url_filter.allowed(normalized_url):
+                        self._local_stats()['frontier']['filtered_out'] += 1
+                        continue
+                    if self.robots_rules is not None and not self.robots_rules.allowed(normalized_url):
+                        self._local_stats()['frontier']['robots_disallowed'] += 1
+                        continue
+                    if self.near_duplicates is not None and self.near_duplicates.is_trap(normalized_url):
+                        self._local_stats()['frontier']['trap_links_dropped'] += 1
+                        continue
+                    self.url_queue.put((normalized_url, current_depth + 1), penalty=penalty)
+                elif reprioritize:
+                    self.url_queue.reprioritize(normalized_url)
+
+    def _observe_response(self, url, result):
+        """Передает ответ регулятору параллельности; по Retry-After откладывает хост"""
+        if self._is_interrupted(result):
+            return
+        retry_after = result.get('retry_after')
+        if retry_after:
+            self.url_queue.defer_host(urlparse(url).netloc, retry_after)
+        self.fetch_slots.record(result)
+
+    def _is_interrupted(self, result):
+        """Запрос прерван остановкой или общим таймаутом, а не ошибкой сайта"""
+        if result['success'] or not result.get('timeout_exceeded'):
+            return False
+        return self.stop_event.is_set() or (self.scan_deadline is not None and self.scan_deadline.expired())
+
+    def _handle_result(self, worker, result, depth, source_url):
+        """Учитывает результат страницы; False, если страница будет загружена при возобновлении"""
+        if self._is_interrupted(result):
+            # URL остается в контрольной точке вместо записи ошибки таймаута
+            self.interrupted.append((source_url, depth))
+            return False
+
+        if self._schedule_retry(result, depth, source_url):
+            return True
+
+        duplicate = self._check_near_duplicate(result, source_url)
+        self._update_statistics(worker, result, depth, source_url)
+
+        # Добавляем новые ссылки в очередь
+        if result['success']:
+            self._add_new_links_to_queue(result['links'], depth, source_url, duplicate)
+
+        self._update_progress()
+        return True
+
+    def _check_near_duplicate(self, result, source_url):
+        """Отмечает в результате страницу, почти дублем которой он является; True для дубля"""
+        if self.near_duplicates is None or not result['success'] or not result.get('simhash'):
+            return False
+        original = self.near_duplicates.check(source_url, result['simhash'])
+        if original is None:
+            return False
+        result['near_duplicate_of'] = original
+        self._local_stats()['frontier']['near_duplicates'] += 1
+        return True
+
+    def _schedule_retry(self, result, depth, source_url):
+        """Откладывает повтор временной ошибки; False, если результат учитывается как есть"""
+        stats = self._local_stats()
+        reason = self.retry_policy.reason(result)
+        if reason is not None:
+            delay = self.retry_policy.schedule(source_url, result)
+            if delay is not None:
+                self.url_queue.retry((source_url, depth), delay)
+                stats['retries']['scheduled'] += 1
+                stats['retry_reasons'][reason] += 1
+                # Неудачная попытка не считается страницей
+                self.pages_semaphore.release()
+                return True
+            stats['retries']['exhausted'] += 1
 
-        if is_internal:
-            self.internal_links_by_type[resource_type].add(url)
-            if url not in self.internal_links_details:
-                self.internal_links_details[url] = link_details
-            if source_url not in self.internal_links_details[url]['found_on_pages']:
-                self.internal_links_details[url]['found_on_pages'].append(source_url)
-        else:
-            self.external_links_by_type[resource_type].add(url)
-            if url not in self.external_links_details:
-                self.external_links_details[url] = link_details
-            if source_url not in self.external_links_details[url]['found_on_pages']:
-                self.external_links_details[url]['found_on_pages'].append(source_url)
+        if self.retry_policy.forget(source_url) and result['success']:
+            stats['retries']['recovered'] += 1
+        return False
 
-        return is_internal, resource_type
+    def _parse_result(self, future, url):
+        """Возвращает результат отложенного разбора или пустую страницу при ошибке"""
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Ошибка при парсинге {url}: {e}")
+            return {'links': [], 'title': 'No title', 'meta': {}}
+
+    def _submit_result(self, worker, result, depth, source_url):
+        """Принимает результат слейва; если разбор отложен, учтет его по готовности"""
+        parse_future = result.pop('parse_future', None)
+        if parse_future is None:
+            handled = False
+            try:
+                handled = self._handle_result(worker, result, depth, source_url)
+            finally:
+                # Необработанный URL остается в снимке очереди для контрольной точки
+                self.url_queue.task_done(source_url if handled else None)
+            return
 
-    def _update_statistics(self, worker, result, depth, source_url):
-        """Обновляет статистику на основе результата"""
         with self.stats_lock:
-            # Добавляем результат
-            self.results.append(result)
-
-            # Статистика по глубине
-            self.stats['depths'][depth] += 1
-
-            # Статистика по слейву
-            self.stats['slave_stats'][worker.slave_id]['processed'] += 1
-            self.stats['slave_stats'][worker.slave_id]['total_time'] += result.get('processing_time', 0)
-
-            if result['success']:
-                # Статистика успешных запросов
-                status_code = result['status_code']
-                self.stats['status_codes'][status_code] += 1
-                self.stats['status_categories'][get_status_code_category(status_code)] += 1
-                self.stats['content_types'][result.get('content_type', '')] += 1
-                self.stats['device_usage'][result['device_used']] += 1
-                self.stats['response_times'].append(result.get('processing_time', 0))
-
-                # Статистика по редиректам
-                if 'redirect_chain' in result and len(result['redirect_chain']) > 1:
-                    self.stats['redirects'][len(result['redirect_chain'])] += 1
-
-                # Обрабатываем и сохраняем все ссылки
-                if 'links' in result:
-                    for link in result['links']:
-                        # Обрабатываем ссылку
-                        is_internal, resource_type = self._process_and_store_link(link, source_url)
-
-                        # Обновляем общую статистику по типам
-                        self.stats['resource_types'][resource_type] += 1
-                        self.stats['link_types']['internal' if is_internal else 'external'] += 1
-            else:
-                # Статистика ошибок
-                self.stats['slave_stats'][worker.slave_id]['errors'] += 1
-                self.stats['status_codes'][result.get('status_code', 0)] += 1
-                self.stats['status_categories']['error'] += 1
-
-    def _add_new_links_to_queue(self, links, current_depth, source_url):
-        """Добавляет новые ссылки в очередь для обработки"""
-        if current_depth >= self.max_depth:
+            self.pending_parses.add(parse_future)
+
+        def on_parsed(future):
+            # Вызывается в общем для всех сканирований потоке пула: только передаем страницу дальше
+            self.parsed_pages.put((worker, result, depth, source_url, future))
+            with self.stats_lock:
+                self.pending_parses.discard(future)
+
+        parse_future.add_done_callback(on_parsed)
+
+    def _finish_parsed(self, worker, result, depth, source_url, future):
+        """Учитывает страницу, разобранную в пуле процессов"""
+        handled = False
+        try:
+            page = self._parse_result(future, source_url)
+            with self.stats_lock:
+                worker.apply_parsed_page(result, page)
+            handled = self._handle_result(worker, result, depth, source_url)
+        finally:
+            # URL считается обработанным только после разбора: до этого могут появиться новые ссылки
+            self.url_queue.task_done(source_url if handled else None)
+
+    def _drain_parsed(self):
+        """Учитывает все готовые разборы в текущем потоке сканирования"""
+        while True:
+            try:
+                item = self.parsed_pages.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self._finish_parsed(*item)
+            except Exception as e:
+                print(f"Ошибка при обработке разобранной страницы {item[3]}: {e}")
+
+    def _wait_parsed(self, timeout):
+        """Ждет готовности любого разбора; False, если разборов в пуле нет"""
+        with self.stats_lock:
+            pending = list(self.pending_parses)
+        if not pending:
+            return False
+        wait_futures(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        return True
+
+    def _store_scan_started(self):
+        """Регистрирует сканирование в постоянном хранилище"""
+        if self.scan_store is not None:
+            self.scan_store.scan_started(self.scan_id, self.domain, self.base_domain, self.engine, {
+                'max_pages': self.max_pages,
+                'max_depth': self.max_depth,
+                'num_workers': self.num_workers,
+                'parse_mode': self.parse_mode
+            })
+
+    def _load_validators(self):
+        """Загружает валидаторы страниц домена и раздает их рабочим"""
+        if not self.conditional:
             return
+        try:
+            self.validator_cache = ValidatorCache(self.scan_store or get_scan_store(), self.base_domain)
+        except Exception as e:
+            print(f"Не удалось загрузить кеш валидаторов: {e}")
+            return
+        print(f"Кеш валидаторов {self.base_domain}: {len(self.validator_cache)} страниц")
+        for worker in self.workers:
+            worker.validators = self.validator_cache
 
-        for link in links:
-            # Добавляем только внутренние HTML-ссылки
-            if (link['type'] == 'internal'
-                    and link['resource_type'] == 'html'
-                    and link['url'] not in self.visited_urls
-                    and len(self.results) < self.max_pages):
+    def _store_scan_finished(self, final_stats):
+        """Сохраняет уникальные ссылки и итоговую статистику в постоянное хранилище"""
+        if self.scan_store is None:
+            return
+        self.scan_store.add_links(self.scan_id, self.iter_link_records(include_found_on=False))
+        summary = {key: value for key, value in final_stats.items() if key != 'unique_links'}
+        self.scan_store.scan_finished(self.scan_id, final_stats['scan_summary']['completion_status'], summary)
 
-                normalized_url = self._normalize_url(link['url'])
-                if normalized_url not in self.visited_urls:
-                    self.visited_urls.add(normalized_url)
-                    self.url_queue.put((normalized_url, current_depth + 1))
+    def _is_idle(self):
+        """Очередь пуста и ни один URL не загружается и не разбирается"""
+        return self.url_queue.empty() and self.url_queue.all_tasks_done()
 
     def worker_task(self, worker):
         """Задача для одного рабочего потока"""
-        while not self.stop_event.is_set() and len(self.results) < self.max_pages:
+        while not self.stop_event.is_set() and self._results_count() < self.max_pages:
             try:
                 # Ждем, если сканирование на паузе
                 self.pause_event.wait()
@@ -278,59 +766,79 @@ class MasterController:
                 # Проверяем общий таймаут
                 if self._check_scan_timeout():
                     break
+
+                # Страницы, разобранные в пуле, учитываются рабочими потоками этого сканирования
+                self._drain_parsed()
+                # Пока фронтир пуст, новые ссылки могут прийти только из разборов — ждем их
+                if self.url_queue.empty() and self._wait_parsed(TIMEOUT_CONFIG['queue_timeout']):
+                    continue
                 # Проверка по max_pages
                 if not self.pages_semaphore.acquire(blocking=False):
                     # Достигнут лимит страниц, завершаем работу
                     break
 
+                # Ждем свободный слот регулятора параллельности
+                if not self.fetch_slots.acquire(timeout=TIMEOUT_CONFIG['queue_timeout']):
+                    self.pages_semaphore.release()
+                    if self._is_idle():
+                        break
+                    continue
+
                 # Берем URL из очереди с таймаутом
                 try:
                     url, depth = self.url_queue.get(timeout=TIMEOUT_CONFIG['queue_timeout'])
                 except queue.Empty:
                     # Если очередь пуста, проверяем, может быть сканирование завершено
+                    self.fetch_slots.release()
                     self.pages_semaphore.release()
-                    if len(self.results) >= self.max_pages or self.timed_out:
+                    if self._results_count() >= self.max_pages or self.timed_out:
+                        break
+                    # Новых ссылок уже не появится
+                    if self._is_idle():
                         break
                     continue
 
                 # Обрабатываем URL
-                result = worker.process_url(url, depth, timeout=self.request_timeout)
-
-                # Обновляем статистику
-                self._update_statistics(worker, result, depth, url)
-
-                # Добавляем новые ссылки в очередь
-                if result['success']:
-                    self._add_new_links_to_queue(result['links'], depth, url)
-
-                self.url_queue.task_done()
-
-                # Обновляем прогресс
-                self._update_progress()
+                try:
+                    result = worker.process_url(url, depth, timeout=self.request_timeout,
+                                                deadline=self.scan_deadline)
+                    self._observe_response(url, result)
+                except Exception:
+                    self.url_queue.task_done(url)
+                    raise
+                finally:
+                    self.fetch_slots.release()
+
+                # Обновляем статистику и очередь (сразу или после разбора в пуле)
+                self._submit_result(worker, result, depth, url)
 
             except TimeoutException as e:
                 print(f"Таймаут в рабочем {worker.slave_id}: {e}")
-                with self.stats_lock:
-                    self.stats['slave_stats'][worker.slave_id]['timeouts'] += 1
-                    self.stats['timeout_errors'] += 1
+                stats = self._local_stats()
+                stats['slave_stats'][worker.slave_id]['timeouts'] += 1
+                stats['timeout_errors'] += 1
                 if 'url' in locals():
                     self.pages_semaphore.release()
             except Exception as e:
                 print(f"Ошибка в рабочем {worker.slave_id}: {e}")
-                with self.stats_lock:
-                    self.stats['slave_stats'][worker.slave_id]['errors'] += 1
+                self._local_stats()['slave_stats'][worker.slave_id]['errors'] += 1
                 if 'url' in locals():
                     self.pages_semaphore.release()
 
-    def run_scan(self):
+    def run_scan(self, include_links=True):
         """Запускает параллельное сканирование с таймаутом"""
         self.scan_start_time = time.time()
-        print(f"Начинаем сканирование {self.domain} с {self.num_workers} воркерами")
+        print(f"Начинаем сканирование {self.domain} с {self.num_workers} воркерами"
+              f"{f' (адаптивно до {self.max_fetch_slots})' if self.adaptive else ''}")
         print(f"Общий таймаут: {self.total_timeout}с, Таймаут запроса: {self.request_timeout}с")
 
-        # Запускаем таймер общего таймаута
+        # Таймер общего таймаута запускается до загрузки robots.txt и sitemap
         self._start_timeout_timer()
 
+        self._prepare_frontier()
+        self._store_scan_started()
+        self._load_validators()
+
         threads = []
 
         # Запускаем рабочие потоки
@@ -344,12 +852,14 @@ class MasterController:
             threads.append(thread)
 
         # Мониторим прогресс
+        failed = False
         try:
             while (not self.stop_event.is_set() and
-                   len(self.results) < self.max_pages and
+                   self._results_count() < self.max_pages and
                    (self.url_queue.qsize() > 0 or any(t.is_alive() for t in threads))):
 
                 time.sleep(0.5)
+                self._maybe_checkpoint()
 
                 # Проверяем общий таймаут
                 if self._check_scan_timeout():
@@ -362,16 +872,20 @@ class MasterController:
                     break
 
                 # Периодически выводим прогресс
-                if len(self.results) % 10 == 0 and len(self.results) > 0:
+                pages_done = self._results_count()
+                if pages_done % 10 == 0 and pages_done > 0:
                     elapsed = time.time() - self.scan_start_time
-                    print(f"Прогресс: {len(self.results)}/{self.max_pages} страниц, "
-                          f"{len(self.all_unique_links)} ссылок, "
+                    print(f"Прогресс: {pages_done}/{self.max_pages} страниц, "
+                          f"{self.link_store.unique_count()} ссылок, "
                           f"{elapsed:.1f} секунд")
 
         except KeyboardInterrupt:
             print("Сканирование прервано пользователем (Ctrl+C)")
             self.shutdown_requested = True
             self.stop_event.set()
+        except Exception:
+            failed = True
+            raise
         finally:
             # Отмечаем сканирование как завершенное
             self.scan_completed = True
@@ -390,6 +904,14 @@ class MasterController:
                 thread.join(timeout=shutdown_timeout)
                 if thread.is_alive():
                     print(f"Предупреждение: поток {thread.name} не завершился за {shutdown_timeout} секунд")
+            # Дожидаемся страниц, которые еще разбираются в пуле процессов
+            with self.stats_lock:
+                pending = list(self.pending_parses)
+            if pending:
+                wait_futures(pending, timeout=shutdown_timeout)
+            self._drain_parsed()
+            # Итоговая точка: с нее можно продолжить после таймаута, остановки или ошибки
+            self._final_checkpoint(failed)
             # Очищаем семафор
             for _ in range(self.max_pages):
                 try:
@@ -400,18 +922,22 @@ class MasterController:
         scan_duration = time.time() - self.scan_start_time
 
         # Формируем итоговую статистику
-        final_stats = self._compile_final_stats(scan_duration)
+        final_stats = self._compile_final_stats(scan_duration, include_links)
+        self._store_scan_finished(final_stats)
+        self.progress_feed.close()
 
         return self.results, final_stats
 
-    def _compile_final_stats(self, scan_duration):
+    def _compile_final_stats(self, scan_duration, include_links=True):
         """Компилирует финальную статистику с учетом таймаутов"""
-        successful_pages = [r for r in self.results if r.get('success', False)]
-        error_pages = [r for r in self.results if not r.get('success', False)]
-        timeout_pages = [r for r in self.results if r.get('timeout_exceeded', False)]
+        # Сливаем статистику потоков один раз; итоги считаются по счетчикам, без списка результатов
+        stats = self.scan_stats.merged()
+        pages_total = sum(stats['depths'].values())
 
-        # Подготовка данных о ссылках
-        unique_links_data = self._prepare_links_data()
+        # Подготовка данных о ссылках (при потоковой выдаче ссылки отдаются отдельно)
+        unique_links_data = self._prepare_links_data() if include_links else None
+        internal_by_type = self.link_store.by_type('internal')
+        external_by_type = self.link_store.by_type('external')
 
         # Статистика по слейвам
         slave_performance = {}
@@ -420,67 +946,129 @@ class MasterController:
 
         # Анализ кодов ответа
         status_code_analysis = {}
-        for code, count in self.stats['status_codes'].items():
+        for code, count in stats['status_codes'].items():
             status_code_analysis[code] = {
                 'count': count,
                 'category': get_status_code_category(code),
-                'percentage': round(count / len(self.results) * 100, 2) if self.results else 0
+                'percentage': round(count / pages_total * 100, 2) if pages_total else 0
             }
 
-        # Расчет среднего времени ответа
-        avg_response_time = sum(self.stats['response_times']) / len(self.stats['response_times']) if self.stats[
-            'response_times'] else 0
+        # Среднее и перцентили времени ответа из гистограмм
+        avg_response_time = stats['response_times'].mean()
+        latency = {
+            'overall': stats['response_times'].summary(),
+            'by_slave': {k: v.summary() for k, v in sorted(stats['latency_by_slave'].items())},
+            'by_device': {k: v.summary() for k, v in sorted(stats['latency_by_device'].items())},
+            'by_status_category': {k: v.summary() for k, v in sorted(stats['latency_by_status'].items())}
+        }
 
         response_data = {
             'scan_summary': {
                 'scan_id': self.scan_id,
                 'domain': self.domain,
                 'base_domain': self.base_domain,
-                'total_pages_scanned': len(self.results),
-                'successful_pages': len(successful_pages),
-                'error_pages': len(error_pages),
-                'timeout_pages': len(timeout_pages),
+                'total_pages_scanned': pages_total,
+                'successful_pages': stats['outcomes']['success'],
+                'error_pages': stats['outcomes']['error'],
+                'timeout_pages': stats['outcomes']['timeout'],
                 'scan_duration_seconds': round(scan_duration, 2),
-                'pages_per_second': round(len(self.results) / scan_duration, 2) if scan_duration > 0 else 0,
+                'pages_per_second': round(pages_total / scan_duration, 2) if scan_duration > 0 else 0,
                 'avg_response_time_seconds': round(avg_response_time, 3),
-                'max_depth_reached': max([r.get('depth', 0) for r in self.results], default=0),
+                'max_depth_reached': max(stats['depths'], default=0),
                 'unique_urls_visited': len(self.visited_urls),
                 'timed_out': self.timed_out,
                 'shutdown_requested': self.shutdown_requested,
                 'total_timeout_seconds': self.total_timeout,
                 'request_timeout_seconds': self.request_timeout,
                 'timeout_exceeded': scan_duration > self.total_timeout if self.total_timeout > 0 else False,
-                'completion_status': self._get_completion_status()
+                'completion_status': self._get_completion_status(),
+                'resume_count': self.resume_count,
+                'total_elapsed_seconds': round(self.previous_elapsed + scan_duration, 2)
             },
             'links_analysis': {
-                'total_links_found': self.stats['link_types']['internal'] + self.stats['link_types']['external'],
-                'unique_internal_links': len(self.internal_links_details),
-                'unique_external_links': len(self.external_links_details),
-                'links_by_resource_type': dict(self.stats['resource_types']),
-                'links_by_type': dict(self.stats['link_types']),
-                'internal_links_by_resource_type': {k: len(v) for k, v in self.internal_links_by_type.items()},
-                'external_links_by_resource_type': {k: len(v) for k, v in self.external_links_by_type.items()}
+                'total_links_found': stats['link_types']['internal'] + stats['link_types']['external'],
+                'unique_internal_links': self.link_store.count('internal'),
+                'unique_external_links': self.link_store.count('external'),
+                'links_by_resource_type': dict(stats['resource_types']),
+                'links_by_type': dict(stats['link_types']),
+                'internal_links_by_resource_type': {k: len(v) for k, v in internal_by_type.items()},
+                'external_links_by_resource_type': {k: len(v) for k, v in external_by_type.items()}
             },
             'http_analysis': {
                 'status_codes': status_code_analysis,
-                'status_categories': dict(self.stats['status_categories']),
-                'content_types': dict(self.stats['content_types']),
-                'redirect_analysis': dict(self.stats['redirects'])
+                'status_categories': dict(stats['status_categories']),
+                'content_types': dict(stats['content_types']),
+                'redirect_analysis': dict(stats['redirects']),
+                'http_versions': dict(stats['http_versions']),
+                'body_downloads': {
+                    'max_body_size_kb': round(self.max_body_size / 1024, 1),
+                    # Не-HTML ответы: тело не загружалось
+                    'skipped': stats['outcomes']['body_skipped'],
+                    'truncated': stats['outcomes']['body_truncated']
+                },
+                'retries': {
+                    'max_attempts': self.retry_policy.max_attempts,
+                    'scheduled': stats['retries']['scheduled'],
+                    # Страницы, загруженные после одного или нескольких повторов
+                    'recovered': stats['retries']['recovered'],
+                    # Ошибки, оставшиеся после всех повторов
+                    'exhausted': stats['retries']['exhausted'],
+                    'pending': self.url_queue.retries_pending(),
+                    'reasons': dict(stats['retry_reasons'])
+                },
+                'conditional_requests': {
+                    'enabled': self.validator_cache is not None,
+                    'cached_validators': len(self.validator_cache) if self.validator_cache is not None else 0,
+                    'not_modified': stats['outcomes']['not_modified']
+                }
+            },
+            'discovery': {
+                'robots': {
+                    'respected': self.respect_robots,
+                    'status': self.robots.status if self.robots is not None else None,
+                    'disallowed_links': stats['frontier']['robots_disallowed'],
+                    **(self.robots_rules.describe() if self.robots_rules is not None else {}),
+                    'cache': get_robots_cache().describe()
+                },
+                'sitemaps': self.sitemap_stats,
+                'url_rules': {
+                    **self.canonicalizer.describe(),
+                    **self.url_filter.describe(),
+                    'filtered_out': stats['frontier']['filtered_out']
+                },
+                'near_duplicates': {
+                    **(self.near_duplicates.describe() if self.near_duplicates is not None else {'enabled': False}),
+                    'trap_links_dropped': stats['frontier']['trap_links_dropped']
+                }
             },
             'device_analysis': {
-                'device_usage': dict(self.stats['device_usage']),
-                'depth_distribution': dict(self.stats['depths'])
+                'device_usage': dict(stats['device_usage']),
+                'depth_distribution': dict(stats['depths'])
             },
             'performance': {
                 'slave_performance': slave_performance,
                 'total_processing_time': sum(worker.stats['total_time'] for worker in self.workers),
                 'total_data_transferred_mb': round(
-                    sum(worker.stats['total_bytes'] for worker in self.workers) / (1024 * 1024), 2)
+                    sum(worker.stats['total_bytes'] for worker in self.workers) / (1024 * 1024), 2),
+                'response_time': latency,
+                'url_table_size': len(self.url_table),
+                'dns_cache': get_dns_cache().describe(),
+                'concurrency': self.fetch_slots.describe(),
+                'visited_set': self.visited_urls.describe()
             },
             'configuration': {
                 'max_pages': self.max_pages,
                 'max_depth': self.max_depth,
                 'num_workers': self.num_workers,
+                'engine': self.engine,
+                'parse_mode': self.parse_mode,
+                'http_version': self.http_version,
+                'strategy': self.strategy_name,
+                'adaptive_concurrency': self.adaptive,
+                'max_concurrency': self.max_fetch_slots,
+                'found_on_pages_cap': self.found_on_cap,
+                'crawl_delay': self.url_queue.get_host_delay(self.base_domain),
+                'robots_crawl_delay': self.robots_crawl_delay,
                 'devices_used': [worker.device['name'] for worker in self.workers],
                 'scan_id': self.scan_id
             }
@@ -492,70 +1080,84 @@ class MasterController:
 
         return response_data
 
-    def _prepare_links_data(self):
+    def _link_details(self, url_id, record, link_type, include_found_on):
+        """Описание ссылки для JSON"""
+        url = self.url_table.url
+        details = {
+            'url': url(url_id),
+            'type': link_type,
+            'resource_type': record.resource_type,
+            'element': record.element,
+            'text': record.text,
+            'found_on_pages_count': record.found_on_count,
+            'found_on_pages_truncated': len(record.found_on_pages) < record.found_on_count,
+            'first_seen_at': datetime.fromtimestamp(record.first_seen_at).isoformat()
+        }
+        if include_found_on:
+            details['found_on_pages'] = sorted(url(page_id) for page_id in record.found_on_pages)
+        return details
+
+    def iter_link_records(self, include_found_on=None):
+        """Отдает описания уникальных ссылок по одному (для потоковой выдачи)"""
+        if include_found_on is None:
+            include_found_on = self.include_found_on
+        for link_type in ('internal', 'external'):
+            for url_id, record in self.link_store.details(link_type):
+                yield self._link_details(url_id, record, link_type, include_found_on)
+
+    def _prepare_links_data(self, include_found_on=None):
         """Подготавливает данные о всех уникальных ссылках"""
+        if include_found_on is None:
+            include_found_on = self.include_found_on
         try:
-            # Преобразуем множества в списки для JSON
+            url = self.url_table.url
+
+            internal_by_type = self.link_store.by_type('internal')
+            external_by_type = self.link_store.by_type('external')
+            internal_records = self.link_store.details('internal')
+            external_records = self.link_store.details('external')
+
+            # Преобразуем множества ID в отсортированные списки URL для JSON
             internal_links_by_type = {}
-            for resource_type, urls in self.internal_links_by_type.items():
-                internal_links_by_type[resource_type] = sorted(list(urls))
+            for resource_type, url_ids in internal_by_type.items():
+                internal_links_by_type[resource_type] = sorted(url(url_id) for url_id in url_ids)
 
             external_links_by_type = {}
-            for resource_type, urls in self.external_links_by_type.items():
-                external_links_by_type[resource_type] = sorted(list(urls))
+            for resource_type, url_ids in external_by_type.items():
+                external_links_by_type[resource_type] = sorted(url(url_id) for url_id in url_ids)
 
             # Подготавливаем детали ссылок для JSON
             internal_details = {}
-            for url, details in self.internal_links_details.items():
-                # Создаем копию деталей
-                details_copy = {
-                    'url': details['url'],
-                    'type': details['type'],
-                    'resource_type': details['resource_type'],
-                    'element': details['element'],
-                    'text': details['text'],
-                    'found_on_pages': list(details['found_on_pages']),
-                    'first_seen_at': datetime.fromtimestamp(details['first_seen_at']).isoformat()
-                }
-                internal_details[url] = details_copy
+            for url_id, record in internal_records:
+                internal_details[url(url_id)] = self._link_details(url_id, record, 'internal', include_found_on)
 
             external_details = {}
-            for url, details in self.external_links_details.items():
-                # Создаем копию деталей
-                details_copy = {
-                    'url': details['url'],
-                    'type': details['type'],
-                    'resource_type': details['resource_type'],
-                    'element': details['element'],
-                    'text': details['text'],
-                    'found_on_pages': list(details['found_on_pages']),
-                    'first_seen_at': datetime.fromtimestamp(details['first_seen_at']).isoformat()
-                }
-                external_details[url] = details_copy
+            for url_id, record in external_records:
+                external_details[url(url_id)] = self._link_details(url_id, record, 'external', include_found_on)
 
             # Подготавливаем top_internal_pages
             top_internal_pages = []
-            for url, details in self.internal_links_details.items():
+            for url_id, record in internal_records:
                 top_internal_pages.append({
-                    'url': url,
-                    'found_on_pages_count': len(details['found_on_pages']),
-                    'resource_type': details['resource_type']
+                    'url': url(url_id),
+                    'found_on_pages_count': record.found_on_count,
+                    'resource_type': record.resource_type
                 })
             top_internal_pages.sort(key=lambda x: x['found_on_pages_count'], reverse=True)
             top_internal_pages = top_internal_pages[:10]
 
             # Получаем топ внешних доменов
-            top_external_domains = self._get_top_external_domains()
+            top_external_domains = self._get_top_external_domains(external_records)
 
             return {
-                'all_unique_links': sorted(list(self.all_unique_links)),
+                'all_unique_links': sorted(url(url_id) for url_id, _ in internal_records + external_records),
                 'internal_links': {
-                    'total': len(self.internal_links_details),
+                    'total': len(internal_records),
                     'by_type': internal_links_by_type,
                     'details': internal_details
                 },
                 'external_links': {
-                    'total': len(self.external_links_details),
+                    'total': len(external_records),
                     'by_type': external_links_by_type,
                     'details': external_details
                 },
@@ -563,8 +1165,8 @@ class MasterController:
                     'top_internal_pages': top_internal_pages,
                     'top_external_domains': top_external_domains,
                     'resource_type_distribution': {
-                        'internal': {k: len(v) for k, v in self.internal_links_by_type.items()},
-                        'external': {k: len(v) for k, v in self.external_links_by_type.items()}
+                        'internal': {k: len(v) for k, v in internal_by_type.items()},
+                        'external': {k: len(v) for k, v in external_by_type.items()}
                     }
                 }
             }
@@ -572,12 +1174,14 @@ class MasterController:
             print(f"Ошибка при подготовке данных о ссылках: {e}")
             return None
 
-    def _get_top_external_domains(self):
+    def _get_top_external_domains(self, external_records=None):
         """Получает топ внешних доменов"""
+        if external_records is None:
+            external_records = self.link_store.details('external')
         domain_counts = defaultdict(int)
-        for url in self.external_links_details.keys():
+        for url_id, _ in external_records:
             try:
-                domain = urlparse(url).netloc
+                domain = urlparse(self.url_table.url(url_id)).netloc
                 if domain:
                     domain_counts[domain] += 1
             except Exception:
@@ -596,7 +1200,7 @@ class MasterController:
             return 'user_cancelled'
         elif self.timed_out:
             return 'timeout_exceeded'
-        elif len(self.results) >= self.max_pages:
+        elif self._results_count() >= self.max_pages:
             return 'max_pages_reached'
         elif not self.url_queue.qsize():
             return 'queue_empty'
@@ -0,0 +1,86 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from config import APP_CONFIG, TIMEOUT_CONFIG
+from utils.deadline import Deadline
+from workers.html_extractor import extract_page
+
+
+def parse_body(body, encoding, url, backend, parse_timeout, fingerprint=None):
+    """Разбирает тело страницы в дочернем процессе"""
+    text = body.decode(encoding or 'utf-8', errors='replace')
+    return extract_page(text, url, backend=backend, deadline=Deadline(parse_timeout, name=url),
+                        fingerprint=fingerprint)
+
+
+def parse_shared_body(shm_name, size, encoding, url, backend, parse_timeout, fingerprint=None):
+    """Разбирает тело, переданное через разделяемую память, без пиклинга байтов"""
+    # Сегментом владеет родительский процесс, он же его и удаляет
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        body = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return parse_body(body, encoding, url, backend, parse_timeout, fingerprint)
+
+
+class ParsePool:
+    """Пул процессов для разбора HTML, отделенный от сетевых потоков.
+
+    Сетевые потоки только отправляют тело страницы и сразу берут следующий URL,
+    а разбор масштабируется по ядрам без конкуренции за GIL. Крупные тела
+    передаются через shared_memory, мелкие — обычным аргументом.
+    """
+
+    def __init__(self, processes=None, backend=None):
+        self.processes = processes or APP_CONFIG['parse_processes'] or os.cpu_count() or 1
+        self.backend = backend or APP_CONFIG['html_parser']
+        self.shm_threshold = APP_CONFIG['shared_memory_threshold']
+        # spawn: дочерние процессы не наследуют потоки и блокировки Flask
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def submit(self, body, encoding, url, parse_timeout=None, fingerprint=None):
+        """Отправляет тело на разбор; возвращает Future с результатом extract_page"""
+        parse_timeout = parse_timeout or TIMEOUT_CONFIG['parse_timeout']
+
+        if len(body) < self.shm_threshold:
+            return self.executor.submit(parse_body, body, encoding, url, self.backend, parse_timeout, fingerprint)
+
+        shm = shared_memory.SharedMemory(create=True, size=len(body))
+        try:
+            shm.buf[:len(body)] = body
+            future = self.executor.submit(parse_shared_body, shm.name, len(body), encoding,
+                                          url, self.backend, parse_timeout, fingerprint)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def release(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(release)
+        return future
+
+    def shutdown(self):
+        """Останавливает процессы пула"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """Возвращает общий для процесса пул разбора (создается при первом обращении)"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool()
+        return _parse_pool
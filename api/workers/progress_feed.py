@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+from config import APP_CONFIG
+
+
+class ProgressFeed:
+    """Кольцевой буфер снимков прогресса сканирования.
+
+    Рабочие только отмечают, что прогресс изменился; снимок строится не чаще
+    одного раза за interval секунд. Подписчики (SSE, опрос /progress) читают
+    готовые снимки из буфера и не трогают контроллер. Последнее изменение
+    публикует первый подписчик, проснувшийся к концу интервала: первое
+    изменение после публикации будит подписчиков, чтобы они дождались окна.
+    """
+
+    def __init__(self, build_snapshot, interval=None, size=None):
+        self.build_snapshot = build_snapshot
+        self.interval = APP_CONFIG['progress_interval'] if interval is None else interval
+        self.buffer = deque(maxlen=size or APP_CONFIG['progress_buffer_size'])
+        self.sequence = 0
+        self.dirty = True
+        self.closed = False
+        self.last_published = 0
+        self.condition = threading.Condition()
+
+    def update(self):
+        """Отмечает изменение; возвращает новый снимок, если пришло время его опубликовать"""
+        was_dirty = self.dirty
+        self.dirty = True
+        if time.monotonic() - self.last_published < self.interval:
+            if not was_dirty:
+                # Подписчики спят без таймаута: пусть проснутся к концу окна и опубликуют изменение
+                with self.condition:
+                    self.condition.notify_all()
+            return None
+        with self.condition:
+            return self._publish_if_due()
+
+    def _publish_if_due(self):
+        if not self.dirty or time.monotonic() - self.last_published < self.interval:
+            return None
+        return self._publish()
+
+    def _publish(self):
+        # Вызывается под self.condition
+        self.dirty = False
+        self.last_published = time.monotonic()
+        snapshot = self.build_snapshot()
+        self.sequence += 1
+        self.buffer.append((self.sequence, snapshot))
+        self.condition.notify_all()
+        return snapshot
+
+    def latest(self):
+        """Последний снимок (с публикацией накопившихся изменений)"""
+        with self.condition:
+            if not self.buffer:
+                self._publish()
+            elif not self.closed:
+                self._publish_if_due()
+            return self.buffer[-1][1]
+
+    def wait(self, after, timeout=None):
+        """Ждет снимков новее after; возвращает ([(seq, snapshot)], closed)"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while True:
+                if not self.closed:
+                    self._publish_if_due()
+                events = [(seq, snapshot) for seq, snapshot in self.buffer if seq > after]
+                if events or self.closed:
+                    return events, self.closed
+
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return [], False
+                # Просыпаемся к следующему окну публикации, чтобы отдать отложенное изменение
+                wait_time = max(0.0, self.last_published + self.interval - now) if self.dirty else None
+                if deadline is not None:
+                    wait_time = deadline - now if wait_time is None else min(wait_time, deadline - now)
+                self.condition.wait(wait_time)
+
+    def close(self):
+        """Публикует итоговый снимок и завершает поток событий"""
+        with self.condition:
+            if self.closed:
+                return
+            self._publish()
+            self.closed = True
+            self.condition.notify_all()
@@ -0,0 +1,57 @@
+import random
+import threading
+from config import APP_CONFIG
+
+# Ошибки без ответа сервера, которые повтор не исправит
+PERMANENT_ERRORS = {
+    'InvalidURL', 'InvalidSchema', 'MissingSchema', 'InvalidHeader', 'TooManyRedirects',
+    'SSLError', 'UnsupportedProtocol', 'InvalidURLClientError', 'TooManyRedirectsClientError'
+}
+
+
+class RetryPolicy:
+    """Решает, повторять ли неудачную загрузку URL и через сколько.
+
+    Повторяются таймауты, сетевые ошибки и ответы из retry_statuses. Задержка
+    растет экспоненциально от retry_backoff_base до retry_backoff_max со
+    случайной половиной (equal jitter), чтобы повторы не приходили пачкой,
+    и не бывает меньше Retry-After сервера. На URL отводится retry_max_attempts повторов.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        self.max_attempts = APP_CONFIG['retry_max_attempts'] if max_attempts is None else max_attempts
+        self.base_delay = base_delay or APP_CONFIG['retry_backoff_base']
+        self.max_delay = max_delay or APP_CONFIG['retry_backoff_max']
+        self.statuses = set(APP_CONFIG['retry_statuses'])
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def reason(self, result):
+        """Причина повтора (timeout, connection, status_503) или None, если ошибка постоянная"""
+        if result['success']:
+            return None
+        if result.get('timeout_exceeded'):
+            return 'timeout'
+        status_code = result.get('status_code', 0)
+        if status_code in self.statuses:
+            return f"status_{status_code}"
+        if status_code == 0 and result.get('error_type') not in PERMANENT_ERRORS:
+            return 'connection'
+        return None
+
+    def schedule(self, url, result):
+        """Задержка до следующей попытки или None, если попытки URL исчерпаны"""
+        with self.lock:
+            attempt = self.attempts.get(url, 0)
+            if attempt >= self.max_attempts:
+                return None
+            self.attempts[url] = attempt + 1
+
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        return max(delay, result.get('retry_after') or 0)
+
+    def forget(self, url):
+        """Сбрасывает счетчик попыток URL и возвращает, сколько повторов было"""
+        with self.lock:
+            return self.attempts.pop(url, 0)
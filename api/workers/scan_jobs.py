@@ -0,0 +1,182 @@
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import APP_CONFIG
+
+
+class AdmissionError(Exception):
+    """Сканирование не может быть принято (очередь заполнена или превышен бюджет)"""
+    pass
+
+
+class WorkerBudget:
+    """Общий для всех сканирований бюджет рабочих.
+
+    Сканирование занимает столько единиц, сколько у него рабочих, и ждет
+    в очереди, пока запущенные сканирования не освободят бюджет.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount, cancel_event=None):
+        """Ждет свободного бюджета; возвращает False, если ожидание отменено"""
+        with self.condition:
+            while self.used + amount > self.total:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                self.condition.wait(0.5)
+            self.used += amount
+            return True
+
+    def release(self, amount):
+        """Возвращает бюджет и будит ожидающие сканирования"""
+        with self.condition:
+            self.used = max(0, self.used - amount)
+            self.condition.notify_all()
+
+    def describe(self):
+        return {'total': self.total, 'used': self.used, 'available': self.total - self.used}
+
+
+class ScanJob:
+    """Сканирование, поставленное в очередь: состояние, контроллер и готовый ответ"""
+
+    def __init__(self, scan_id, master, cost, run):
+        self.scan_id = scan_id
+        self.master = master
+        self.cost = cost
+        self.run = run
+        self.status = 'queued'
+        self.response = None
+        self.error = None
+        self.future = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def describe(self):
+        """Краткое описание задания для API"""
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+        return {
+            'scan_id': self.scan_id,
+            'status': self.status,
+            'domain': self.master.domain,
+            'engine': self.master.engine,
+            'workers': self.cost,
+            'created_at': iso(self.created_at),
+            'started_at': iso(self.started_at),
+            'finished_at': iso(self.finished_at),
+            'error': self.error
+        }
+
+
+class ScanJobManager:
+    """Ограниченный исполнитель сканирований с контролем допуска.
+
+    Одновременно выполняется не больше max_concurrent_scans сканирований,
+    в очереди ждут не больше max_queued_scans, а сумма рабочих всех
+    запущенных сканирований не превышает глобальный бюджет.
+    """
+
+    def __init__(self, max_concurrent=None, max_queued=None, worker_budget=None, retention=None):
+        self.max_concurrent = max_concurrent or APP_CONFIG['max_concurrent_scans']
+        self.max_queued = max_queued if max_queued is not None else APP_CONFIG['max_queued_scans']
+        self.retention = retention or APP_CONFIG['job_result_retention']
+        self.budget = WorkerBudget(worker_budget or APP_CONFIG['global_worker_budget'])
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='scan-job')
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, scan_id, master, cost, run):
+        """Ставит сканирование в очередь; run(master) выполняется в потоке исполнителя и возвращает ответ"""
+        if cost > self.budget.total:
+            raise AdmissionError(
+                f"Сканирование требует {cost} рабочих, а общий бюджет {self.budget.total}"
+            )
+
+        job = ScanJob(scan_id, master, cost, run)
+        with self.lock:
+            pending = sum(1 for j in self.jobs.values() if j.status in ('queued', 'running'))
+            if pending >= self.max_concurrent + self.max_queued:
+                raise AdmissionError("Очередь сканирований заполнена, повторите позже")
+            # Возобновленное сканирование заменяет завершенную задачу с тем же ID
+            self.jobs.pop(scan_id, None)
+            self.jobs[scan_id] = job
+            self._evict_finished()
+        job.future = self.executor.submit(self._run_job, job)
+        return job
+
+    def _run_job(self, job):
+        if not self.budget.acquire(job.cost, job.cancel_event):
+            self._finish(job, 'cancelled')
+            return job
+
+        try:
+            if job.cancel_event.is_set():
+                self._finish(job, 'cancelled')
+                return job
+            job.status = 'running'
+            job.started_at = time.time()
+            job.response = job.run(job.master)
+            self._finish(job, 'completed')
+        except Exception as e:
+            print(f"Критическая ошибка при сканировании {job.scan_id}: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            self._finish(job, 'failed')
+        finally:
+            self.budget.release(job.cost)
+        return job
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+
+    def _evict_finished(self):
+        """Удаляет самые старые завершенные задания сверх лимита хранения"""
+        finished = [scan_id for scan_id, job in self.jobs.items() if job.finished_at is not None]
+        for scan_id in finished[:max(0, len(finished) - self.retention)]:
+            del self.jobs[scan_id]
+
+    def get(self, scan_id):
+        """Возвращает задание по ID или None"""
+        with self.lock:
+            return self.jobs.get(scan_id)
+
+    def discard(self, scan_id):
+        """Забывает завершенное задание (ответ уже отдан клиенту)"""
+        with self.lock:
+            job = self.jobs.get(scan_id)
+            if job is not None and job.finished_at is not None:
+                del self.jobs[scan_id]
+
+    def cancel(self, scan_id):
+        """Отменяет задание, которое еще ждет в очереди; возвращает True при успехе"""
+        job = self.get(scan_id)
+        if job is None or job.status != 'queued':
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled')
+        return True
+
+    def describe(self):
+        """Состояние очереди и бюджета для API"""
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'max_concurrent_scans': self.max_concurrent,
+            'max_queued_scans': self.max_queued,
+            'worker_budget': self.budget.describe()
+        }
@@ -0,0 +1,148 @@
+import threading
+from collections import defaultdict
+from utils.histogram import LatencyHistogram
+
+# Счетчики вида {ключ: число}, которые при слиянии складываются
+COUNTER_KEYS = ('status_codes', 'status_categories', 'content_types', 'resource_types',
+                'device_usage', 'redirects', 'depths', 'link_types', 'outcomes', 'http_versions',
+                'retries', 'retry_reasons', 'frontier')
+
+# Гистограммы времени ответа в разрезах {ключ: LatencyHistogram}
+LATENCY_KEYS = ('latency_by_slave', 'latency_by_device', 'latency_by_status')
+
+
+def _new_slave_stats():
+    return {'processed': 0, 'errors': 0, 'total_time': 0, 'timeouts': 0}
+
+
+def new_stats():
+    """Пустая статистика сканирования"""
+    stats = {key: defaultdict(int) for key in COUNTER_KEYS}
+    stats['slave_stats'] = defaultdict(_new_slave_stats)
+    # Время успешных ответов (для среднего и перцентилей по сканированию)
+    stats['response_times'] = LatencyHistogram()
+    for key in LATENCY_KEYS:
+        stats[key] = defaultdict(LatencyHistogram)
+    stats['timeout_errors'] = 0
+    return stats
+
+
+class StatsAccumulator:
+    """Статистика и результаты одного потока; пишет только поток-владелец, поэтому без блокировок"""
+
+    def __init__(self):
+        self.stats = new_stats()
+        self.results = []
+        self.pages = 0
+
+
+class ScanStats:
+    """Набор локальных аккумуляторов потоков со слиянием при чтении.
+
+    Каждый поток (рабочий, поток колбэков пула разбора, event loop, сторож
+    сроков) получает собственный аккумулятор и обновляет его без блокировок.
+    Общая картина собирается только при чтении прогресса и итоговой статистики.
+    """
+
+    def __init__(self, retain_results=True):
+        self.local = threading.local()
+        self.accumulators = []
+        self.lock = threading.Lock()
+        # Без хранения результаты только передаются в result_sink (потоковая выдача)
+        self.retain_results = retain_results
+        self.result_sink = None
+
+    def local_stats(self):
+        """Аккумулятор текущего потока (создается при первом обращении)"""
+        accumulator = getattr(self.local, 'accumulator', None)
+        if accumulator is None:
+            accumulator = self.local.accumulator = StatsAccumulator()
+            # Блокировка нужна только при регистрации нового потока
+            with self.lock:
+                self.accumulators.append(accumulator)
+        return accumulator
+
+    def _snapshot(self):
+        with self.lock:
+            return list(self.accumulators)
+
+    def add_result(self, result):
+        """Учитывает результат страницы в аккумуляторе текущего потока и возвращает его"""
+        accumulator = self.local_stats()
+        accumulator.pages += 1
+        if self.retain_results:
+            accumulator.results.append(result)
+        if self.result_sink is not None:
+            self.result_sink(result)
+        return accumulator
+
+    def results_count(self):
+        """Количество обработанных страниц без копирования результатов"""
+        return sum(accumulator.pages for accumulator in self._snapshot())
+
+    def results(self):
+        """Результаты всех потоков одним списком"""
+        results = []
+        for accumulator in self._snapshot():
+            results.extend(list(accumulator.results))
+        return results
+
+    def response_times(self):
+        """Общая гистограмма успешных ответов без слияния остальной статистики"""
+        merged = LatencyHistogram()
+        for accumulator in self._snapshot():
+            merged.merge(accumulator.stats['response_times'])
+        return merged
+
+    def dump(self):
+        """Слитая статистика в виде, пригодном для JSON (ключи счетчиков могут быть числами)"""
+        merged = self.merged()
+        state = {key: list(merged[key].items()) for key in COUNTER_KEYS}
+        state['slave_stats'] = {slave_id: dict(values) for slave_id, values in merged['slave_stats'].items()}
+        state['response_times'] = merged['response_times'].dump()
+        for key in LATENCY_KEYS:
+            state[key] = {name: histogram.dump() for name, histogram in merged[key].items()}
+        state['timeout_errors'] = merged['timeout_errors']
+        state['pages'] = self.results_count()
+        return state
+
+    def load(self, state):
+        """Добавляет статистику из контрольной точки отдельным аккумулятором"""
+        accumulator = StatsAccumulator()
+        stats = accumulator.stats
+        for key in COUNTER_KEYS:
+            # Точки, записанные до появления счетчика, его не содержат
+            for name, count in state.get(key, ()):
+                stats[key][name] += count
+        for slave_id, values in state['slave_stats'].items():
+            stats['slave_stats'][slave_id].update(values)
+        stats['response_times'] = LatencyHistogram.load(state['response_times'])
+        for key in LATENCY_KEYS:
+            for name, histogram in state[key].items():
+                stats[key][name] = LatencyHistogram.load(histogram)
+        stats['timeout_errors'] = state['timeout_errors']
+        accumulator.pages = state['pages']
+        with self.lock:
+            self.accumulators.append(accumulator)
+
+    def merged(self):
+        """Сливает статистику всех потоков в одну структуру прежнего вида"""
+        merged = new_stats()
+        for accumulator in self._snapshot():
+            stats = accumulator.stats
+            # dict()/list() копируют атомарно, даже если поток-владелец продолжает запись
+            for key in COUNTER_KEYS:
+                target = merged[key]
+                for name, count in dict(stats[key]).items():
+                    target[name] += count
+            for slave_id, slave_stats in dict(stats['slave_stats']).items():
+                target = merged['slave_stats'][slave_id]
+                for name, value in dict(slave_stats).items():
+                    target[name] += value
+            merged['response_times'].merge(stats['response_times'])
+            for key in LATENCY_KEYS:
+                target = merged[key]
+                for name, histogram in dict(stats[key]).items():
+                    target[name].merge(histogram)
+            merged['timeout_errors'] += stats['timeout_errors']
+        return merged
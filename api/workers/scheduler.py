@@ -0,0 +1,235 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from urllib.parse import urlparse
+from config import APP_CONFIG
+from workers.crawl_strategy import BreadthFirst
+
+# Записи, вытесненные пересчетом приоритета, вычищаются из кучи хоста, когда их больше этого
+STALE_ENTRIES_LIMIT = 1024
+
+
+class PolitenessScheduler:
+    """Фронтир с вежливостью по хостам.
+
+    Для каждого хоста хранится время, раньше которого к нему нельзя обращаться.
+    Хосты с непустой очередью лежат в куче по этому времени, поэтому get()
+    сразу отдает URL любого готового хоста и ждет только если готовых нет.
+    Внутри хоста URL упорядочены кучей по ключу стратегии обхода; пересчет
+    приоритета добавляет новую запись, а старая помечается устаревшей.
+    Повторные попытки ждут своего срока в отдельной куче и переходят в очередь
+    хоста, когда срок наступил, поэтому ожидание повтора не занимает рабочего.
+    Интерфейс совместим с queue.Queue (put/get/get_nowait/qsize/task_done).
+    """
+
+    def __init__(self, default_delay=None, host_delays=None, strategy=None):
+        self.default_delay = APP_CONFIG['default_crawl_delay'] if default_delay is None else default_delay
+        self.host_delays = dict(APP_CONFIG['host_crawl_delays'])
+        self.host_delays.update(host_delays or {})
+
+        self.strategy = strategy or BreadthFirst()
+        # Кучи хостов из записей [ключ, порядковый номер, (url, depth), актуальна]
+        self.host_queues = {}
+        # Живые записи: общее число по хосту и запись каждого ожидающего URL
+        self.host_pending = {}
+        self.queued = {}
+        self.stale_entries = 0
+        self.next_fetch_time = {}
+        self.ready_heap = []
+        # Отложенные повторы: (срок, порядковый номер, (url, depth))
+        self.retry_heap = []
+        self.sequence = itertools.count()
+        self.size = 0
+        self.unfinished_tasks = 0
+        # Выданные, но еще не обработанные URL (для контрольных точек)
+        self.in_progress = {}
+        self.condition = threading.Condition()
+
+    def get_host_delay(self, host):
+        """Возвращает задержку между запросами к хосту"""
+        return self.host_delays.get(host, self.default_delay)
+
+    def set_host_delay(self, host, delay):
+        """Устанавливает задержку между запросами к хосту"""
+        with self.condition:
+            self.host_delays[host] = delay
+
+    def defer_host(self, host, delay):
+        """Не обращаться к хосту ближайшие delay секунд (Retry-After)"""
+        with self.condition:
+            ready_at = time.time() + delay
+            if ready_at <= self.next_fetch_time.get(host, 0):
+                return
+            self.next_fetch_time[host] = ready_at
+            # У хоста в куче не больше одной записи — сдвигаем ее
+            for index, (_, heap_host) in enumerate(self.ready_heap):
+                if heap_host == host:
+                    self.ready_heap[index] = (ready_at, host)
+                    heapq.heapify(self.ready_heap)
+                    break
+
+    def _enqueue(self, item, now, penalty=0):
+        """Ставит (url, depth) в очередь своего хоста; URL со штрафом идут после всех без него"""
+        host = urlparse(item[0]).netloc
+        host_queue = self.host_queues.get(host)
+        if host_queue is None:
+            host_queue = self.host_queues[host] = []
+
+        # Хост попадает в кучу только когда у него появляется работа
+        if not self.host_pending.get(host):
+            ready_at = max(now, self.next_fetch_time.get(host, 0))
+            heapq.heappush(self.ready_heap, (ready_at, host))
+
+        entry = [(penalty, self.strategy.key(*item)), next(self.sequence), item, True]
+        heapq.heappush(host_queue, entry)
+        self.queued[item[0]] = entry
+        self.host_pending[host] = self.host_pending.get(host, 0) + 1
+
+    def reprioritize(self, url):
+        """Пересчитывает ключ ожидающего URL (например, после новой входящей ссылки)"""
+        with self.condition:
+            entry = self.queued.get(url)
+            if entry is None:
+                return
+            key = (entry[0][0], self.strategy.key(*entry[2]))
+            if key == entry[0]:
+                return
+            entry[3] = False
+            new_entry = [key, next(self.sequence), entry[2], True]
+            host = urlparse(url).netloc
+            heapq.heappush(self.host_queues[host], new_entry)
+            self.queued[url] = new_entry
+            self.stale_entries += 1
+            if self.stale_entries > STALE_ENTRIES_LIMIT:
+                self._compact()
+
+    def _compact(self):
+        """Убирает устаревшие записи из куч хостов"""
+        for host, host_queue in self.host_queues.items():
+            live = [entry for entry in host_queue if entry[3]]
+            heapq.heapify(live)
+            self.host_queues[host] = live
+        self.stale_entries = 0
+
+    def put(self, item, block=True, timeout=None, penalty=0):
+        """Добавляет (url, depth) в очередь своего хоста"""
+        with self.condition:
+            self._enqueue(item, time.time(), penalty)
+            self.size += 1
+            self.unfinished_tasks += 1
+            self.condition.notify()
+
+    def retry(self, item, delay):
+        """Возвращает выданный (url, depth) в очередь не раньше чем через delay секунд"""
+        with self.condition:
+            self.in_progress.pop(item[0], None)
+            heapq.heappush(self.retry_heap, (time.time() + delay, next(self.sequence), item))
+            self.size += 1
+            self.unfinished_tasks += 1
+            self.condition.notify()
+
+    def _promote_retries(self, now):
+        """Переносит повторы с наступившим сроком в очереди хостов"""
+        while self.retry_heap and self.retry_heap[0][0] <= now:
+            _, _, item = heapq.heappop(self.retry_heap)
+            self._enqueue(item, now)
+
+    def _next_event(self):
+        """Ближайший момент, когда станет готов хост или наступит срок повтора"""
+        times = []
+        if self.ready_heap:
+            times.append(self.ready_heap[0][0])
+        if self.retry_heap:
+            times.append(self.retry_heap[0][0])
+        return min(times) if times else None
+
+    def _pop_ready(self, now):
+        """Выдает URL готового хоста и сдвигает время его следующего запроса"""
+        _, host = heapq.heappop(self.ready_heap)
+        host_queue = self.host_queues[host]
+        entry = heapq.heappop(host_queue)
+        while not entry[3]:
+            self.stale_entries -= 1
+            entry = heapq.heappop(host_queue)
+        item = entry[2]
+        self.queued.pop(item[0], None)
+        self.host_pending[host] -= 1
+        self.size -= 1
+        self.in_progress[item[0]] = item
+
+        next_time = now + self.get_host_delay(host)
+        self.next_fetch_time[host] = next_time
+        if self.host_pending[host]:
+            heapq.heappush(self.ready_heap, (next_time, host))
+        return item
+
+    def get(self, block=True, timeout=None):
+        """Возвращает (url, depth) первого хоста, к которому уже можно обращаться"""
+        deadline = time.time() + timeout if timeout is not None else None
+
+        with self.condition:
+            while True:
+                now = time.time()
+                self._promote_retries(now)
+                if self.ready_heap and self.ready_heap[0][0] <= now:
+                    return self._pop_ready(now)
+
+                if not block:
+                    raise queue.Empty
+
+                next_event = self._next_event()
+                wait_time = next_event - now if next_event is not None else None
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise queue.Empty
+                    wait_time = remaining if wait_time is None else min(wait_time, remaining)
+
+                self.condition.wait(wait_time)
+
+    def get_nowait(self):
+        """Возвращает готовый URL без ожидания или бросает queue.Empty"""
+        return self.get(block=False)
+
+    def next_ready_in(self):
+        """Секунды до момента, когда какой-либо хост станет готов (None если очередь пуста)"""
+        with self.condition:
+            next_event = self._next_event()
+            if next_event is None:
+                return None
+            return max(0, next_event - time.time())
+
+    def task_done(self, url=None):
+        """Отмечает завершение обработки URL"""
+        with self.condition:
+            if url is not None:
+                self.in_progress.pop(url, None)
+            if self.unfinished_tasks > 0:
+                self.unfinished_tasks -= 1
+
+    def snapshot(self):
+        """Все необработанные (url, depth): ожидающие в очереди и выданные рабочим"""
+        with self.condition:
+            items = [entry[2] for entry in self.queued.values()]
+            items.extend(item for _, _, item in self.retry_heap)
+            items.extend(self.in_progress.values())
+            return items
+
+    def all_tasks_done(self):
+        """Все добавленные URL обработаны (аналог условия queue.join)"""
+        with self.condition:
+            return self.unfinished_tasks == 0
+
+    def retries_pending(self):
+        """Количество повторов, срок которых еще не наступил"""
+        return len(self.retry_heap)
+
+    def qsize(self):
+        """Количество URL, ожидающих обработки"""
+        return self.size
+
+    def empty(self):
+        """Проверяет, пуста ли очередь"""
+        return self.size == 0
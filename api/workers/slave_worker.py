@@ -1,33 +1,33 @@
 import time
 import random
+import socket
 import requests
-import signal
-import functools
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
 from config import DEVICE_CONFIGS, APP_CONFIG, TIMEOUT_CONFIG
 from utils.resource_detector import get_resource_type, detect_content_type_by_header
-
-
-class TimeoutException(Exception):
-    """Исключение при превышении времени выполнения"""
-    pass
-
-
-def timeout_handler(signum, frame):
-    """Обработчик сигнала таймаута"""
-    raise TimeoutException("Превышено время выполнения операции")
+from utils.deadline import Deadline, TimeoutException, current_deadline
+from utils.transport import create_session
+from workers.body_reader import BodyReader, wants_body, declared_size
+from workers.concurrency import OVERLOAD_STATUSES, parse_retry_after
 
 
 class SlaveWorker:
     """Рабочий слейв для обработки страниц с таймаутами"""
 
-    def __init__(self, slave_id, device_config=None, request_timeout=None):
+    def __init__(self, slave_id, device_config=None, request_timeout=None, html_parser=None):
         self.slave_id = slave_id
         self.device = device_config or random.choice(DEVICE_CONFIGS)
         self.request_timeout = request_timeout or APP_CONFIG['request_timeout']
-        self.session = requests.Session()
-        self._setup_session()
+        self.html_parser = html_parser or APP_CONFIG['html_parser']
+        # Пул процессов для разбора; None — разбор в потоке слейва
+        self.parse_pool = None
+        # Кеш валидаторов прошлых сканирований; None — только безусловные запросы
+        self.validators = None
+        # Лимит тела ответа (задается сканированием) и время на разбор одной страницы
+        self.max_body_size = APP_CONFIG['max_body_size']
+        self.parse_timeout = TIMEOUT_CONFIG['parse_timeout']
+        # SimHash текста для поиска почти дубликатов (задается сканированием)
+        self.fingerprint_text = APP_CONFIG['near_duplicate_detection']
+        self.session = self._create_session()
 
         self.stats = {
             'pages_processed': 0,
@@ -38,12 +38,15 @@ class SlaveWorker:
             'timeout_errors': 0
         }
 
-        # Для отслеживания времени выполнения операции
-        self.operation_start_time = None
+    def _create_session(self):
+        """Создает HTTP сессию слейва на общем пуле соединений процесса"""
+        session = create_session(self._build_headers())
+        session.max_redirects = 5
+        return session
 
-    def _setup_session(self):
-        """Настраивает HTTP сессию с заголовками устройства"""
-        self.session.headers.update({
+    def _build_headers(self):
+        """Формирует заголовки запроса для профиля устройства"""
+        return {
             'User-Agent': self.device['user_agent'],
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': self.device.get('language', 'en-US,en;q=0.9'),
@@ -52,58 +55,48 @@ class SlaveWorker:
             'Referer': 'https://www.google.com/',
             'DNT': '1',
             'Upgrade-Insecure-Requests': '1'
-        })
-        self.session.max_redirects = 5
-        # Устанавливаем общий таймаут для сессии
-        self.session.request = functools.partial(self.session.request, timeout=self.request_timeout)
-
-    def _check_operation_timeout(self, max_operation_time=30):
-        """Проверяет, не превышено ли время выполнения операции"""
-        if self.operation_start_time:
-            elapsed = time.time() - self.operation_start_time
-            if elapsed > max_operation_time:
-                raise TimeoutException(f"Превышено время операции: {elapsed:.2f} секунд")
-        return True
-
-    def process_url(self, url, depth, timeout=None):
+        }
+
+    def process_url(self, url, depth, timeout=None, deadline=None):
         """Обрабатывает одну страницу с таймаутом"""
         start_time = time.time()
-        self.operation_start_time = start_time
         operation_timeout = timeout or self.request_timeout
+        # Срок URL наследуется от срока сканирования и не переживает его
+        deadline = Deadline(operation_timeout, parent=deadline or current_deadline(), name=url)
 
         try:
             print(f"Слейв {self.slave_id} обрабатывает: {url} (глубина: {depth}, таймаут: {operation_timeout}с)")
-
-            # Устанавливаем таймаут для сигналов (Unix системах)
-            try:
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(operation_timeout + 5)  # +5 секунд на завершение
-            except (AttributeError, ValueError):
-                pass  # На Windows нет signal.alarm
-
-            # Случайная задержка для имитации человеческого поведения
-            time.sleep(random.uniform(APP_CONFIG['min_delay'], APP_CONFIG['max_delay']))
-
-            # Проверяем общее время операции
-            self._check_operation_timeout(operation_timeout + 10)
+            deadline.check('ожидание запроса')
 
             response = self.session.get(
                 url,
-                timeout=operation_timeout,
+                timeout=(deadline.timeout_for(TIMEOUT_CONFIG['connect_timeout']),
+                         deadline.timeout_for(operation_timeout)),
+                headers=self._conditional_headers(url),
                 allow_redirects=True,
-                verify=True
+                verify=True,
+                stream=True
             )
-            response.raise_for_status()
+            with response:
+                # По истечении срока соединение обрывается, даже если сервер отдает тело по байту
+                abort_handle = deadline.on_expire(lambda: self._abort_response(response))
+                try:
+                    response.raise_for_status()
+                    # Тело не-HTML ответа не читается: выход из with закроет соединение, не дочитывая его
+                    reader = None
+                    if wants_body(response.status_code, response.headers):
+                        reader = BodyReader.for_worker(self, url, response.encoding)
+                        self._read_body(response, reader, deadline)
+                    elif response.status_code == 304:
+                        # Пустое тело 304 дочитывается, чтобы соединение вернулось в пул
+                        for _ in response.iter_content():
+                            pass
+                finally:
+                    abort_handle.cancel()
 
             processing_time = time.time() - start_time
 
-            # Сбрасываем таймер сигнала
-            try:
-                signal.alarm(0)
-            except (AttributeError, ValueError):
-                pass
-
-            return self._process_successful_response(response, url, depth, processing_time)
+            return self._process_successful_response(response, reader, url, depth, processing_time)
 
         except TimeoutException as e:
             processing_time = time.time() - start_time
@@ -117,115 +110,167 @@ class SlaveWorker:
 
         except requests.RequestException as e:
             processing_time = time.time() - start_time
+            if deadline.expired():
+                # Соединение оборвано сторожем срока
+                self.stats['timeout_errors'] += 1
+                error = TimeoutException(f"Операция {url} прервана по сроку: {e}")
+                return self._process_timeout_error(error, url, depth, processing_time)
             return self._process_error_response(e, url, depth, processing_time)
 
         except Exception as e:
             processing_time = time.time() - start_time
             return self._process_exception(e, url, depth, processing_time)
-        finally:
-            self.operation_start_time = None
-            # Гарантируем сброс таймера
-            try:
-                signal.alarm(0)
-            except (AttributeError, ValueError):
-                pass
 
-    def _process_successful_response(self, response, url, depth, processing_time):
+    def _conditional_headers(self, url):
+        """If-None-Match/If-Modified-Since по валидаторам прошлого сканирования"""
+        if self.validators is None:
+            return {}
+        return self.validators.request_headers(url)
+
+    def _read_body(self, response, reader, deadline):
+        """Читает тело ответа по частям до лимита размера, проверяя срок между частями"""
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            deadline.check('чтение ответа')
+            if not reader.feed(chunk):
+                break
+
+    @staticmethod
+    def _abort_response(response):
+        """Обрывает соединение ответа, разблокируя чтение в потоке слейва"""
+        connection = getattr(response.raw, 'connection', None)
+        sock = getattr(connection, 'sock', None)
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+            else:
+                response.close()
+        except OSError:
+            pass
+
+    def _process_successful_response(self, response, reader, url, depth, processing_time):
         """Обрабатывает успешный HTTP ответ"""
+        redirect_chain = [r.url for r in response.history] + [response.url] if response.history else [response.url]
+        return self._build_success_result(
+            url, depth, response.status_code, response.headers,
+            reader, redirect_chain, processing_time,
+            http_version='HTTP/1.0' if response.raw.version == 10 else 'HTTP/1.1'
+        )
+
+    def _build_success_result(self, url, depth, status_code, headers, reader,
+                              redirect_chain, processing_time, http_version=None):
+        """Формирует результат успешной обработки независимо от HTTP клиента"""
         # Проверяем время выполнения
         if processing_time > self.request_timeout:
             print(
                 f"Предупреждение: обработка {url} заняла {processing_time:.2f}с, больше таймаута {self.request_timeout}с")
 
+        # Страница не изменилась: ссылки и заголовок берутся из кеша без разбора
+        if status_code == 304 and self.validators is not None:
+            cached = self.validators.cached_page(url)
+            if cached is not None:
+                result = self._build_not_modified_result(url, depth, headers, cached, redirect_chain,
+                                                         processing_time)
+                result['http_version'] = http_version
+                return result
+
         # Определяем тип контента
-        content_type = detect_content_type_by_header(response.headers)
+        content_type = detect_content_type_by_header(headers)
         if content_type == 'unknown':
             content_type = get_resource_type(url)
 
-        # Парсим только HTML
-        links = []
-        if 'html' in response.headers.get('Content-Type', '').lower():
+        # Разбираются только HTML тела (reader есть только у них): ссылки, заголовок и мета-теги
+        page = {'links': [], 'title': 'No title', 'meta': {}}
+        parse_future = None
+        if reader is not None:
             try:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                base_domain = urlparse(url).netloc
-                links = self._extract_links(soup, url, base_domain)
+                if self.parse_pool is not None:
+                    # Разбор уйдет в пул процессов, поток сразу вернется к сети
+                    parse_future = self.parse_pool.submit(reader.body(), reader.encoding, url,
+                                                          fingerprint=self.fingerprint_text)
+                else:
+                    # HTML уже разобран во время загрузки
+                    page = reader.finish()
             except Exception as e:
                 print(f"Ошибка при парсинге {url}: {e}")
+            body_size = reader.size
+        else:
+            # Тело не загружалось: размер известен только из заголовков
+            body_size = declared_size(headers)
+        links = page['links']
 
         # Обновляем статистику слейва
         self.stats['pages_processed'] += 1
         self.stats['links_found'] += len(links)
-        self.stats['total_bytes'] += len(response.content)
+        self.stats['total_bytes'] += reader.size if reader is not None else 0
         self.stats['total_time'] += processing_time
 
-        return {
+        result = {
             'success': True,
             'url': url,
-            'status_code': response.status_code,
-            'content_type': response.headers.get('Content-Type', ''),
+            'status_code': status_code,
+            'content_type': headers.get('Content-Type', ''),
             'page_type': content_type,
-            'title': self._extract_title(response),
-            'page_size_kb': len(response.content) / 1024,
+            'title': page['title'],
+            'meta': page['meta'],
+            'page_size_kb': body_size / 1024,
             'links': links,
             'device_used': self.device['id'],
             'depth': depth,
             'slave_id': self.slave_id,
             'processing_time': round(processing_time, 3),
             'timeout_warning': processing_time > self.request_timeout * 0.8,
-            'redirect_chain': [r.url for r in response.history] + [response.url] if response.history else [
-                response.url],
-            'headers': dict(response.headers)
+            'redirect_chain': redirect_chain,
+            'headers': dict(headers),
+            'http_version': http_version,
+            # Отпечаток тела для сравнения сканирований
+            'content_hash': reader.content_hash() if reader is not None else None,
+            # Отпечаток текста для поиска почти дубликатов
+            'simhash': page.get('simhash'),
+            'body_skipped': reader is None,
+            'body_truncated': reader is not None and reader.truncated
         }
+        if parse_future is not None:
+            result['parse_future'] = parse_future
+        return result
 
-    def _extract_links(self, soup, base_url, base_domain):
-        """Извлекает все ссылки из HTML с проверкой времени"""
-        links = []
-        start_extract_time = time.time()
-        max_extract_time = 5
+    def _build_not_modified_result(self, url, depth, headers, cached, redirect_chain, processing_time):
+        """Результат ответа 304 по сохраненной странице"""
+        content_type = detect_content_type_by_header({'Content-Type': cached['content_type']})
+        if content_type == 'unknown':
+            content_type = get_resource_type(url)
 
-        for element in soup.find_all(['a', 'link', 'script', 'img', 'iframe']):
-            # Проверяем время извлечения
-            if time.time() - start_extract_time > max_extract_time:
-                print(f"Прервано извлечение ссылок из {base_url} - превышено время")
-                break
+        self.stats['pages_processed'] += 1
+        self.stats['links_found'] += len(cached['links'])
+        self.stats['total_time'] += processing_time
 
-            href = None
-            if element.name == 'a' or element.name == 'link':
-                href = element.get('href')
-            elif element.name in ['script', 'img', 'iframe']:
-                href = element.get('src')
-
-            if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:', 'data:')):
-                continue
-
-            # Преобразуем в абсолютный URL
-            absolute_url = urljoin(base_url, href)
-            absolute_url = absolute_url.split('#')[0].rstrip('/')
-
-            # Определяем тип ссылки
-            link_type = 'internal' if urlparse(absolute_url).netloc == base_domain else 'external'
-            resource_type = get_resource_type(absolute_url)
-
-            links.append({
-                'url': absolute_url,
-                'type': link_type,
-                'resource_type': resource_type,
-                'element': element.name,
-                'text': element.get_text(strip=True)[:100] if element.name == 'a' else '',
-                'attributes': {k: v for k, v in element.attrs.items() if k not in ['href', 'src']}
-            })
-        return links
-
-    def _extract_title(self, response):
-        """Извлекает заголовок страницы с таймаутом"""
-        if 'html' in response.headers.get('Content-Type', '').lower():
-            try:
-                soup = BeautifulSoup(response.text[:5000], 'html.parser')
-                if soup.title and soup.title.string:
-                    return soup.title.string.strip()[:200]
-            except Exception:
-                pass
-        return 'No title'
+        return {
+            'success': True,
+            'url': url,
+            'status_code': 304,
+            'not_modified': True,
+            'content_type': cached['content_type'],
+            'page_type': content_type,
+            'title': cached['title'],
+            'meta': cached['meta'],
+            'page_size_kb': cached['page_size_kb'],
+            'content_hash': cached.get('content_hash'),
+            'links': cached['links'],
+            'device_used': self.device['id'],
+            'depth': depth,
+            'slave_id': self.slave_id,
+            'processing_time': round(processing_time, 3),
+            'timeout_warning': processing_time > self.request_timeout * 0.8,
+            'redirect_chain': redirect_chain,
+            'headers': dict(headers)
+        }
+
+    def apply_parsed_page(self, result, page):
+        """Дополняет результат страницы данными отложенного разбора"""
+        result['links'] = page['links']
+        result['title'] = page['title']
+        result['meta'] = page['meta']
+        result['simhash'] = page.get('simhash')
+        self.stats['links_found'] += len(page['links'])
 
     def _process_timeout_error(self, error, url, depth, processing_time):
         """Обрабатывает ошибку таймаута"""
@@ -246,16 +291,18 @@ class SlaveWorker:
             'timeout_exceeded': True
         }
 
-    def _process_error_response(self, error, url, depth, processing_time):
+    def _process_error_response(self, error, url, depth, processing_time, status_code=None, headers=None):
         """Обрабатывает ошибку запроса"""
         self.stats['errors'] += 1
         self.stats['total_time'] += processing_time
 
-        status_code = 0
-        if hasattr(error, 'response') and error.response is not None:
-            status_code = error.response.status_code
+        response = getattr(error, 'response', None)
+        if status_code is None:
+            status_code = response.status_code if response is not None else 0
+        if headers is None and response is not None:
+            headers = response.headers
 
-        return {
+        result = {
             'success': False,
             'url': url,
             'status_code': status_code,
@@ -266,6 +313,12 @@ class SlaveWorker:
             'slave_id': self.slave_id,
             'processing_time': round(processing_time, 3)
         }
+        # 429/503 с Retry-After: сколько сервер просит не обращаться к хосту
+        if headers and status_code in OVERLOAD_STATUSES:
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            if retry_after is not None:
+                result['retry_after'] = retry_after
+        return result
 
     def _process_exception(self, error, url, depth, processing_time):
         """Обрабатывает общее исключение"""
@@ -3,11 +3,13 @@ import { useDispatch, useSelector } from "react-redux";
 
 import Box from '@mui/material/Box';
 import TextField from '@mui/material/TextField';
+import Alert from '@mui/material/Alert';
 
 export default function Search() {
 
   const dispatch = useDispatch()
   const domain = useSelector(state => state.domain.domain)
+  const error = useSelector(state => state.domain.error)
 
   const updateInput = event => {
     dispatch({type:"SET_DOMAIN", payload:event.target.value})
@@ -16,15 +18,39 @@ export default function Search() {
   const submitInput = event => {
     event.preventDefault() 
     console.log(domain)
-    fetch('/api/scan?domain=' + domain + '&max_pages=50&max_depth=2&workers=5&timeout=5')
+    dispatch({type:"SET_FINISHED", payload:false})
+    dispatch({type:"SET_ERROR", payload:null})
+    fetch('/api/scan?domain=' + domain + '&max_pages=50&max_depth=2&workers=5&timeout=5&mode=job')
       .then(res => res.json())
-      .then(data => {
-        console.log("SCAN ID >> " + data['scan_id'])
-        console.log(data['unique_links'])
-        dispatch({type:"SET_SLAVES", payload:data['performance']['slave_performance']})
-        dispatch({type:"SET_SCAN_ID", payload:data['scan_id']})
-        dispatch({type:"SET_ULINKS", payload:data['unique_links']})
-        dispatch({type:"SET_FINISHED", payload:true})
+      .then(job => {
+        console.log("SCAN ID >> " + job['scan_id'])
+        dispatch({type:"SET_SCAN_ID", payload:job['scan_id']})
+
+        // Прогресс приходит потоком событий, результат забираем после события done
+        const events = new EventSource('/api/scan/' + job['scan_id'] + '/events')
+        events.addEventListener('progress', event => {
+          const progress = JSON.parse(event.data)
+          dispatch({type:"SET_PROGRESS", payload:progress})
+          dispatch({type:"SET_SLAVES", payload:progress['slave_performance']})
+        })
+        events.addEventListener('done', event => {
+          events.close()
+          const done = JSON.parse(event.data)
+          fetch(done['result_url'])
+            .then(res => res.json())
+            .then(data => {
+              // У упавшего или отмененного задания нет итогов сканирования — показываем ошибку
+              if (done['status'] !== 'completed' || data['status'] !== 'completed') {
+                dispatch({type:"SET_ERROR", payload:data['error'] || 'Scan ' + (data['status'] || done['status'])})
+                return
+              }
+              console.log(data['unique_links'])
+              dispatch({type:"SET_SLAVES", payload:data['performance']['slave_performance']})
+              dispatch({type:"SET_ULINKS", payload:data['unique_links']})
+              dispatch({type:"SET_FINISHED", payload:true})
+            })
+            .catch(err => dispatch({type:"SET_ERROR", payload:String(err)}))
+        })
       })
   }
 
@@ -34,6 +60,7 @@ export default function Search() {
         {/* <input onChange={updateInput} id='input'></input> */}
         <TextField fullWidth onChange={updateInput} id='input' label="Domain" type="search" margin="normal"  />
       </form>
+      {error && <Alert severity="error">{error}</Alert>}
     </div>
   );
 }
\ No newline at end of file
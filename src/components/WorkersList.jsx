@@ -39,8 +39,16 @@ export default function WorkersList() {
   })
 
   const finished = useSelector(state => state.domain.finished)
+  const progress = useSelector(state => state.domain.progress)
+  // Таблица обновляется по событиям прогресса еще до завершения сканирования
+  const running = Object.keys(slaves).length > 0
 
-  return (finished &&
+  return ((finished || running) &&
+    <>
+    {!finished && progress['total'] !== undefined &&
+      <div style={{marginBottom: '10px'}}>
+        {progress['total']} / {progress['max']} pages, {progress['unique_links']} links, {progress['elapsed_time']} s
+      </div>}
     <TableContainer style={{marginBottom: '10px'}} component={Paper}>
       <Table sx={{ minWidth: 700 }} aria-label="customized table">
         <TableHead>
@@ -77,5 +85,6 @@ export default function WorkersList() {
         </TableBody>
       </Table>
     </TableContainer>
+    </>
   );
 }
@@ -3,7 +3,9 @@ const defaultState = {
   scan_id: "",
   ulinks: {},
   slaves: {},
+  progress: {},
   finished: false,
+  error: null,
 }
 
 export const domainReducer = (state = defaultState, action) => {
@@ -16,8 +18,12 @@ export const domainReducer = (state = defaultState, action) => {
       return {...state, ulinks: action.payload}
     case "SET_SLAVES":
       return {...state, slaves: action.payload}
+    case "SET_PROGRESS":
+      return {...state, progress: action.payload}
     case "SET_FINISHED":
       return {...state, finished: action.payload}
+    case "SET_ERROR":
+      return {...state, error: action.payload}
     
     default:
       return state